@@ -14,6 +14,7 @@
 
 import os
 import sys
+import argparse
 import subprocess
 import shutil
 import time
@@ -21,18 +22,20 @@ import glob
 import ast
 import re
 import hashlib
+import hmac
 import json
+import sqlite3
 import tempfile
 import traceback
 import atexit
 import threading
 import queue
 import concurrent.futures
+import fnmatch
+import zipfile
+from collections import deque
 from pathlib import Path
-from typing import Dict, Set, List, Tuple, Optional, Any
-
-import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext, filedialog
+from typing import Dict, Set, List, Tuple, Optional, Any, Callable
 
 # ==================== 常量定义 ====================
 
@@ -217,6 +220,23 @@ EXCLUDE_MODULES = [
 # 安全：允许的pip包名字符
 SAFE_PACKAGE_NAME_PATTERN = re.compile(r'^[a-zA-Z0-9_\-\.]+$')
 
+# 导入分析逻辑变化时递增，使已缓存的单文件分析结果失效
+ANALYZER_VERSION = 2
+
+
+def get_cache_dir(*parts: str) -> str:
+    """返回（并创建）~/.game_packer_cache 下的缓存目录"""
+    path = os.path.join(os.path.expanduser("~"), ".game_packer_cache", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_sha256(filepath: str) -> str:
+    h = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''): h.update(block)
+    return h.hexdigest()
+
 
 def get_python_executable() -> str:
     """获取实际的Python解释器路径"""
@@ -255,6 +275,78 @@ def get_python_executable() -> str:
         return sys.executable
 
 
+# 在目标解释器中运行：输出解释器身份与 site-packages 目录
+ENV_INFO_SCRIPT = '''
+import sys, json, site, sysconfig
+paths = []
+try: paths.extend(site.getsitepackages())
+except Exception: pass
+try: paths.append(site.getusersitepackages())
+except Exception: pass
+for key in ('purelib', 'platlib'):
+    try: paths.append(sysconfig.get_paths()[key])
+    except Exception: pass
+print(json.dumps({'executable': sys.executable, 'version': sys.version, 'prefix': sys.prefix,
+                  'site_dirs': sorted(set(paths))}))
+'''
+
+_interpreter_info_cache: Dict[str, dict] = {}
+_interpreter_info_lock = threading.Lock()
+
+
+def get_interpreter_info(python_exe: str) -> dict:
+    """查询目标解释器的路径/版本/prefix/site-packages（每个会话每个解释器只查询一次）"""
+    with _interpreter_info_lock:
+        if python_exe in _interpreter_info_cache:
+            return _interpreter_info_cache[python_exe]
+    try:
+        result = subprocess.run([python_exe, '-c', ENV_INFO_SCRIPT], capture_output=True, text=True, timeout=30)
+        info = json.loads(result.stdout.strip())
+    except Exception:
+        # 查询失败不缓存，下次重试
+        return {'executable': python_exe, 'version': '?', 'prefix': '?', 'site_dirs': []}
+    with _interpreter_info_lock:
+        _interpreter_info_cache[python_exe] = info
+    return info
+
+
+def get_environment_fingerprint(python_exe: str) -> str:
+    """解释器环境指纹：解释器身份 + site-packages 目录 mtime
+    
+    pip 安装/卸载会增删 dist-info 目录从而改变 site-packages 的 mtime，
+    指纹随之变化；环境不变时指纹稳定。
+    """
+    info = get_interpreter_info(python_exe)
+    parts = [info['executable'], info['version'], info['prefix']]
+    for d in info['site_dirs']:
+        try: parts.append(f"{d}:{os.stat(d).st_mtime_ns}")
+        except OSError: parts.append(f"{d}:-")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+
+def get_available_memory() -> Optional[int]:
+    """当前可用物理内存（字节）；无法获取时返回 None"""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                            ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                            ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                            ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                            ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+            stat = MEMORYSTATUSEX(); stat.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(stat)):
+                return int(stat.ullAvailPhys)
+        elif os.path.exists('/proc/meminfo'):
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'): return int(line.split()[1]) * 1024
+    except Exception:
+        pass
+    return None
+
+
 def is_safe_package_name(name: str) -> bool:
     if not name or len(name) > 100: return False
     return bool(SAFE_PACKAGE_NAME_PATTERN.match(name))
@@ -274,6 +366,11 @@ def is_safe_path(path: str, base_dir: Optional[str] = None) -> bool:
         return False
 
 
+def is_module_excluded(name: str, excludes) -> bool:
+    """精确匹配排除列表：只排除模块本身及其子模块（pip 不会误伤 pillow/pygame）"""
+    return any(name == e or name.startswith(e + '.') for e in excludes)
+
+
 def pip_name_to_import_name(pip_name: str) -> str:
     if pip_name in PIP_TO_IMPORT_MAP:
         return PIP_TO_IMPORT_MAP[pip_name]
@@ -284,17 +381,24 @@ def pip_name_to_import_name(pip_name: str) -> str:
 
 
 class SecureDependencyCache:
-    """安全依赖缓存"""
-    CACHE_EXPIRY_SECONDS = 7 * 24 * 3600
+    """安全依赖缓存（SQLite 存储：增量写入、逐条签名、支持多进程并发访问）
+    
+    条目按解释器环境指纹（见 get_environment_fingerprint）分区：环境变化即自然失效，
+    环境不变则长期有效；长期未使用的环境分区由后台清理。
+    """
+    ENV_RETENTION_SECONDS = 30 * 24 * 3600
+    COMPACT_INTERVAL_SECONDS = 3600
+    SCHEMA_VERSION = 2  # PRAGMA user_version；1 = 未按环境分区的 modules 表
     
     def __init__(self, cache_file: str = None):
         if cache_file is None:
-            cache_dir = os.path.join(os.path.expanduser("~"), ".game_packer_cache")
-            os.makedirs(cache_dir, exist_ok=True)
-            cache_file = os.path.join(cache_dir, "dep_cache_v5.json")
+            cache_file = os.path.join(get_cache_dir(), "dep_cache_v6.db")
         self.cache_file = cache_file
         self.secret_key = self._get_machine_key()
-        self.cache = self._load_cache()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._conn = self._connect()
+        threading.Thread(target=self._compaction_loop, daemon=True).start()
     
     def _get_machine_key(self) -> str:
         import platform
@@ -303,101 +407,603 @@ class SecureDependencyCache:
         machine_info = f"{platform.node()}-{platform.machine()}-{login}"
         return hashlib.sha256(machine_info.encode()).hexdigest()[:32]
     
-    def _compute_signature(self, data: dict) -> str:
-        data_str = json.dumps(data, sort_keys=True)
-        return hashlib.sha256((data_str + self.secret_key).encode()).hexdigest()
+    def _open(self) -> sqlite3.Connection:
+        # isolation_level=None: 由我们显式 BEGIN IMMEDIATE，写事务在进程间串行化
+        conn = sqlite3.connect(self.cache_file, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS modules")  # 未分区的旧表，只在升级时清理一次
+            conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        conn.execute("CREATE TABLE IF NOT EXISTS env_modules (env TEXT NOT NULL, name TEXT NOT NULL, "
+                     "available INTEGER NOT NULL, version TEXT, time REAL NOT NULL, signature TEXT NOT NULL, "
+                     "PRIMARY KEY (env, name))")
+        conn.execute("CREATE TABLE IF NOT EXISTS environments (env TEXT PRIMARY KEY, last_used REAL NOT NULL)")
+        return conn
+    
+    def _connect(self) -> sqlite3.Connection:
+        try:
+            return self._open()
+        except sqlite3.DatabaseError:
+            # 文件损坏：删除后重建；仍失败则退回内存库（本次会话内有效）
+            try:
+                os.remove(self.cache_file)
+                return self._open()
+            except Exception:
+                self.cache_file = ':memory:'
+                return self._open()
+    
+    def _compute_signature(self, env: str, name: str, available: bool, version: Optional[str], ts: float) -> str:
+        msg = f"{env}\x1f{name}\x1f{int(bool(available))}\x1f{version}\x1f{ts:.6f}"
+        return hmac.new(self.secret_key.encode(), msg.encode(), hashlib.sha256).hexdigest()
+    
+    def _row(self, env: str, name: str, available: bool, version: Optional[str], ts: float) -> tuple:
+        available = bool(available)
+        return (env, name, int(available), version, ts, self._compute_signature(env, name, available, version, ts))
+    
+    def _write(self, rows: List[tuple]):
+        """一个事务写入多条记录"""
+        if not rows: return
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany("INSERT OR REPLACE INTO env_modules VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                try: self._conn.execute("ROLLBACK")
+                except sqlite3.Error: pass
+    
+    def _compaction_loop(self):
+        """后台清理长期未使用的环境分区，使用独立连接避免阻塞前台读写"""
+        try:
+            conn = sqlite3.connect(self.cache_file, timeout=30, isolation_level=None)
+        except sqlite3.Error:
+            return
+        while not self._stop.is_set():
+            try:
+                cutoff = time.time() - self.ENV_RETENTION_SECONDS
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM env_modules WHERE env NOT IN "
+                             "(SELECT env FROM environments WHERE last_used >= ?)", (cutoff,))
+                conn.execute("DELETE FROM environments WHERE last_used < ?", (cutoff,))
+                conn.execute("COMMIT")
+                conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            except sqlite3.Error:
+                try: conn.execute("ROLLBACK")
+                except sqlite3.Error: pass
+            self._stop.wait(self.COMPACT_INTERVAL_SECONDS)
+        conn.close()
+    
+    def close(self):
+        """停止后台清理线程并关闭连接（构建矩阵中每个任务结束时调用）"""
+        self._stop.set()
+        with self._lock:
+            try: self._conn.close()
+            except sqlite3.Error: pass
+    
+    def touch_env(self, env: str):
+        """记录环境分区最近一次使用时间（后台清理据此判断）"""
+        with self._lock:
+            try:
+                self._conn.execute("INSERT OR REPLACE INTO environments VALUES (?, ?)", (env, time.time()))
+            except sqlite3.Error:
+                pass
+    
+    def get(self, module_name: str, env: str = '') -> Optional[dict]:
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT available, version, time, signature FROM env_modules "
+                                         "WHERE env = ? AND name = ?", (env, module_name)).fetchone()
+            except sqlite3.Error:
+                return None
+        if not row: return None
+        available, version, ts, signature = row
+        expected = self._compute_signature(env, module_name, bool(available), version, ts)
+        if not hmac.compare_digest(signature, expected):
+            return None
+        return {'available': bool(available), 'version': version, 'time': ts}
+    
+    def set(self, module_name: str, available: bool, version: str = None, env: str = ''):
+        self._write([self._row(env, module_name, available, version, time.time())])
+    
+    def set_batch(self, results: Dict[str, dict], env: str = ''):
+        now = time.time()
+        self._write([self._row(env, name, info.get('available', False), info.get('version'), now)
+                     for name, info in results.items()])
+    
+    def clear(self):
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM env_modules"); self._conn.execute("DELETE FROM environments")
+            except sqlite3.Error:
+                pass
+
+
+class FileAnalysisCache:
+    """单文件导入分析缓存：按 路径 + 内容哈希 存储提取出的导入集合，分析器版本变化时整体失效
+    
+    每条记录带最近使用时间 used；保存时丢弃源文件已不存在的条目，并按 LRU 只保留 MAX_ENTRIES 条。
+    """
+    MAX_ENTRIES = 20000
+    USED_RESOLUTION = 24 * 3600  # 命中时 used 最多每天刷新一次，避免只读的分析也要重写缓存文件
+    _file_locks: Dict[str, threading.Lock] = {}  # 同一进程内（构建矩阵的任务线程）按缓存文件串行化“读-合并-替换”
     
-    def _load_cache(self) -> dict:
+    def __init__(self, cache_file: str = None):
+        if cache_file is None:
+            cache_file = os.path.join(get_cache_dir(), "analysis_cache.json")
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._cleared = False
+        self.hits = 0
+        self.misses = 0
+        self.entries: Dict[str, dict] = self._load()
+    
+    def _load(self) -> Dict[str, dict]:
         try:
             if os.path.exists(self.cache_file):
                 with open(self.cache_file, 'r', encoding='utf-8') as f:
                     container = json.load(f)
-                data = container.get('data', {})
-                stored_sig = container.get('signature', '')
-                if self._compute_signature(data) == stored_sig:
-                    return data
+                if container.get('version') == ANALYZER_VERSION:
+                    return container.get('files', {})
         except Exception:
             pass
-        return {'modules': {}, 'timestamp': time.time()}
+        return {}
     
-    def _save_cache(self):
-        try:
-            container = {
-                'data': self.cache,
-                'signature': self._compute_signature(self.cache)
-            }
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(container, f, indent=2)
-        except Exception:
-            pass
+    def lookup(self, filepath: str, content_hash: str) -> Optional[dict]:
+        with self._lock:
+            entry = self.entries.get(os.path.abspath(filepath))
+            if entry and entry.get('hash') == content_hash:
+                self.hits += 1
+                now = time.time()
+                if now - entry.get('used', 0) > self.USED_RESOLUTION:
+                    entry['used'] = now; self._dirty = True
+                return entry['result']
+            self.misses += 1
+            return None
     
-    def get(self, module_name: str) -> Optional[dict]:
-        cached = self.cache.get('modules', {}).get(module_name)
-        if cached:
-            if time.time() - cached.get('time', 0) < self.CACHE_EXPIRY_SECONDS:
-                return cached
-        return None
+    def store(self, filepath: str, content_hash: str, result: dict):
+        with self._lock:
+            self.entries[os.path.abspath(filepath)] = {'hash': content_hash, 'result': result, 'used': time.time()}
+            self._dirty = True
     
-    def set(self, module_name: str, available: bool, version: str = None):
-        if 'modules' not in self.cache: self.cache['modules'] = {}
-        self.cache['modules'][module_name] = {
-            'available': available, 'version': version, 'time': time.time()
-        }
-        self._save_cache()
-    
-    def set_batch(self, results: Dict[str, dict]):
-        if 'modules' not in self.cache: self.cache['modules'] = {}
-        for name, info in results.items():
-            self.cache['modules'][name] = {
-                'available': info.get('available', False),
-                'version': info.get('version'),
-                'time': time.time()
-            }
-        self._save_cache()
+    def save(self):
+        """有变更时原子写回（先写唯一临时文件再替换）；并发写入者（如构建矩阵中的其他任务）已保存的条目会被合并保留"""
+        file_lock = FileAnalysisCache._file_locks.setdefault(os.path.abspath(self.cache_file), threading.Lock())
+        with self._lock, file_lock:
+            if not self._dirty: return
+            tmp = None
+            try:
+                if not self._cleared:
+                    for path, entry in self._load().items(): self.entries.setdefault(path, entry)
+                self._prune()
+                fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.cache_file) + '.', suffix='.tmp',
+                                           dir=os.path.dirname(self.cache_file) or '.')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'version': ANALYZER_VERSION, 'files': self.entries}, f)
+                os.replace(tmp, self.cache_file)
+                self._dirty = self._cleared = False
+            except Exception:
+                if tmp and os.path.exists(tmp): os.remove(tmp)
+    
+    def _prune(self):
+        """去掉已删除/改名的源文件；超出 MAX_ENTRIES 时淘汰最久未用的条目"""
+        self.entries = {p: e for p, e in self.entries.items() if os.path.exists(p)}
+        if len(self.entries) > self.MAX_ENTRIES:
+            keep = sorted(self.entries, key=lambda p: self.entries[p].get('used', 0), reverse=True)[:self.MAX_ENTRIES]
+            self.entries = {p: self.entries[p] for p in keep}
+    
+    def reset_stats(self):
+        self.hits = self.misses = 0
+    
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries)}
     
     def clear(self):
-        self.cache = {'modules': {}, 'timestamp': time.time()}
-        self._save_cache()
+        with self._lock:
+            self.entries = {}; self._dirty = self._cleared = True
+        self.reset_stats()
+        self.save()
+
+
+def read_source_file(filepath: str) -> str:
+    """读取源文件（依次尝试 utf-8 / gbk / latin-1）"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f: return f.read()
+    except UnicodeDecodeError:
+        try:
+            with open(filepath, 'r', encoding='gbk') as f: return f.read()
+        except Exception:
+            with open(filepath, 'r', encoding='latin-1') as f: return f.read()
+
+
+def _analyze_file_worker(filepath: str) -> dict:
+    """进程池任务：分析单个文件，返回可序列化的结果"""
+    analyzer = AdvancedImportAnalyzer()
+    res = analyzer.analyze_file(filepath)
+    out = {k: sorted(res[k]) for k in ('imports', 'from_imports', 'dynamic', 'conditional')}
+    out['records'] = [list(r) for r in analyzer.import_records]
+    return out
 
 
 class AdvancedImportAnalyzer:
-    """高级导入分析器"""
-    def __init__(self):
+    """高级导入分析器
+    
+    单文件分析默认用单遍词法扫描：字符串与注释整体跳过（其中的 "import x" 不会被当成导入），
+    只在语句开头识别 import / from，并识别 __import__( / import_module( 调用；
+    包在 except ImportError（或 Exception / 裸 except）的 try 体内、以及 if TYPE_CHECKING / if typing.TYPE_CHECKING
+    分支体内的导入记为 conditional（可选）；if not TYPE_CHECKING、TYPE_CHECKING or X 等条件与 else 分支照常视为必需。
+    源码出现词法异常（如不成对的引号）时退回 AST，只遍历语句节点。
+    """
+    PARALLEL_THRESHOLD = 16  # 待解析文件少于此数时不启动进程池
+    # 扫描模式：每次匹配先整段吞掉“无关”内容（普通代码、字符串、注释），只在关心的记号处停下，
+    # 这样 re 引擎内部跑完大部分文本，Python 层只处理导入相关的少量匹配。
+    # 字符串前缀（r/b/f/u）不影响字面量在哪结束，直接从引号开始匹配即可。
+    _SCAN_STRING = (r"'''[^'\\]*(?:(?:\\[\s\S]|'(?!''))[^'\\]*)*'''"
+                    r'|"""[^"\\]*(?:(?:\\[\s\S]|"(?!""))[^"\\]*)*"""'
+                    r"|'[^'\\\n]*(?:\\[\s\S][^'\\\n]*)*'|\"[^\"\\\n]*(?:\\[\s\S][^\"\\\n]*)*\"")
+    _SCAN_BLOCK = r"try(?=[ \t]*:)|except\b|finally(?=[ \t]*:)|(?:el)?if[ \t]+(?:typing\.)?TYPE_CHECKING[ \t]*(?=:)"
+    _SCAN_PATTERN = re.compile(
+        r"(?:[^'\"#\n;:_i]+|" + _SCAN_STRING + r"|#[^\n]*"
+        r"|\n(?![ \t]*(?:" + _SCAN_BLOCK + r"|(?:import|from)\b))|[;:](?![ \t]*(?:import|from)\b)"
+        r"|(?<=\w)[_i]|_(?!_import__[ \t]*\()|i(?!mport_module[ \t]*\())*"
+        r"(?:(?P<dyn>(?:__import__|import_module)[ \t]*\()"
+        r"|\n(?P<ind>[ \t]*)(?:(?P<blk>" + _SCAN_BLOCK + r")|(?P<stmt>import|from)\b)"
+        r"|[;:][ \t]*(?P<inl>import|from)\b|(?P<bad>['\"])|\Z)")
+    _LINE_SPECIAL = re.compile(r'[(#;\\]')
+    _FROM_PATTERN = re.compile(r'^\s*(\.*)\s*([\w.]*)\s+import\b(.*)$', re.S)
+    _NAME_PATTERN = re.compile(r'^[A-Za-z_][\w.]*$')
+    _LITERAL_ARG = re.compile(r'\s*[rRuU]?(?:"([^"\\\n]*)"|\'([^\'\\\n]*)\')\s*([,)])')
+    _PACKAGE_ARG = re.compile(r'^\s*(?:package\s*=\s*)?(?:[rRuU]?(?:"([\w.]+)"|\'([\w.]+)\')|(__package__|__name__|__spec__\.parent))')
+    _FROMLIST_ARG = re.compile(r'[\[(]\s*((?:[rRuU]?["\'][\w.*]*["\']\s*,?\s*)+)[\])]')
+    _LEVEL_ARG = re.compile(r'(?:level\s*=\s*|,\s*)(\d+)\s*$')
+    _GUARD_EXCEPTIONS = re.compile(r'\b(?:ImportError|ModuleNotFoundError|Exception|BaseException)\b')
+    
+    def __init__(self, cache: Optional[FileAnalysisCache] = None):
+        self.cache = cache
+        self._reset()
+    
+    def _reset(self):
         self.imports: Set[str] = set()
         self.from_imports: Set[str] = set()
         self.dynamic_imports: Set[str] = set()
         self.conditional_imports: Set[str] = set()
         self.all_modules: Set[str] = set()
+        # (模块名, 相对层级, 导入的名称) —— 用于解析本地/相对导入
+        self.import_records: List[Tuple[str, int, Tuple[str, ...]]] = []
     
     def analyze_file(self, filepath: str) -> Dict[str, Set[str]]:
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f: source = f.read()
-        except UnicodeDecodeError:
+        return self.analyze_source(read_source_file(filepath))
+    
+    def analyze_source(self, source: str, mode: str = 'auto') -> Dict[str, Set[str]]:
+        """mode: auto（扫描，词法异常时退回 AST）/ scan / ast"""
+        self._reset()
+        if mode == 'ast' or (not self._scan(source) and mode == 'auto'):
             try:
-                with open(filepath, 'r', encoding='gbk') as f: source = f.read()
-            except Exception:
-                with open(filepath, 'r', encoding='latin-1') as f: source = f.read()
-        
-        try:
-            tree = ast.parse(source)
-            self._visit_tree(tree)
-        except SyntaxError: pass
-        self._regex_analysis(source)
+                tree = ast.parse(source)
+                self._reset(); self._visit_tree(tree, source)
+            except SyntaxError:
+                if mode == 'ast': pass
+                else: self._reset(); self._scan(source, strict=False)  # 语法错误：尽力扫描
         self.all_modules = (self.imports | self.from_imports | self.dynamic_imports | self.conditional_imports)
         return {'imports': self.imports, 'from_imports': self.from_imports, 
                 'dynamic': self.dynamic_imports, 'conditional': self.conditional_imports, 
                 'all': self.all_modules}
     
-    def _visit_tree(self, tree: ast.AST):
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names: self._add_import(alias.name, self.imports)
-            elif isinstance(node, ast.ImportFrom):
-                if node.module:
-                    self._add_import(node.module, self.from_imports)
-                    self._add_import(node.module.split('.')[0], self.from_imports)
-            elif isinstance(node, ast.Call):
-                self._check_dynamic_import(node)
+    def analyze_project(self, entry_file: str, parallel: bool = True,
+                        max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """从入口文件出发，沿本地/相对导入遍历整个项目，返回模块图
+        
+        返回值在 analyze_file 的基础上增加：
+        modules: 本地模块名 -> 文件(相对项目根目录)
+        edges:   本地模块名 -> 它导入的本地模块名列表
+        origins: 第三方导入名 -> 出现该导入的文件集合
+        local:   本地顶层包/模块名（不应作为第三方依赖检查）
+        local_dynamic: 以字符串动态导入的本地模块（PyInstaller 无法静态发现）
+        cache:   本次分析的缓存命中统计（仅在设置了 cache 时）
+        """
+        root = os.path.dirname(os.path.abspath(entry_file))
+        entry_path = os.path.abspath(entry_file)
+        entry_mod = os.path.splitext(os.path.basename(entry_path))[0]
+        resolved: Dict[str, Optional[str]] = {}
+        local_tops: Dict[str, bool] = {}
+        
+        def resolve(name: str) -> Optional[str]:
+            if name not in resolved:
+                base = os.path.join(root, *name.split('.'))
+                path = None
+                if os.path.isfile(base + '.py'): path = base + '.py'
+                elif os.path.isfile(os.path.join(base, '__init__.py')): path = os.path.join(base, '__init__.py')
+                resolved[name] = path
+            return resolved[name]
+        
+        def is_local(name: str) -> bool:
+            top = name.split('.')[0]
+            if top not in local_tops:
+                base = os.path.join(root, top)
+                local_tops[top] = top == entry_mod or os.path.isfile(base + '.py') or os.path.isdir(base)
+            return local_tops[top]
+        
+        modules: Dict[str, str] = {entry_mod: entry_path}
+        edges: Dict[str, Set[str]] = {}
+        origins: Dict[str, Set[str]] = {}
+        local_dynamic: Set[str] = set()
+        merged = {k: set() for k in ('imports', 'from_imports', 'dynamic', 'conditional')}
+        pending = [entry_mod]
+        executor = None
+        workers = max_workers or min(os.cpu_count() or 1, 8)
+        if self.cache: self.cache.reset_stats()
+        try:
+            while pending:
+                paths = [modules[m] for m in pending]
+                file_results: List[Optional[dict]] = [None] * len(paths)
+                hashes = {}
+                if self.cache:
+                    for i, p in enumerate(paths):
+                        try: hashes[p] = file_sha256(p)
+                        except OSError: continue
+                        file_results[i] = self.cache.lookup(p, hashes[p])
+                todo = [p for p, r in zip(paths, file_results) if r is None]
+                if parallel and len(todo) >= self.PARALLEL_THRESHOLD:
+                    if executor is None:
+                        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+                    try:
+                        chunk = max(1, len(todo) // (workers * 4))
+                        parsed = list(executor.map(_analyze_file_worker, todo, chunksize=chunk))
+                    except Exception:
+                        # 进程池不可用（如冻结环境受限）时退回串行
+                        executor.shutdown(wait=False); executor = None; parallel = False
+                        parsed = [_analyze_file_worker(p) for p in todo]
+                else:
+                    parsed = [_analyze_file_worker(p) for p in todo]
+                fresh = iter(parsed)
+                for i, p in enumerate(paths):
+                    if file_results[i] is None:
+                        file_results[i] = next(fresh)
+                        if self.cache and p in hashes: self.cache.store(p, hashes[p], file_results[i])
+                
+                next_pending = []
+                for mod, path, fres in zip(pending, paths, file_results):
+                    rel = os.path.relpath(path, root)
+                    is_pkg = os.path.basename(path) == '__init__.py'
+                    for key in merged:
+                        for name in fres[key]:
+                            if is_local(name):
+                                if key == 'dynamic' and resolve(name): local_dynamic.add(name)
+                                continue
+                            merged[key].add(name)
+                            origins.setdefault(name, set()).add(rel)
+                    targets = edges.setdefault(mod, set())
+                    for module, level, names in fres['records']:
+                        for cand in self._record_candidates(mod, is_pkg, module, level, names):
+                            parts = cand.split('.')
+                            for i in range(1, len(parts) + 1):
+                                name = '.'.join(parts[:i])
+                                target = resolve(name)
+                                if not target: continue
+                                targets.add(name)
+                                if name not in modules:
+                                    modules[name] = target; next_pending.append(name)
+                pending = next_pending
+        finally:
+            if executor is not None: executor.shutdown()
+            if self.cache: self.cache.save()
+        
+        self._reset()
+        self.imports, self.from_imports = merged['imports'], merged['from_imports']
+        self.dynamic_imports, self.conditional_imports = merged['dynamic'], merged['conditional']
+        self.all_modules = (self.imports | self.from_imports | self.dynamic_imports | self.conditional_imports)
+        return {'imports': self.imports, 'from_imports': self.from_imports,
+                'dynamic': self.dynamic_imports, 'conditional': self.conditional_imports,
+                'all': self.all_modules, 'root': root, 'entry': entry_mod,
+                'modules': {m: os.path.relpath(p, root) for m, p in modules.items()},
+                'edges': {m: sorted(t) for m, t in edges.items()},
+                'origins': origins,
+                'local': {m.split('.')[0] for m in modules},
+                'local_dynamic': local_dynamic,
+                'cache': self.cache.stats() if self.cache else {}}
+    
+    @staticmethod
+    def _record_candidates(mod: str, is_pkg: bool, module: str, level: int, names) -> List[str]:
+        """把一条导入记录解析为绝对模块名候选（含 from X import 子模块 的情况）"""
+        if level:
+            pkg_parts = mod.split('.') if is_pkg else mod.split('.')[:-1]
+            if level - 1 > len(pkg_parts): return []
+            base_parts = pkg_parts[:len(pkg_parts) - (level - 1)]
+            if module: base_parts = base_parts + [module]
+            base = '.'.join(base_parts)
+        else:
+            base = module
+        cands = [base] if base else []
+        cands += [f"{base}.{n}" if base else n for n in names if n != '*']
+        return cands
+    
+    # ---------- 公共记录 ----------
+    
+    def _record_import(self, names: List[str], guarded: bool):
+        for name in names:
+            self._add_import(name, self.conditional_imports if guarded else self.imports)
+            self.import_records.append((name, 0, ()))
+    
+    def _record_from(self, module: str, level: int, names: Tuple[str, ...], guarded: bool):
+        self.import_records.append((module, level, names))
+        if module and not level:
+            self._add_import(module, self.conditional_imports if guarded else self.from_imports)
+    
+    def _record_dynamic(self, func: str, name: str, package: Optional[str] = None,
+                        fromlist: Tuple[str, ...] = (), level: int = 0):
+        """import_module(name, package) / __import__(name, ..., fromlist, level)；package=None 表示当前包"""
+        if not name: return
+        if func == 'import_module' and name.startswith('.'):
+            dots = len(name) - len(name.lstrip('.')); rest = name[dots:]
+            if package is None:
+                self.import_records.append((rest, dots, ()))  # 相对当前包，与 from .x import 相同
+                return
+            parts = package.split('.')
+            if dots - 1 > len(parts): return
+            name = '.'.join(parts[:len(parts) - (dots - 1)] + ([rest] if rest else []))
+        elif level:
+            self.import_records.append((name, level, fromlist))
+            return
+        self._add_import(name, self.dynamic_imports)
+        self.import_records.append((name, 0, fromlist))
+    
+    # ---------- 单遍词法扫描 ----------
+    
+    @staticmethod
+    def _logical_line(source: str, pos: int, depth: int = 0) -> str:
+        return AdvancedImportAnalyzer._logical_span(source, pos, depth)[0]
+    
+    @staticmethod
+    def _logical_span(source: str, pos: int, depth: int = 0) -> Tuple[str, int]:
+        """从 pos 起取到逻辑行结束（括号内换行 / 反斜杠续行），去掉注释，在顶层 ';' 处截断；depth 为起始括号深度
+        
+        返回 (文本, 结束位置)；续行里以 import / from 开头的物理行属于这条语句，扫描时要跳过。
+        """
+        nl = source.find('\n', pos)
+        if nl < 0: nl = len(source)
+        line = source[pos:nl]
+        if not depth and not AdvancedImportAnalyzer._LINE_SPECIAL.search(line): return line, nl  # 绝大多数导入只占一行
+        parts, n = [], len(source)
+        while True:
+            nl = source.find('\n', pos)
+            if nl < 0: nl = n
+            segment = source[pos:nl]
+            cut = segment.find('#')
+            if cut >= 0: segment = segment[:cut]
+            if depth == 0 and ';' in segment:
+                parts.append(segment.split(';', 1)[0]); nl = pos + segment.index(';'); break
+            depth += segment.count('(') - segment.count(')')
+            parts.append(segment.rstrip().rstrip('\\'))
+            if nl >= n or not (depth > 0 or segment.rstrip().endswith('\\')): break
+            pos = nl + 1
+        return ' '.join(parts), nl
+    
+    @staticmethod
+    def _block_end(source: str, pos: int, indent: int) -> int:
+        """pos 所在块之后第一个缩进 <= indent 的非空行的位置"""
+        n = len(source)
+        while True:
+            nl = source.find('\n', pos)
+            if nl < 0: return n
+            pos = nl + 1
+            line = source[pos:source.find('\n', pos) if source.find('\n', pos) >= 0 else n]
+            stripped = line.lstrip(' \t')
+            if stripped and not stripped.startswith('#') and len(line) - len(stripped) <= indent: return pos
+    
+    def _scan(self, source: str, strict: bool = True) -> bool:
+        """单遍扫描；遇到词法异常返回 False（调用方退回 AST），strict=False 时把孤立引号当普通字符继续
+        
+        try 体的范围不需要逐行跟踪缩进：try 之后第一个与它同缩进的语句必然是它的 except / finally，
+        而 except 总属于它之前最近的同缩进 try。
+        """
+        if 'import' not in source: return True
+        source = '\n' + source  # 让第一行也以换行开头
+        open_tries: List[int] = []
+        last_try: Dict[str, int] = {}
+        guard_tries: Set[int] = set()
+        type_checking: List[Tuple[int, int]] = []
+        pending = []  # (语句文本, 所在 try 列表, 位置)
+        n_tries = 0
+        statement_end = 0  # 上一条导入语句（含反斜杠续行 / 括号换行）的结束位置
+        for m in self._SCAN_PATTERN.finditer(source):
+            kind = m.lastgroup
+            if kind is None: break
+            if kind == 'bad':
+                if strict: return False
+                continue
+            if kind != 'dyn' and m.start(kind) < statement_end: continue  # 续行，不是新语句的开头
+            if kind == 'stmt' or kind == 'inl':
+                text, statement_end = self._logical_span(source, m.end())
+                pending.append((m.group(kind) + ' ' + text, tuple(open_tries), m.start(kind)))
+            elif kind == 'dyn':
+                self._scan_dynamic(source, m)
+            elif kind == 'blk':
+                indent, word = m.group('ind'), m.group('blk')
+                if word.startswith('try'):
+                    n_tries += 1; open_tries.append(n_tries); last_try[indent] = n_tries
+                elif word.startswith(('if', 'elif')):
+                    type_checking.append((m.end(), self._block_end(source, m.end(), len(indent))))
+                else:
+                    owner = last_try.get(indent)
+                    if owner in open_tries: open_tries.remove(owner)
+                    if word == 'except':
+                        clause = self._logical_line(source, m.end()).split(':', 1)[0]
+                        if not clause.strip() or self._GUARD_EXCEPTIONS.search(clause): guard_tries.add(owner)
+        for text, tries, pos in pending:
+            guarded = any(t in guard_tries for t in tries) or any(a <= pos < b for a, b in type_checking)
+            if text.startswith('import'):
+                names = [seg.split()[0] for seg in text[6:].split(',') if seg.split()]
+                self._record_import([nm for nm in names if self._NAME_PATTERN.match(nm)], guarded)
+            else:
+                fm = self._FROM_PATTERN.match(text[4:])
+                if not fm: continue
+                names = tuple(seg.split()[0] for seg in fm.group(3).replace('(', ' ').replace(')', ' ').split(',')
+                              if seg.split())
+                self._record_from(fm.group(2), len(fm.group(1)), names, guarded)
+        return True
+    
+    def _scan_dynamic(self, source: str, m):
+        func = '__import__' if m.group('dyn').startswith('__import__') else 'import_module'
+        arg = self._LITERAL_ARG.match(source, m.end())
+        if not arg: return  # 非字面量参数无法静态确定
+        name = arg.group(1) if arg.group(1) is not None else arg.group(2)
+        if arg.group(3) == ')':
+            self._record_dynamic(func, name); return
+        rest = self._logical_line(source, arg.end(), depth=1)
+        depth, end = 1, len(rest)
+        for i, ch in enumerate(rest):
+            depth += (ch == '(') - (ch == ')')
+            if depth == 0: end = i; break
+        rest = rest[:end]
+        if func == 'import_module':
+            pm = self._PACKAGE_ARG.match(rest)
+            package = (pm.group(1) or pm.group(2)) if pm and not pm.group(3) else None
+            self._record_dynamic(func, name, package)
+        else:
+            fl = self._FROMLIST_ARG.search(rest)
+            fromlist = tuple(re.findall(r'["\']([\w.*]*)["\']', fl.group(1))) if fl else ()
+            lv = self._LEVEL_ARG.search(rest)
+            self._record_dynamic(func, name, fromlist=fromlist, level=int(lv.group(1)) if lv else 0)
+    
+    # ---------- AST 退路：只遍历语句节点 ----------
+    
+    @classmethod
+    def _guards_import(cls, handler: ast.ExceptHandler) -> bool:
+        if handler.type is None: return True
+        names = [n.id if isinstance(n, ast.Name) else getattr(n, 'attr', '')
+                 for n in (handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type])]
+        return any(cls._GUARD_EXCEPTIONS.fullmatch(name or '') for name in names)
+    
+    @staticmethod
+    def _is_type_checking(test: ast.expr) -> bool:
+        """只认 TYPE_CHECKING 与 typing.TYPE_CHECKING 本身，与扫描器一致"""
+        if isinstance(test, ast.Name): return test.id == 'TYPE_CHECKING'
+        return (isinstance(test, ast.Attribute) and test.attr == 'TYPE_CHECKING'
+                and isinstance(test.value, ast.Name) and test.value.id == 'typing')
+    
+    def _visit_tree(self, tree: ast.AST, source: str = ''):
+        def visit(body, guarded):
+            for node in body:
+                if isinstance(node, ast.Import):
+                    self._record_import([alias.name for alias in node.names], guarded)
+                elif isinstance(node, ast.ImportFrom):
+                    self._record_from(node.module or '', node.level, tuple(a.name for a in node.names), guarded)
+                elif isinstance(node, ast.Try) or type(node).__name__ == 'TryStar':
+                    visit(node.body, guarded or any(self._guards_import(h) for h in node.handlers))
+                    for h in node.handlers: visit(h.body, guarded)
+                    visit(node.orelse, guarded); visit(node.finalbody, guarded)
+                elif isinstance(node, ast.If) and self._is_type_checking(node.test):
+                    visit(node.body, True); visit(node.orelse, guarded)
+                else:
+                    for field in ('body', 'orelse', 'finalbody'):
+                        stmts = getattr(node, field, None)
+                        if isinstance(stmts, list): visit(stmts, guarded)
+                    for case in getattr(node, 'cases', ()): visit(case.body, guarded)
+        visit(tree.body, False)
+        if '__import__' in source or 'import_module' in source or not source:
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Call): self._check_dynamic_import(node)
     
     def _add_import(self, name: str, target: Set[str]):
         if not name: return
@@ -407,133 +1013,2935 @@ class AdvancedImportAnalyzer:
         for i in range(1, len(parts)): target.add('.'.join(parts[:i+1]))
     
     def _check_dynamic_import(self, node: ast.Call):
-        if isinstance(node.func, ast.Name) and node.func.id == '__import__':
-            if node.args and isinstance(node.args[0], ast.Constant):
-                self._add_import(str(node.args[0].value), self.dynamic_imports)
-        elif isinstance(node.func, ast.Attribute):
-            if node.func.attr == 'import_module':
-                if node.args and isinstance(node.args[0], ast.Constant):
-                    self._add_import(str(node.args[0].value), self.dynamic_imports)
-    
-    def _regex_analysis(self, source: str):
-        patterns = [r'^\s*import\s+([\w\.]+)', r'^\s*from\s+([\w\.]+)\s+import',
-                    r'__import__\s*\(\s*[\'"]([^\'"]+)[\'"]', r'import_module\s*\(\s*[\'"]([^\'"]+)[\'"]']
-        for pattern in patterns:
-            for match in re.finditer(pattern, source, re.MULTILINE):
-                if match.group(1) and not match.group(1).startswith('_'):
-                    self._add_import(match.group(1), self.conditional_imports)
+        func = node.func.id if isinstance(node.func, ast.Name) else getattr(node.func, 'attr', None)
+        if func not in ('__import__', 'import_module'): return
+        if not node.args or not isinstance(node.args[0], ast.Constant) or not isinstance(node.args[0].value, str): return
+        args = {kw.arg: kw.value for kw in node.keywords}
+        const = lambda v: v.value if isinstance(v, ast.Constant) else None
+        if func == 'import_module':
+            package = args.get('package', node.args[1] if len(node.args) > 1 else None)
+            self._record_dynamic(func, node.args[0].value, const(package) if isinstance(const(package), str) else None)
+        else:
+            fromlist = args.get('fromlist', node.args[3] if len(node.args) > 3 else None)
+            names = tuple(const(e) for e in getattr(fromlist, 'elts', ()) if isinstance(const(e), str))
+            level = const(args.get('level', node.args[4] if len(node.args) > 4 else None))
+            self._record_dynamic(func, node.args[0].value, fromlist=names, level=level if isinstance(level, int) else 0)
+
+
+def generate_benchmark_source(size_bytes: int) -> str:
+    """生成约 size_bytes 的合成源码：普通/相对/可选导入、动态导入，以及字符串、文档、注释里的“伪导入”"""
+    chunks, total, i = [], 0, 0
+    while total < size_bytes:
+        chunk = (
+            f'"""Section {i}: import fake_doc_{i}\nfrom fake_docfrom_{i} import thing\n"""\n'
+            f'import os, sys as _sys_{i}\nfrom collections import (OrderedDict,\n    defaultdict as dd_{i})\n'
+            f'from json \\\n    import dumps as dumps_{i}\nimport string, \\\n    textwrap\n'
+            f'from .pkg_{i % 7} import helper_{i}\n'
+            f'try:\n    import optional_mod_{i % 13}\nexcept ImportError:\n    optional_mod_{i % 13} = None\n'
+            f'# import fake_comment_{i}\n'
+            f'class Widget{i}:\n    """Render widget {i}; see `import fake_class_doc`."""\n'
+            f'    LABELS = {[f"label {i}-{k} from x import y" for k in range(8)]!r}\n'
+            f'    def draw(self, surface, x={i}, y={i * 2}):\n'
+            f'        import lazy_mod_{i % 11}\n'
+            f'        plugin = importlib.import_module("plugins.p{i % 17}")\n'
+            f'        text = \'import fake_str_{i}\' + "from a import b"\n'
+            f'        for k in range({i % 50}):\n            surface.blit(text, (x + k * 3, y - k), flags=0x{i:04x})\n'
+            f'        return {{"id": {i}, "name": "w{i}", "values": [k * {i} for k in range(10)]}}\n\n'
+        )
+        chunks.append(chunk); total += len(chunk); i += 1
+    return 'import importlib\n' + ''.join(chunks)
+
+
+def benchmark_import_analyzer(size_mb: float = 4.0, repeat: int = 3) -> List[Dict[str, Any]]:
+    """在生成的大源码上比较：单遍扫描 / AST 语句遍历 / 旧实现基线（ast.walk 全节点 + 4 遍正则）"""
+    source = generate_benchmark_source(int(size_mb * 1024 * 1024))
+    legacy_patterns = [re.compile(p, re.M) for p in (
+        r'^\s*import\s+([\w\.]+)', r'^\s*from\s+([\w\.]+)\s+import',
+        r'__import__\s*\(\s*[\'"]([^\'"]+)[\'"]', r'import_module\s*\(\s*[\'"]([^\'"]+)[\'"]')]
+    
+    def legacy():
+        found = set()
+        for node in ast.walk(ast.parse(source)):
+            if isinstance(node, ast.Import): found.update(a.name for a in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module: found.add(node.module)
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'import_module':
+                if node.args and isinstance(node.args[0], ast.Constant): found.add(str(node.args[0].value))
+        for pattern in legacy_patterns:
+            found.update(m.group(1) for m in pattern.finditer(source))
+        return found
+    
+    def timed(fn):
+        best, result = float('inf'), None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter(); result = fn(); best = min(best, time.perf_counter() - start)
+        return best, result
+    
+    rows = []
+    scan_time, scan_res = timed(lambda: AdvancedImportAnalyzer().analyze_source(source, 'scan'))
+    ast_time, ast_res = timed(lambda: AdvancedImportAnalyzer().analyze_source(source, 'ast'))
+    legacy_time, legacy_res = timed(legacy)
+    mb = len(source) / 1024 / 1024
+    for name, seconds, modules in (("单遍扫描", scan_time, scan_res['all']), ("AST 语句遍历", ast_time, ast_res['all']),
+                                   ("旧实现基线", legacy_time, legacy_res)):
+        rows.append({'name': name, 'seconds': seconds, 'mb_per_s': mb / seconds if seconds else 0.0,
+                     'speedup': legacy_time / seconds if seconds else 0.0, 'modules': len(modules),
+                     'fake': sum(1 for m in modules if m.split('.')[0].startswith('fake_'))})
+    rows[0]['matches_ast'] = all(scan_res[k] == ast_res[k] for k in ('imports', 'from_imports', 'dynamic', 'conditional'))
+    return rows
+
+
+# 探测进程：只用 find_spec + importlib.metadata，不执行任何包代码。
+# 协议：stdin 每行一个 JSON 请求 {"id", "op", "modules"}，stdout 每行一个 JSON 响应。
+PROBE_WORKER_SCRIPT = '''
+import sys, json, importlib, importlib.util
+try:
+    import importlib.metadata as md
+except Exception:
+    md = None
+
+def probe(modules):
+    importlib.invalidate_caches()
+    dists = {}
+    if md is not None and hasattr(md, 'packages_distributions'):
+        try: dists = md.packages_distributions()
+        except Exception: pass
+    results = {}
+    for m in modules:
+        try:
+            spec = importlib.util.find_spec(m)
+        except Exception as e:
+            results[m] = {'available': False, 'version': None, 'error': str(e)}; continue
+        if spec is None:
+            results[m] = {'available': False, 'version': None}; continue
+        version = 'N/A'
+        if md is not None:
+            for dist in dists.get(m, []) + [m]:
+                try: version = md.version(dist); break
+                except Exception: pass
+        results[m] = {'available': True, 'version': str(version)}
+    return results
+
+for line in sys.stdin:
+    req = {}
+    try:
+        req = json.loads(line)
+        if req.get('op') == 'probe': resp = {'id': req.get('id'), 'results': probe(req['modules'])}
+        else: resp = {'id': req.get('id'), 'ok': True}
+    except Exception as e:
+        resp = {'id': req.get('id'), 'error': str(e)}
+    sys.stdout.write(json.dumps(resp) + '\\n'); sys.stdout.flush()
+'''
+
+# 分片检查脚本：逐个模块检查并逐行输出结果，父进程据此实现单模块超时与崩溃隔离。
+# argv[1] 为模块列表(JSON)，argv[2] 为 probe(仅探测) 或 import(深度验证：真正导入)
+STREAM_CHECK_SCRIPT = '''
+import sys, json, importlib, importlib.util
+out = sys.stdout; sys.stdout = sys.stderr  # 被检查模块的打印不干扰协议
+try:
+    import importlib.metadata as md
+except Exception:
+    md = None
+dists = None
+
+def version_of(m, mod=None):
+    global dists
+    v = getattr(mod, '__version__', None) if mod is not None else None
+    if not v and md is not None:
+        if dists is None:
+            try: dists = md.packages_distributions()
+            except Exception: dists = {}
+        for dist in dists.get(m, []) + [m]:
+            try: v = md.version(dist); break
+            except Exception: pass
+    return str(v) if v else 'N/A'
+
+deep = sys.argv[2] == 'import'
+for m in json.loads(sys.argv[1]):
+    out.write(json.dumps({'start': m}) + '\\n'); out.flush()
+    try:
+        if deep: info = {'available': True, 'version': version_of(m, __import__(m))}
+        elif importlib.util.find_spec(m) is None: info = {'available': False, 'version': None}
+        else: info = {'available': True, 'version': version_of(m)}
+    except BaseException as e:
+        info = {'available': False, 'version': None, 'error': str(e)}
+    info['module'] = m
+    out.write(json.dumps(info) + '\\n'); out.flush()
+'''
+
+
+class ProbeWorker:
+    """目标解释器上的常驻探测进程，摊薄每次检查的解释器启动开销
+    
+    进程崩溃、超时或环境指纹变化时自动重启。
+    """
+    def __init__(self, python_exe: str):
+        self.python_exe = python_exe
+        self._proc: Optional[subprocess.Popen] = None
+        self._lines: Optional[queue.Queue] = None
+        self._env: Optional[str] = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+    
+    def _start(self, env: str):
+        self._proc = subprocess.Popen([self.python_exe, '-u', '-c', PROBE_WORKER_SCRIPT],
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                      text=True, encoding='utf-8', bufsize=1)
+        self._lines = queue.Queue()
+        threading.Thread(target=self._reader, args=(self._proc, self._lines), daemon=True).start()
+        self._env = env
+    
+    @staticmethod
+    def _reader(proc: subprocess.Popen, lines: queue.Queue):
+        for line in proc.stdout: lines.put(line)
+        lines.put(None)
+    
+    def stop(self):
+        proc, self._proc = self._proc, None
+        if proc is None: return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=2)
+        except Exception:
+            proc.kill()
+    
+    def request(self, payload: dict, env: str, timeout: float = 60) -> dict:
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None or env != self._env:
+                self.stop(); self._start(env)
+            self._next_id += 1
+            payload = dict(payload, id=self._next_id)
+            try:
+                self._proc.stdin.write(json.dumps(payload) + '\n'); self._proc.stdin.flush()
+            except OSError:
+                self.stop(); raise
+            deadline = time.time() + timeout
+            while True:
+                try:
+                    line = self._lines.get(timeout=max(0.0, deadline - time.time()))
+                except queue.Empty:
+                    self.stop(); raise TimeoutError("probe worker timeout")
+                if line is None:
+                    self.stop(); raise RuntimeError("probe worker exited")
+                try: resp = json.loads(line)
+                except ValueError: continue  # 被探测的包在导入期打印的杂项输出
+                if resp.get('id') == payload['id']:
+                    if 'error' in resp: raise RuntimeError(resp['error'])
+                    return resp
+
+
+# 已安装分发包索引：在目标解释器中运行，输出标准库名单与每个分发包的 import 名 / 版本 / 顶层路径 / 大小
+DIST_INDEX_SCRIPT = '''
+import sys, os, json
+try:
+    import importlib.metadata as md
+except ImportError:
+    md = None
+EXT = (".py", ".pyc", ".so", ".pyd")
+out = {"stdlib": sorted(set(getattr(sys, "stdlib_module_names", ())) | set(sys.builtin_module_names)),
+       "has_stdlib_names": hasattr(sys, "stdlib_module_names"), "dists": []}
+seen = set()
+for dist in (md.distributions() if md else ()):
+    try:
+        name = dist.metadata["Name"]
+        if not name or name.lower() in seen: continue
+        seen.add(name.lower())
+        imports, paths, size, count = set(), set(), 0, 0
+        top_level = dist.read_text("top_level.txt")
+        if top_level:
+            imports.update(l.strip().replace("/", ".").split(".")[0] for l in top_level.splitlines() if l.strip())
+        for f in dist.files or ():
+            parts = f.parts
+            if not parts or parts[0] in ("..", "__pycache__"): continue
+            head = parts[0]
+            paths.add(head); count += 1
+            s = f.size
+            if s is None:
+                try: s = os.path.getsize(f.locate())
+                except OSError: s = 0
+            size += s
+            if head.endswith((".dist-info", ".egg-info", ".data", ".pth")): continue
+            if len(parts) == 1:
+                if not head.endswith(EXT): continue
+                head = head.split(".")[0]
+            if head.isidentifier(): imports.add(head)
+        out["dists"].append({"name": name, "version": dist.version, "imports": sorted(imports),
+                             "paths": sorted(paths), "files": count, "size": size})
+    except Exception:
+        continue
+print(json.dumps(out))
+'''
+
+
+class DistributionIndex:
+    """目标解释器中已安装分发包的索引，按环境指纹缓存在 ~/.game_packer_cache/dist_index/<指纹>.json
+    
+    import 名 ↔ 分发名 ↔ 版本 ↔ 顶层安装路径 ↔ 文件数 / 磁盘占用，import 名取自 top_level.txt 与 RECORD；
+    标准库名单取目标解释器的 sys.stdlib_module_names（3.10 之前退回 STDLIB_MODULES）。
+    环境变化（pip 安装/卸载）时指纹变化，索引自动重建。
+    """
+    INDEX_VERSION = 1
+    KEEP = 20
+    
+    def __init__(self, python_exe: str):
+        self.python_exe = python_exe
+        self.env: Optional[str] = None
+        self.stdlib: Set[str] = set(STDLIB_MODULES)
+        self.by_import: Dict[str, List[dict]] = {}
+        self.by_dist: Dict[str, dict] = {}
+        self.by_path: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def canonical(name: str) -> str:
+        return re.sub(r'[-_.]+', '-', name).lower()
+    
+    def ensure(self, env: Optional[str] = None) -> 'DistributionIndex':
+        env = env or get_environment_fingerprint(self.python_exe)
+        with self._lock:
+            if env != self.env:
+                self._apply(self._load_or_build(env)); self.env = env
+        return self
+    
+    def _load_or_build(self, env: str) -> Dict[str, Any]:
+        index_dir = get_cache_dir("dist_index")
+        path = os.path.join(index_dir, f"{env}.json")
+        try:
+            with open(path, 'r', encoding='utf-8') as f: data = json.load(f)
+            if data.get('version') == self.INDEX_VERSION: return data
+        except (OSError, ValueError): pass
+        try:
+            result = subprocess.run([self.python_exe, '-c', DIST_INDEX_SCRIPT], capture_output=True, text=True,
+                                    encoding='utf-8', errors='replace', timeout=120)
+            data = json.loads(result.stdout.strip().splitlines()[-1])
+        except Exception:
+            return {'stdlib': [], 'dists': []}  # 构建失败不缓存，全部退回探测
+        data['version'] = self.INDEX_VERSION
+        with open(path, 'w', encoding='utf-8') as f: json.dump(data, f)
+        old = sorted(glob.glob(os.path.join(index_dir, "*.json")), key=os.path.getmtime)[:-self.KEEP]
+        for stale in old:
+            try: os.remove(stale)
+            except OSError: pass
+        return data
+    
+    def _apply(self, data: Dict[str, Any]):
+        self.stdlib = set(data['stdlib']) | {'__main__'} if data.get('has_stdlib_names') else set(STDLIB_MODULES)
+        self.by_import, self.by_dist, self.by_path = {}, {}, {}
+        for dist in data['dists']:
+            self.by_dist.setdefault(self.canonical(dist['name']), dist)
+            for name in dist['imports']: self.by_import.setdefault(name, []).append(dist)
+            for path in dist['paths']: self.by_path.setdefault(path, dist)
+    
+    def is_stdlib(self, top: str) -> bool:
+        return top in self.stdlib
+    
+    def lookup(self, top: str) -> Optional[dict]:
+        """已安装的 import 名 → 与 check_modules 相同格式的结果；不在索引中返回 None"""
+        dists = self.by_import.get(top)
+        if not dists: return None
+        return {'available': True, 'version': dists[0]['version'], 'pip_name': dists[0]['name'], 'source': '已安装'}
+    
+    def import_name_for_path(self, path: str) -> Optional[str]:
+        """site-packages 顶层条目（如 pillow.libs、PyYAML-6.0.3.dist-info）所属包的 import 名"""
+        dist = self.by_path.get(path)
+        if not dist or not dist['imports']: return None
+        return sorted(dist['imports'], key=lambda name: name.startswith('_'))[0]
 
 
 class BatchModuleChecker:
-    def __init__(self, python_exe: str, cache: SecureDependencyCache):
+    MODULE_TIMEOUT_SECONDS = 30  # 单个模块的检查超时（导入时卡死的包只影响自己）
+    MAX_SHARDS = 4
+    
+    def __init__(self, python_exe: str, cache: SecureDependencyCache, deep_verify: bool = False):
         self.python_exe = python_exe
         self.cache = cache
+        self.deep_verify = deep_verify  # True: 实际导入验证；False: 仅探测（不执行包代码）
+        self.index = DistributionIndex(python_exe)
+        self.worker = ProbeWorker(python_exe)
+        atexit.register(self.worker.stop)
     
-    def check_modules(self, modules: Set[str], use_cache: bool = True) -> Dict[str, dict]:
+    def check_modules(self, modules: Set[str], use_cache: bool = True,
+                      on_result: Optional[Callable[[str, dict], None]] = None) -> Dict[str, dict]:
+        """检查模块可用性；on_result 在每个结果产生时立即回调（可能来自工作线程）
+        
+        标准库与已安装分发包直接查 DistributionIndex；只有索引中没有的名字（以及深度验证、
+        use_cache=False 的安装后验证）才需要探测。
+        """
         results = {}
         to_check = []
+        env = get_environment_fingerprint(self.python_exe)
+        self.cache.touch_env(env)
+        index = self.index.ensure(env)
         for module in modules:
             top = module.split('.')[0]
-            if top in STDLIB_MODULES:
+            if top in results: continue
+            if index.is_stdlib(top):
                 results[top] = {'available': True, 'version': 'stdlib', 'pip_name': '-', 'source': '标准库'}
+                if on_result: on_result(top, results[top])
                 continue
-            if use_cache:
-                cached = self.cache.get(top)
+            # 深度验证必须真正导入：不能用仅探测得到的索引/缓存结果代替
+            if use_cache and not self.deep_verify:
+                hit = index.lookup(top)
+                if hit:
+                    results[top] = hit
+                    if on_result: on_result(top, hit)
+                    continue
+                cached = self.cache.get(top, env)
                 if cached:
                     results[top] = {'available': cached['available'], 'version': cached.get('version', 'N/A'),
                                     'pip_name': PACKAGE_NAME_MAP.get(top, top), 'source': '缓存'}
+                    if on_result: on_result(top, results[top])
                     continue
             if top not in to_check: to_check.append(top)
         
         if to_check:
-            batch_results = self._batch_check(to_check)
+            batch_results = self._batch_check(to_check, env, on_result)
             results.update(batch_results)
-            self.cache.set_batch(batch_results)
+            # 超时/崩溃属于偶发情况，不写入缓存
+            self.cache.set_batch({m: r for m, r in batch_results.items() if r['source'] in ('已安装', '需要安装')}, env)
         return results
     
-    def _batch_check(self, modules: List[str]) -> Dict[str, dict]:
+    def _batch_check(self, modules: List[str], env: str = None,
+                     on_result: Optional[Callable[[str, dict], None]] = None) -> Dict[str, dict]:
         results = {}
-        check_script = '''
-import sys, json, importlib
-modules = %s
-results = {}
-for m in modules:
-    try:
-        mod = __import__(m)
-        version = getattr(mod, '__version__', None)
-        if not version:
-            try: import importlib.metadata; version = importlib.metadata.version(m)
-            except: version = 'N/A'
-        results[m] = {'available': True, 'version': str(version)}
-    except Exception as e:
-        results[m] = {'available': False, 'version': None, 'error': str(e)}
-print(json.dumps(results))
-''' % repr(modules)
-        try:
-            result = subprocess.run([self.python_exe, '-c', check_script], capture_output=True, text=True, timeout=60)
-            if result.returncode == 0 and result.stdout.strip():
-                check_results = json.loads(result.stdout.strip())
-                for module, info in check_results.items():
-                    results[module] = {
-                        'available': info.get('available', False), 'version': info.get('version', 'N/A'),
-                        'pip_name': PACKAGE_NAME_MAP.get(module, module),
-                        'source': '已安装' if info.get('available') else '需要安装'
-                    }
+        
+        def collect(module: str, info: dict):
+            results[module] = {
+                'available': info.get('available', False), 'version': info.get('version', 'N/A'),
+                'pip_name': PACKAGE_NAME_MAP.get(module, module),
+                'source': '已安装' if info.get('available') else info.get('status', '需要安装')
+            }
+            if on_result: on_result(module, results[module])
+        
+        if self.deep_verify:
+            # 导入可能卡死/崩溃：分片并发 + 单模块超时
+            self._sharded_check(modules, 'import', collect)
+        else:
+            probed = None
+            try: probed = self._probe(modules, env)
+            except Exception: pass
+            if probed is not None:
+                for module in modules:
+                    collect(module, probed.get(module, {'available': False, 'version': 'N/A'}))
             else:
-                for module in modules: results[module] = {'available': False, 'version': 'N/A', 'pip_name': module}
-        except Exception:
-            for module in modules: results[module] = {'available': False, 'version': 'N/A', 'pip_name': module}
+                self._sharded_check(modules, 'probe', collect)
         return results
-
-
-class GamePackagerV5:
-    """v5.3 智能优化版"""
     
-    def __init__(self):
-        self.root = tk.Tk()
-        self.root.title(f"EXE打包工具 v{VERSION} - 智能优化版")
-        self.root.geometry("900x850")
-        self.root.resizable(True, True)
-        self.root.minsize(800, 700)
+    def _probe(self, modules: List[str], env: str = None) -> Optional[Dict[str, dict]]:
+        """使用常驻探测进程；连续失败返回 None（由调用方退回分片检查）"""
+        if env is None: env = get_environment_fingerprint(self.python_exe)
+        for _ in range(2):
+            try:
+                return self.worker.request({'op': 'probe', 'modules': modules}, env)['results']
+            except Exception:
+                continue
+        return None
+    
+    def _sharded_check(self, modules: List[str], mode: str, collect: Callable[[str, dict], None]):
+        """把模块分到若干分片，每片一个子进程并发检查"""
+        # 巨型库优先且分散到不同分片，避免慢导入排在同一片里
+        ordered = sorted(modules, key=lambda m: m not in GIANT_PACKAGES)
+        n = max(1, min(self.MAX_SHARDS, os.cpu_count() or 1, len(ordered)))
+        shards = [ordered[i::n] for i in range(n)]
+        lock = threading.Lock()
         
-        self.python_exe = get_python_executable()
-        self.dep_cache = SecureDependencyCache()
-        self.import_analyzer = AdvancedImportAnalyzer()
-        self.module_checker = BatchModuleChecker(self.python_exe, self.dep_cache)
+        def safe_collect(module: str, info: dict):
+            with lock: collect(module, info)
         
-        # 默认配置
-        self.current_dir = Path.cwd()
-        self.default_source = "修改的游戏.py"
-        self.output_name = "我的游戏"
+        with concurrent.futures.ThreadPoolExecutor(max_workers=n) as pool:
+            for f in [pool.submit(self._run_shard, shard, mode, safe_collect) for shard in shards]:
+                f.result()
+    
+    def _run_shard(self, modules: List[str], mode: str, collect: Callable[[str, dict], None]):
+        """运行一个分片；某模块超时或使子进程崩溃时只标记该模块，剩余模块换新进程继续"""
+        remaining = list(modules)
+        while remaining:
+            done: Set[str] = set()
+            current = None
+            try:
+                proc = subprocess.Popen([self.python_exe, '-u', '-c', STREAM_CHECK_SCRIPT, json.dumps(remaining), mode],
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, encoding='utf-8')
+            except OSError:
+                break
+            lines: queue.Queue = queue.Queue()
+            threading.Thread(target=ProbeWorker._reader, args=(proc, lines), daemon=True).start()
+            while True:
+                try:
+                    line = lines.get(timeout=self.MODULE_TIMEOUT_SECONDS)
+                except queue.Empty:
+                    proc.kill()
+                    if current:
+                        collect(current, {'available': False, 'version': None, 'status': '检查超时'}); done.add(current)
+                    break
+                if line is None:
+                    if current:
+                        collect(current, {'available': False, 'version': None, 'status': '检查崩溃'}); done.add(current)
+                    break
+                try: msg = json.loads(line)
+                except ValueError: continue
+                if 'start' in msg:
+                    current = msg['start']
+                elif 'module' in msg:
+                    collect(msg['module'], msg); done.add(msg['module']); current = None
+            try: proc.wait(timeout=5)
+            except subprocess.TimeoutExpired: proc.kill()
+            if not done: break  # 子进程无法启动或未产生任何结果
+            remaining = [m for m in remaining if m not in done]
+        for module in remaining:
+            # 子进程起不来属于偶发故障：标记为检查失败（不写入缓存），而不是“需要安装”
+            collect(module, {'available': False, 'version': 'N/A', 'status': '检查失败'})
+
+
+def minimize_hidden_imports(graph: Dict[str, Any], deps: Dict[str, dict], excludes,
+                            collected=()) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """计算 PyInstaller 模块图自己找不到、必须用 --hidden-import 补充的最小模块集合
+    
+    静态 import 语句（含 try / TYPE_CHECKING 内的可选导入）PyInstaller 会自行跟踪，只有动态导入和
+    IMPLICIT_DEPENDENCIES 才是候选；父包会随子模块自动带入，不再单独列出。
+    返回 (需要的 [(模块, 原因)], 跳过的 [(模块, 原因)])。
+    """
+    static = set(graph.get('imports', ())) | set(graph.get('from_imports', ())) | set(graph.get('conditional', ()))
+    local = set(graph.get('local', ()))
+    origins = graph.get('origins', {})
+    
+    def where(mod):
+        files = sorted(origins.get(mod, ()))
+        return files[0] + (f" 等 {len(files)} 个文件" if len(files) > 1 else '') if files else '字符串常量'
+    
+    candidates: Dict[str, str] = {}
+    for mod in graph.get('dynamic', ()):
+        candidates.setdefault(mod, f"动态导入 ({where(mod)})")
+    for mod in graph.get('local_dynamic', ()):
+        candidates.setdefault(mod, "动态导入的本地模块")
+    for top in sorted({m.split('.')[0] for m in static | set(candidates)}):
+        for dep in IMPLICIT_DEPENDENCIES.get(top, ()):
+            candidates.setdefault(dep, f"{top} 的隐式依赖")
+    
+    def available(mod):
+        top = mod.split('.')[0]
+        if top in local or top in STDLIB_MODULES: return True
+        info = deps.get(mod) or deps.get(top)
+        return bool(info and info.get('available'))
+    
+    accepted: Dict[str, str] = {}
+    skipped: List[Tuple[str, str]] = []
+    for mod in sorted(candidates):
+        cover = next((p for p in collected if mod == p or mod.startswith(p + '.')), None)
+        if mod in static: skipped.append((mod, "静态导入，PyInstaller 可自行发现"))
+        elif is_module_excluded(mod, excludes): skipped.append((mod, "命中排除列表"))
+        elif cover: skipped.append((mod, f"已由 collect {cover} 覆盖"))
+        elif not available(mod): skipped.append((mod, "目标环境中不存在"))
+        else: accepted[mod] = candidates[mod]
+    hidden: List[Tuple[str, str]] = []
+    for mod in sorted(accepted):
+        child = next((m for m in accepted if m.startswith(mod + '.')), None)
+        if child: skipped.append((mod, f"父包随 {child} 自动带入"))
+        else: hidden.append((mod, accepted[mod]))
+    return hidden, skipped
+
+
+# 运行时导入追踪：在目标解释器中运行游戏（或场景脚本），退出/超时时输出实际加载的模块。
+# argv: 输出 JSON, 目标脚本, 超时秒数（0 = 直到程序退出）
+TRACE_IMPORTS_SCRIPT = '''
+import sys, os, json, runpy, threading, atexit, pkgutil, traceback
+out, target, seconds = sys.argv[1], sys.argv[2], float(sys.argv[3])
+baseline = set(sys.modules)
+attempted = set()
+stdlib = set(getattr(sys, "stdlib_module_names", ()))
+
+class _Watch:
+    def find_spec(self, name, path=None, target=None):
+        attempted.add(name)
+        return None
+
+sys.meta_path.insert(0, _Watch())
+_lock = threading.Lock()
+_done = []
+
+def dump(status):
+    with _lock:
+        if _done: return
+        _done.append(status)
+        loaded = set(sys.modules)
+        children = {}
+        for name in sorted(loaded):
+            if name.split(".")[0] in stdlib or name.count(".") > 3: continue
+            path = getattr(sys.modules.get(name), "__path__", None)
+            if not path: continue
+            try: children[name] = sorted(name + "." + info.name for info in pkgutil.iter_modules(list(path)))
+            except Exception: pass
+        # Cython 等会往 sys.modules 塞没有 __spec__ 的伪模块，它们无法被导入
+        runtime = sorted(m for m in loaded - baseline if m.split(".")[0] not in stdlib and m != "__main__"
+                         and getattr(sys.modules.get(m), "__spec__", None) is not None)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump({"status": status, "loaded": sorted(loaded), "attempted": sorted(attempted - loaded),
+                       "runtime": runtime, "children": children}, f)
+
+atexit.register(dump, "exit")
+if seconds > 0:
+    def _stop():
+        dump("timeout"); os._exit(0)
+    timer = threading.Timer(seconds, _stop); timer.daemon = True; timer.start()
+sys.argv = [target]
+sys.path.insert(0, os.path.dirname(os.path.abspath(target)))
+try:
+    runpy.run_path(target, run_name="__main__")
+    dump("exit")
+except SystemExit:
+    dump("exit"); raise
+except BaseException:
+    traceback.print_exc(); dump("error"); sys.exit(1)
+'''
+
+
+class ImportTraceProfile:
+    """运行时导入追踪得到的项目级排除 / 包含清单（<项目根>/gamepackager_trace.json）
+    
+    每次追踪运行记录实际加载与尝试导入的模块，以及已加载包的直接子模块；多次运行（不同场景）取并集。
+    打包时：已加载的第三方包下从未被加载的子模块 → excludes；静态分析未发现、运行时才加载的第三方模块 → hiddenimports。
+    keep 是可手工编辑的安全余量（模块名，含其子模块），永不排除；下划线开头的子模块
+    （多为扩展模块按需加载的内部实现）以及项目代码静态导入到的模块也不排除。
+    """
+    FILENAME = "gamepackager_trace.json"
+    PROFILE_VERSION = 1
+    
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, self.FILENAME)
+        self.data = self.load() or self.empty()
+    
+    @classmethod
+    def empty(cls) -> Dict[str, Any]:
+        return {'version': cls.PROFILE_VERSION, 'env': None, 'runs': [], 'keep': [],
+                'used': [], 'runtime': [], 'children': {}, 'excludes': [], 'hiddenimports': []}
+    
+    def load(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f: data = json.load(f)
+            return data if data.get('version') == self.PROFILE_VERSION else None
+        except (OSError, ValueError): return None
+    
+    def record(self, run: Dict[str, Any], result: Dict[str, Any], static: Set[str], env: str):
+        """并入一次追踪结果；首次追踪时用项目静态导入的子模块与 IMPLICIT_DEPENDENCIES 预填 keep"""
+        data = self.data
+        data['env'] = env
+        data['runs'].append(run)
+        data['used'] = sorted(set(data['used']) | set(result['loaded']) | set(result['attempted']))
+        data['runtime'] = sorted(set(data['runtime']) | set(result['runtime']))
+        for parent, kids in result['children'].items():
+            data['children'][parent] = sorted(set(data['children'].get(parent, ())) | set(kids))
+        tops = {p.split('.')[0] for p in data['children']}
+        keep = set(data['keep']) | {m for m in static if '.' in m and m.split('.')[0] in tops}
+        for top in tops: keep.update(IMPLICIT_DEPENDENCIES.get(top, ()))
+        data['keep'] = sorted(keep)
+    
+    def compute(self, static: Set[str], local: Set[str]) -> Tuple[List[str], List[str]]:
+        """按当前 keep 计算 (excludes, hiddenimports)；keep 被手工修改后无需重新追踪"""
+        used, keep = set(self.data['used']), list(self.data['keep'])
+        static_prefixes = {'.'.join(m.split('.')[:i]) for m in static for i in range(1, m.count('.') + 2)}
+        excludes = []
+        for parent, kids in sorted(self.data['children'].items()):
+            top = parent.split('.')[0]
+            if top in STDLIB_MODULES or top in local or parent not in used: continue
+            for kid in kids:
+                if (kid in used or kid.rsplit('.', 1)[1].startswith('_') or kid in static_prefixes
+                        or is_module_excluded(kid, keep)): continue
+                excludes.append(kid)
+        static_tops = {m.split('.')[0] for m in static}
+        hidden = [m for m in self.data['runtime']
+                  if m.split('.')[0] not in static_tops | local and m.split('.')[0] not in STDLIB_MODULES
+                  and not is_module_excluded(m, excludes)]
+        return excludes, hidden
+    
+    def save(self, excludes: List[str], hidden: List[str]):
+        self.data['excludes'], self.data['hiddenimports'] = excludes, hidden
+        self.data['_comment'] = "excludes/hiddenimports 打包时按 used/children/keep 重新计算；需要保留的模块请加到 keep"
+        with open(self.path, 'w', encoding='utf-8') as f: json.dump(self.data, f, ensure_ascii=False, indent=1)
+
+
+class ProjectAssetCollector:
+    """项目级资源发现：扫描全部本地模块里的路径字符串 + include glob，按内容哈希找重复
+    
+    - 字符串是现有文件 → 收集该文件；是目录（如 ASSET_DIR = "assets"）→ 收集整个目录；
+      含通配符且像资源路径（"img/*.png"、"*.ogg"、"levels/*"）→ 按 glob 展开，其余通配符（"*" * 40、"[INFO]"）留给 asset_include
+    - 目标路径保留相对项目根目录的层级
+    - 生成 --add-data 时，整棵子树都被选中的目录只给一条，否则按 "目录/*.扩展名" 合并，最后才逐个文件
+    """
+    DEFAULT_EXCLUDES = ['*.py', '*.pyc', '*.pyo', '*.pyd', '*.spec', '__pycache__', '.*', ImportTraceProfile.FILENAME,
+                        'build', 'dist', 'venv', '.venv', 'env', 'node_modules', 'wheelhouse']
+    MAX_LITERAL_LENGTH = 260
+    GLOB_EXTENSION = re.compile(r'\.[A-Za-z0-9]{1,8}$')
+    
+    def __init__(self, root: str, include=(), exclude=None):
+        self.root = os.path.abspath(root)
+        self.include = list(include or ())
+        self.exclude = self.DEFAULT_EXCLUDES + list(exclude or ())
+        self.selected: Set[str] = set()
+        self._hash_cache: Dict[Tuple[str, int, int], str] = {}
+    
+    def _rel(self, path: str) -> str:
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+    
+    def _excluded(self, path: str) -> bool:
+        rel = self._rel(path)
+        parts = rel.split('/')
+        for pattern in self.exclude:
+            if '/' in pattern:
+                if fnmatch.fnmatch(rel, pattern): return True
+            elif any(fnmatch.fnmatch(p, pattern) for p in parts): return True
+        return False
+    
+    def _inside_root(self, path: str) -> bool:
+        try: return os.path.commonpath([self.root, path]) == self.root and path != self.root
+        except ValueError: return False  # 不同盘符
+    
+    def add_path(self, path: str):
+        path = os.path.abspath(path)
+        if not self._inside_root(path) or self._excluded(path): return
+        if os.path.isfile(path):
+            self.selected.add(path)
+        elif os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = [d for d in dirnames if not self._excluded(os.path.join(dirpath, d))]
+                for name in filenames:
+                    fp = os.path.join(dirpath, name)
+                    if not self._excluded(fp): self.selected.add(fp)
+    
+    def add_glob(self, pattern: str, base: Optional[str] = None):
+        for path in glob.glob(os.path.join(base or self.root, pattern), recursive=True): self.add_path(path)
+    
+    @classmethod
+    def _is_asset_glob(cls, value: str) -> bool:
+        """只有明显是资源路径的通配符才展开：末尾是具体扩展名，或至少有一级不含通配符的目录；
+        "*"、"**"、"**/*" 这类会匹配整个项目的模式一律不展开"""
+        parts = [p for p in re.split(r'[\\/]', value) if p not in ('', '.')]
+        if cls.GLOB_EXTENSION.search(parts[-1] if parts else '') and not glob.has_magic(value.rsplit('.', 1)[1]):
+            return True
+        return len(parts) > 1 and any(not glob.has_magic(p) for p in parts)
+    
+    def scan_source(self, filepath: str):
+        """把源码中的字符串常量当作候选路径（相对项目根目录或源文件所在目录）"""
+        try: tree = ast.parse(read_source_file(filepath))
+        except (SyntaxError, ValueError, OSError): return
+        bases = {self.root, os.path.dirname(os.path.abspath(filepath))}
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Constant) and isinstance(node.value, str)): continue
+            value = node.value.strip()
+            if not value or len(value) > self.MAX_LITERAL_LENGTH or '\n' in value or value in ('.', '/'): continue
+            if os.path.isabs(value) or value.startswith('..'): continue
+            if glob.has_magic(value) and not self._is_asset_glob(value): continue
+            for base in bases:
+                if glob.has_magic(value): self.add_glob(value, base)
+                elif os.path.exists(os.path.join(base, value)): self.add_path(os.path.join(base, value))
+    
+    def file_hash(self, path: str) -> str:
+        st = os.stat(path)
+        key = (path, st.st_size, st.st_mtime_ns)
+        if key not in self._hash_cache: self._hash_cache[key] = file_sha256(path)
+        return self._hash_cache[key]
+    
+    def collect(self, sources: List[str]) -> Dict[str, Any]:
+        for src in sources: self.scan_source(src)
+        for pattern in self.include: self.add_glob(pattern)
         
-        # UI变量
-        self.pack_mode_var = tk.StringVar(value='onedir')
-        self.no_console_var = tk.BooleanVar(value=True)
-        self.clean_var = tk.BooleanVar(value=True)
-        self.upx_var = tk.BooleanVar(value=False) # 默认关闭UPX，因为容易出问题
-        self.admin_var = tk.BooleanVar(value=False)
-        self.safe_mode_var = tk.BooleanVar(value=True)
-        self.cleanup_strategy_var = tk.StringVar(value='atexit')
+        hashes = {p: self.file_hash(p) for p in sorted(self.selected)}
+        groups: Dict[str, List[str]] = {}
+        for path, digest in hashes.items(): groups.setdefault(digest, []).append(path)
+        duplicates = [sorted(paths) for paths in groups.values() if len(paths) > 1]
+        wasted = sum(os.path.getsize(paths[0]) * (len(paths) - 1) for paths in duplicates)
+        return {'add_data': self._add_data_entries(), 'hashes': hashes, 'duplicates': duplicates,
+                'bytes': sum(os.path.getsize(p) for p in hashes), 'wasted': wasted}
+    
+    def _add_data_entries(self) -> List[Tuple[str, str]]:
+        # 含选中文件的目录（含祖先目录），只在这些目录里递归
+        active: Set[str] = set()
+        for path in self.selected:
+            d = os.path.dirname(path)
+            while d not in active and self._inside_root(d):
+                active.add(d); d = os.path.dirname(d)
+        complete: Dict[str, bool] = {}
         
-        self.collect_all_var = tk.BooleanVar(value=True)
-        self.fast_mode_var = tk.BooleanVar(value=True)
-        self.parallel_var = tk.BooleanVar(value=True)
+        def is_complete(d):
+            if d not in complete:
+                complete[d] = False  # 防止符号链接成环
+                try: items = list(os.scandir(d))
+                except OSError: return False
+                complete[d] = all(
+                    (is_complete(e.path) if e.path in active else False) if e.is_dir()
+                    else e.path in self.selected for e in items)
+            return complete[d]
         
-        self.message_queue = queue.Queue()
-        self.analyzed_deps: Dict[str, dict] = {}
-        self.missing_deps: List[str] = []
-        self.all_imports: Set[str] = set()
-        self.hidden_imports: Set[str] = set()
+        entries: List[Tuple[str, str]] = []
         
-        self._create_ui()
-        self._process_queue()
-    
-    def _create_ui(self):
-        title_frame = tk.Frame(self.root, bg='#1a237e', height=45)
-        title_frame.pack(fill=tk.X)
-        title_frame.pack_propagate(False)
-        tk.Label(title_frame, text=f"🎮 EXE打包工具 v{VERSION} - 智能优化版", font=('Microsoft YaHei', 11, 'bold'),
-                 bg='#1a237e', fg='white').pack(pady=10)
+        def emit(d):
+            dest = self._rel(d) if d != self.root else '.'
+            if d != self.root and is_complete(d):
+                entries.append((glob.escape(d), dest)); return
+            try: items = sorted(os.scandir(d), key=lambda e: e.name)
+            except OSError: return
+            by_ext: Dict[str, List[str]] = {}
+            for e in items:
+                if e.is_dir():
+                    if e.path in active: emit(e.path)
+                elif e.is_file():
+                    by_ext.setdefault(os.path.splitext(e.name)[1].lower(), []).append(e.path)
+            for ext, paths in sorted(by_ext.items()):
+                chosen = [p for p in paths if p in self.selected]
+                if not chosen: continue
+                # 扩展名大小写混用时 glob 在区分大小写的系统上会漏文件，只对一致的情况合并
+                same_case = len({os.path.splitext(p)[1] for p in paths}) == 1
+                if ext and same_case and len(chosen) == len(paths) and len(paths) > 1:
+                    entries.append((os.path.join(glob.escape(d), '*' + os.path.splitext(paths[0])[1]), dest))
+                else:
+                    entries.extend((glob.escape(p), dest) for p in chosen)
+        
+        emit(self.root)
+        return entries
+
+
+# 资源优化进程：在目标解释器中运行（Pillow 装在那里）。
+# argv[1] 为设置 JSON；stdin 为任务列表 [[类型, 源, 目标], ...]；stdout 每完成一项输出一行 JSON。
+ASSET_OPTIMIZE_SCRIPT = '''
+import sys, json, os, shutil, subprocess
+settings = json.loads(sys.argv[1])
+jobs = json.loads(sys.stdin.read())
+
+def optimize(kind, src, dst):
+    tmp = dst + ".part"
+    if kind == "png":
+        from PIL import Image
+        with Image.open(src) as im:
+            if getattr(im, "is_animated", False): return False
+            params = {"optimize": True}
+            for key in ("transparency", "gamma", "dpi", "icc_profile"):
+                if key in im.info: params[key] = im.info[key]
+            im.save(tmp, "PNG", **params)
+    elif kind == "json":
+        with open(src, "r", encoding="utf-8-sig") as f: data = json.load(f)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    elif kind == "wav":
+        subprocess.run([settings["ffmpeg"], "-v", "error", "-y", "-i", src, "-c:a", "libvorbis",
+                        "-q:a", str(settings.get("ogg_quality", 5)), "-f", "ogg", tmp], check=True,
+                       stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    else:
+        return False
+    if os.path.getsize(tmp) >= os.path.getsize(src):
+        os.remove(tmp); return False
+    os.replace(tmp, dst); return True
+
+for kind, src, dst in jobs:
+    out = {"src": src, "ok": False}
+    try:
+        out["ok"] = optimize(kind, src, dst)
+    except Exception as e:
+        out["error"] = f"{type(e).__name__}: {e}"
+        # 只有文件本身无法解析才值得永久记下；缺 Pillow、ffmpeg 失败、读写错误等环境问题下次还要重试
+        out["invalid"] = isinstance(e, (ValueError, SyntaxError)) or type(e).__name__ == "UnidentifiedImageError"
+        if os.path.exists(dst + ".part"): os.remove(dst + ".part")
+    print(json.dumps(out), flush=True)
+'''
+
+
+class AssetOptimizer:
+    """打包前的资源优化：PNG 无损重压缩、JSON 压缩空白、可选 WAV 转 OGG
+    
+    在目标解释器的多个子进程中并行执行；输出按 (输入哈希, 设置) 缓存在
+    ~/.game_packer_cache/assets，没有变小或无法解析的文件记一个 .skip 标记，之后都不会再处理；
+    环境类失败（解释器起不来、缺 Pillow、ffmpeg 出错、子进程崩溃）不记标记，下次重试。
+    """
+    OPTIMIZER_VERSION = 1
+    MAX_WORKERS = 8
+    
+    def __init__(self, python_exe: str, transcode_wav: bool = False):
+        self.python_exe = python_exe
+        self.settings = {'version': self.OPTIMIZER_VERSION, 'ogg_quality': 5}
+        ffmpeg = shutil.which('ffmpeg') if transcode_wav else None
+        if ffmpeg: self.settings['ffmpeg'] = ffmpeg
+        self.cache_dir = get_cache_dir("assets")
+        self.stats = {'optimized': 0, 'cached': 0, 'unchanged': 0, 'failed': 0, 'saved': 0}
+        self.errors: List[Tuple[str, str]] = []
+    
+    def kind_of(self, path: str) -> Optional[str]:
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.png': return 'png'
+        if ext == '.json': return 'json'
+        if ext == '.wav' and self.settings.get('ffmpeg'): return 'wav'
+        return None
+    
+    def _cache_path(self, kind: str, digest: str) -> str:
+        settings = {k: v for k, v in self.settings.items() if k != 'ffmpeg'}
+        key = hashlib.sha256(f"{kind}|{digest}|{json.dumps(settings, sort_keys=True)}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key)
+    
+    def optimize(self, hashes: Dict[str, str]) -> Dict[str, str]:
+        """hashes: 源文件 -> 内容哈希；返回 源文件 -> 优化后文件（只含确实变小的）"""
+        result: Dict[str, str] = {}
+        jobs: List[List[str]] = []
+        for src, digest in sorted(hashes.items()):
+            kind = self.kind_of(src)
+            if not kind: continue
+            out = self._cache_path(kind, digest)
+            if os.path.exists(out):
+                result[src] = out; self.stats['cached'] += 1
+                self.stats['saved'] += os.path.getsize(src) - os.path.getsize(out)
+            elif os.path.exists(out + '.skip'):
+                self.stats['unchanged'] += 1
+            else:
+                os.makedirs(os.path.dirname(out), exist_ok=True)
+                jobs.append([kind, src, out])
+        if not jobs: return result
+        
+        # 大文件优先并分散到不同分片
+        jobs.sort(key=lambda j: -os.path.getsize(j[1]))
+        n = max(1, min(self.MAX_WORKERS, os.cpu_count() or 1, len(jobs)))
+        shards = [jobs[i::n] for i in range(n)]
+        lock = threading.Lock()
+        
+        def run_shard(shard):
+            outputs = {src: out for _, src, out in shard}
+            try:
+                proc = subprocess.run([self.python_exe, '-c', ASSET_OPTIMIZE_SCRIPT, json.dumps(self.settings)],
+                                      input=json.dumps(shard), capture_output=True, text=True,
+                                      creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0)
+                lines = proc.stdout.splitlines()
+            except OSError as e:
+                lines = [json.dumps({'src': src, 'ok': False, 'error': str(e)}) for src in outputs]
+            with lock:
+                for line in lines:
+                    try: msg = json.loads(line)
+                    except ValueError: continue
+                    src = msg.get('src'); out = outputs.pop(src, None)
+                    if out is None: continue
+                    if msg.get('ok'):
+                        result[src] = out; self.stats['optimized'] += 1
+                        self.stats['saved'] += os.path.getsize(src) - os.path.getsize(out)
+                    else:
+                        if msg.get('error'): self.stats['failed'] += 1; self.errors.append((src, msg['error']))
+                        else: self.stats['unchanged'] += 1
+                        # 没变小或文件本身无法解析：结果只取决于内容与设置，记为不再处理
+                        if not msg.get('error') or msg.get('invalid'):
+                            with open(out + '.skip', 'w') as f: f.write(msg.get('error', ''))
+                for src in outputs:  # 子进程崩溃，未返回结果
+                    self.stats['failed'] += 1; self.errors.append((src, "优化进程异常退出"))
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=n) as pool:
+            list(pool.map(run_shard, shards))
+        return result
+
+
+# 图标转换进程（目标解释器中运行）：argv[1] 为任务 JSON，输出写入任务指定的临时路径
+ICON_CONVERT_SCRIPT = '''
+import sys, json
+from PIL import Image
+job = json.loads(sys.argv[1])
+LANCZOS = getattr(Image, "Resampling", Image).LANCZOS
+
+def load(path):
+    with Image.open(path) as im:
+        if hasattr(im, "ico"):  # 源本身是 ICO 时取最大的一帧
+            im.size = max(im.ico.sizes())
+        return im.convert("RGBA")
+
+def square(im, size):
+    # 等比缩放后居中放在透明方形画布上，不放大小图
+    im = im.copy(); im.thumbnail((size, size), LANCZOS)
+    canvas = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    canvas.paste(im, ((size - im.width) // 2, (size - im.height) // 2))
+    return canvas
+
+if job.get("ico_out"):
+    big = load(job["exe"])
+    small = load(job["small"]) if job.get("small") else big
+    sizes = job["sizes"]
+    frames = [square(small if s <= job["small_max"] else big, s) for s in sizes]
+    frames[-1].save(job["ico_out"], format="ICO", sizes=[(s, s) for s in sizes], append_images=frames[:-1])
+if job.get("window_out"):
+    im = load(job["window"])
+    size = min(job["window_size"], max(im.size))
+    square(im, size).save(job["window_out"], format="PNG", optimize=True)
+print(json.dumps({"ok": True}))
+'''
+
+
+class IconCache:
+    """把配置的图标转换为多尺寸 ICO (16–256px) 和小尺寸窗口图标 PNG
+    
+    结果按 (源图内容哈希, 转换参数) 存放在 ~/.game_packer_cache/icons，
+    同一份美术素材在不同构建、不同游戏之间都只转换一次。
+    """
+    ICON_VERSION = 1
+    ICO_SIZES = [16, 24, 32, 48, 64, 128, 256]
+    SMALL_MAX = 48  # 配置了任务栏图标时，<= 此尺寸的帧使用任务栏图（通常是为小尺寸简化过的版本）
+    WINDOW_SIZE = 64
+    
+    def __init__(self, python_exe: str):
+        self.python_exe = python_exe
+        self.cache_dir = get_cache_dir("icons")
+        self.hits = 0
+    
+    def _key(self, *parts: str) -> str:
+        return hashlib.sha256("|".join((str(self.ICON_VERSION),) + parts).encode()).hexdigest()[:32]
+    
+    def _convert(self, job: Dict[str, Any], out_key: str, final: str) -> str:
+        # 临时文件名唯一：构建矩阵的多个任务线程可能同时转换同一个图标
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(final) + '.', suffix='.tmp', dir=self.cache_dir)
+        os.close(fd)
+        job[out_key] = tmp
+        try:
+            proc = subprocess.run([self.python_exe, '-c', ICON_CONVERT_SCRIPT, json.dumps(job)], capture_output=True,
+                                  text=True, timeout=120,
+                                  creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0)
+        except BaseException:
+            os.remove(tmp); raise
+        if proc.returncode != 0 or not os.path.getsize(tmp):
+            os.remove(tmp)
+            raise RuntimeError((proc.stderr.strip().splitlines() or ["图标转换失败"])[-1])
+        os.replace(tmp, final)
+        return final
+    
+    def exe_icon(self, source: str, small: Optional[str] = None) -> str:
+        if source.lower().endswith('.ico') and not small: return source  # 已是 ICO，原样使用
+        key = self._key("ico", file_sha256(source), file_sha256(small) if small else "", json.dumps(self.ICO_SIZES))
+        final = os.path.join(self.cache_dir, key + ".ico")
+        if os.path.exists(final):
+            self.hits += 1; return final
+        return self._convert({'exe': source, 'small': small, 'sizes': self.ICO_SIZES,
+                              'small_max': self.SMALL_MAX}, 'ico_out', final)
+    
+    def window_icon(self, source: str) -> str:
+        key = self._key("window", file_sha256(source), str(self.WINDOW_SIZE))
+        final = os.path.join(self.cache_dir, f"window_{key[:12]}.png")
+        if os.path.exists(final):
+            self.hits += 1; return final
+        return self._convert({'window': source, 'window_size': self.WINDOW_SIZE}, 'window_out', final)
+
+
+# 运行时钩子：为窗口设置图标。等 tkinter / pygame.display 真正被导入后再打补丁，不提前导入它们。
+ICON_RUNTIME_HOOK = '''# GamePackager 生成的运行时钩子：窗口图标
+import os, sys, importlib.util
+
+_GP_ICON = os.path.join(getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(sys.executable))), __WINDOW_ICON__)
+
+
+class _GPImportWatch:
+    # 模块 name 执行完之后调用 callback(module)，随后从 sys.meta_path 中移除自己
+    def __init__(self, name, callback):
+        self.name, self.callback, self.busy = name, callback, False
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname != self.name or self.busy: return None
+        self.busy = True
+        try: spec = importlib.util.find_spec(fullname)
+        finally: self.busy = False
+        if self in sys.meta_path: sys.meta_path.remove(self)
+        if spec is None or spec.loader is None: return spec
+        loader, callback = spec.loader, self.callback
+
+        class _Loader:
+            def create_module(self, spec): return loader.create_module(spec)
+            def exec_module(self, module):
+                loader.exec_module(module)
+                try: callback(module)
+                except Exception: pass
+            def __getattr__(self, attr): return getattr(loader, attr)
+        spec.loader = _Loader()
+        return spec
+
+
+def _gp_patch_tkinter(tk):
+    orig = tk.Tk.__init__
+    def __init__(self, *a, **k):
+        orig(self, *a, **k)
+        try:
+            if _GP_ICON.endswith(".png"): self.iconphoto(True, tk.PhotoImage(file=_GP_ICON))
+            else: self.iconbitmap(_GP_ICON)
+        except Exception: pass
+    tk.Tk.__init__ = __init__
+
+
+def _gp_patch_pygame(display):
+    orig = display.set_mode
+    def set_mode(*a, **k):
+        try:
+            import pygame.image
+            display.set_icon(pygame.image.load(_GP_ICON))
+        except Exception: pass
+        return orig(*a, **k)
+    display.set_mode = set_mode
+
+
+if os.path.exists(_GP_ICON):
+    sys.meta_path.insert(0, _GPImportWatch("tkinter", _gp_patch_tkinter))
+    sys.meta_path.insert(0, _GPImportWatch("pygame.display", _gp_patch_pygame))
+'''
+
+# 运行时钩子：启动分析。记录每个模块的导入耗时（含子导入 / 仅自身）与第一个窗口出现的时间，
+# 写入 exe 同目录的 startup_profile.json（可用环境变量 GAMEPACKAGER_PROFILE_OUT 指定路径）。
+PROFILE_RUNTIME_HOOK = '''# GamePackager 生成的运行时钩子：启动分析
+import os, sys, time, json, atexit
+
+_gp_t0 = time.perf_counter()
+_gp_sentinel = os.environ.get("GAMEPACKAGER_BENCH_SENTINEL")  # 由 bench 命令设置
+_gp_headless = bool(os.environ.get("GAMEPACKAGER_BENCH_HEADLESS"))  # 无显示器：在创建窗口之前就报告
+_gp_records = {}
+_gp_stack = []
+_gp_state = {"first_window": None, "window_kind": None}
+
+
+def _gp_process_age():
+    # 进程创建到现在的秒数（启动器解压 + 解释器初始化）
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            times = [wintypes.FILETIME() for _ in range(4)]
+            k32 = ctypes.windll.kernel32
+            k32.GetProcessTimes(k32.GetCurrentProcess(), *[ctypes.byref(t) for t in times])
+            now = wintypes.FILETIME(); k32.GetSystemTimeAsFileTime(ctypes.byref(now))
+            value = lambda t: (t.dwHighDateTime << 32) | t.dwLowDateTime
+            return (value(now) - value(times[0])) / 1e7
+        with open("/proc/self/stat") as f: start = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f: uptime = float(f.read().split()[0])
+        return uptime - start / os.sysconf("SC_CLK_TCK")
+    except Exception:
+        return None
+
+
+_gp_age = _gp_process_age()
+
+
+def _gp_write_report():
+    out = os.environ.get("GAMEPACKAGER_PROFILE_OUT") or os.path.join(
+        os.path.dirname(os.path.abspath(sys.executable)), "startup_profile.json")
+    modules = sorted(({"name": n, "inclusive": round(t, 6), "self": round(s, 6)}
+                      for n, (t, s) in _gp_records.items()), key=lambda m: -m["self"])
+    report = {"version": 1, "executable": sys.executable, "process_age_at_hook": _gp_age,
+              "first_window": _gp_state["first_window"], "window_kind": _gp_state["window_kind"],
+              "import_self_total": round(sum(m["self"] for m in modules), 6),
+              "module_count": len(modules), "modules": modules[:300], "written_at": time.time()}
+    try:
+        with open(out, "w", encoding="utf-8") as f: json.dump(report, f, indent=1)
+    except OSError:
+        pass
+
+
+def _gp_window_shown(kind):
+    if _gp_state["first_window"] is None:
+        _gp_state["first_window"] = round(time.perf_counter() - _gp_t0, 6)
+        _gp_state["window_kind"] = kind
+        _gp_write_report()
+        if _gp_sentinel:
+            try:
+                with open(_gp_sentinel, "w") as f: json.dump({"time": time.time(), "kind": kind}, f)
+            except OSError: pass
+            if os.environ.get("GAMEPACKAGER_BENCH_EXIT"): os._exit(0)
+
+
+def _gp_after_import(name, module):
+    if name == "tkinter":
+        orig = module.Tk.__init__
+        def __init__(self, *a, **k):
+            if _gp_headless: _gp_window_shown("tkinter(headless)")
+            orig(self, *a, **k); _gp_window_shown("tkinter")
+        module.Tk.__init__ = __init__
+    elif name == "pygame.display":
+        orig_set_mode = module.set_mode
+        def set_mode(*a, **k):
+            if _gp_headless: _gp_window_shown("pygame(headless)")
+            surface = orig_set_mode(*a, **k); _gp_window_shown("pygame"); return surface
+        module.set_mode = set_mode
+
+
+def _gp_timed(orig):
+    def exec_module(self, module):
+        name = getattr(module, "__name__", "?")
+        start = time.perf_counter(); _gp_stack.append(0.0)
+        try:
+            return orig(self, module)
+        finally:
+            total = time.perf_counter() - start
+            children = _gp_stack.pop()
+            _gp_records[name] = (total, total - children)
+            if _gp_stack: _gp_stack[-1] += total
+            if name in ("tkinter", "pygame.display"):
+                try: _gp_after_import(name, module)
+                except Exception: pass
+    return exec_module
+
+
+def _gp_install():
+    import importlib.machinery as m
+    # PyInstaller 5 的导入器在 sys.meta_path 中；6.x 改为 path hook，加载器类在 pyimod02_importers 里
+    classes = {type(f) for f in sys.meta_path if hasattr(type(f), "exec_module")}
+    importers = sys.modules.get("pyimod02_importers")
+    if importers is not None:
+        classes.update(obj for obj in vars(importers).values()
+                       if isinstance(obj, type) and "exec_module" in obj.__dict__)
+    classes.update({m.SourceFileLoader, m.SourcelessFileLoader, m.ExtensionFileLoader})
+    for cls in classes:
+        func = cls.__dict__.get("exec_module")
+        if callable(func) and not isinstance(func, (staticmethod, classmethod)):
+            cls.exec_module = _gp_timed(func)
+
+
+_gp_install()
+atexit.register(_gp_write_report)
+'''
+
+
+# 打包配置默认值（GUI 与命令行共用；命令行可通过 JSON/TOML 配置文件覆盖）
+DEFAULT_PACK_OPTIONS: Dict[str, Any] = {
+    'source': "修改的游戏.py",
+    'output_name': "我的游戏",
+    'mode': 'onedir',
+    'no_console': True,
+    'clean': False,  # 强制 --clean；增量构建时仅在解释器环境变化后自动清理
+    'incremental': True,  # 构建指纹未变则跳过，否则复用持久 workpath
+    'upx': False,  # 默认关闭UPX，因为容易出问题
+    'admin': False,
+    'safe_mode': True,
+    'collect_all': True,
+    'fast_mode': True,
+    'parallel': True,
+    'project_graph': True,
+    'deep_verify': False,
+    'workpath': None,  # None: 增量构建时使用按项目区分的持久目录，否则为 PyInstaller 默认的 ./build
+    'distpath': None,
+    # 额外入口：[{"source": ..., "output_name": ..., "no_console": ...}]；非空时生成多入口 spec，共用一份依赖
+    'extra_entries': [],
+    # 资源发现：在源码引用之外追加的 glob（相对项目根目录，支持 **），以及额外的排除 glob
+    'asset_include': [],
+    'asset_exclude': [],
+    # 依赖安装源：wheelhouse 为本地 wheel 目录（None 时若项目根目录有 wheelhouse/ 则自动使用），offline 时只从 wheelhouse 安装
+    'index_url': "https://pypi.tuna.tsinghua.edu.cn/simple",
+    'wheelhouse': None,
+    'offline': False,
+    'isolated_env': False,  # 在只含项目依赖的专属 venv 中运行 PyInstaller（依赖集合不变时复用）
+    'optimize_assets': False,  # 打包前无损压缩 PNG / 压缩 JSON（需目标环境有 Pillow）
+    'profile_startup': False,  # 附加启动分析运行时钩子，生成 startup_profile.json
+    'trace_profile': True,  # 项目根目录有 gamepackager_trace.json（trace 命令生成）时按其排除未用子模块
+    'transcode_wav': False,  # 额外把 WAV 转为 OGG（需 ffmpeg；文件名不变，加载方需按内容识别格式，如 pygame）
+    'icons': {'exe': "480x480.png", 'window': "28x28.png", 'taskbar': "108x108.png"},
+}
+
+
+class BuildEnvironment:
+    """项目专属的最小构建 venv：只含项目依赖（锁定为基础解释器中的版本）与 PyInstaller
+    
+    按 (基础解释器, 需求集合) 计算键，环境放在 ~/.game_packer_cache/venvs/<键>，需求不变就直接复用。
+    新建时用 pip wheel 解析出完整的 wheel 集合，每个 wheel 按内容哈希解压到 ~/.game_packer_cache/pkgstore
+    一次，之后各环境把其中的文件硬链接（跨盘时复制）进自己的 site-packages。
+    wheel 的 .data/scripts 与 headers 不安装（打包只需要 python -m PyInstaller）。
+    """
+    ENV_VERSION = 1
+    MAX_ENVS = 5
+    IN_USE_SECONDS = 2 * 3600  # 标记在此时间内被创建/复用过的环境视为可能仍在构建中，不清理
+    MARKER = ".gamepackager_env.json"
+    _locks: Dict[str, threading.Lock] = {}  # 构建矩阵的任务是同一进程里的线程：同一个键的 ensure() 串行执行
+    _locks_guard = threading.Lock()
+    
+    def __init__(self, base_python: str, requirements: List[str], pip_source: List[str],
+                 log: Callable[[str], None] = lambda msg: None):
+        self.base_python = base_python
+        self.requirements = sorted(set(requirements))
+        self.pip_source = pip_source
+        self.log = log
+        info = get_interpreter_info(base_python)
+        key = json.dumps([self.ENV_VERSION, info['executable'], info['version'], self.requirements])
+        self.key = hashlib.sha256(key.encode()).hexdigest()[:16]
+        self.root = get_cache_dir("venvs")
+        self.path = os.path.join(self.root, self.key)
+    
+    @staticmethod
+    def _python_in(prefix: str) -> str:
+        if sys.platform == 'win32': return os.path.join(prefix, 'Scripts', 'python.exe')
+        return os.path.join(prefix, 'bin', 'python')
+    
+    @property
+    def python(self) -> str:
+        return self._python_in(self.path)
+    
+    def ensure(self) -> str:
+        """返回环境中的解释器路径，必要时新建"""
+        with self._locks_guard: lock = self._locks.setdefault(self.key, threading.Lock())
+        with lock:
+            marker = os.path.join(self.path, self.MARKER)
+            if os.path.exists(marker) and os.path.exists(self.python):
+                os.utime(marker)
+                self.log(f"♻️ 复用构建环境: {self.path}\n")
+                return self.python
+            tmp = tempfile.mkdtemp(prefix=self.key + '.', suffix='.tmp', dir=self.root)
+            try:
+                return self._create(tmp)
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+    
+    def _create(self, tmp: str) -> str:
+        start = time.time()
+        self.log(f"🧪 创建构建环境（{len(self.requirements)} 个需求）: {self.path}\n")
+        subprocess.run([self.base_python, "-m", "venv", "--without-pip", tmp], check=True, capture_output=True)
+        site = subprocess.run([self._python_in(tmp), "-c", "import sysconfig; print(sysconfig.get_paths()['purelib'])"],
+                              check=True, capture_output=True, text=True).stdout.strip()
+        wheels = self._resolve()
+        linked = copied = 0
+        for wheel in wheels:
+            tree = self._unpack(wheel)
+            for sub, dest in (('site', site), ('prefix', tmp)):
+                if os.path.isdir(os.path.join(tree, sub)):
+                    l, c = self._link_tree(os.path.join(tree, sub), dest); linked += l; copied += c
+        with open(os.path.join(tmp, self.MARKER), 'w', encoding='utf-8') as f:
+            json.dump({'requirements': self.requirements, 'wheels': sorted(os.path.basename(w) for w in wheels),
+                       'base': self.base_python, 'time': time.time()}, f, indent=1)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(tmp, self.path)
+        self.log(f"✅ 构建环境就绪: {len(wheels)} 个 wheel，硬链接 {linked} 个文件、复制 {copied} 个"
+                 f"（{time.time() - start:.1f}s）\n")
+        self._prune()
+        return self.python
+    
+    def _resolve(self) -> List[str]:
+        """pip wheel 解析完整依赖集合，新 wheel 存入共享的 ~/.game_packer_cache/wheels"""
+        wheels_dir = get_cache_dir("wheels")
+        with tempfile.TemporaryDirectory(prefix="gp_wheels_") as tmp:
+            cmd = [self.base_python, "-m", "pip", "wheel", "--disable-pip-version-check", "--progress-bar", "off",
+                   "--prefer-binary", "-w", tmp, "--find-links", wheels_dir] + self.pip_source + self.requirements
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                  encoding='utf-8', errors='replace')
+            if proc.returncode != 0:
+                self.log(proc.stdout)
+                raise RuntimeError(f"依赖解析失败（pip 退出码 {proc.returncode}）")
+            result = []
+            for name in sorted(os.listdir(tmp)):
+                if not name.endswith('.whl'): continue
+                dest = os.path.join(wheels_dir, name)
+                if not os.path.exists(dest): shutil.move(os.path.join(tmp, name), dest)
+                result.append(dest)
+        return result
+    
+    @staticmethod
+    def _unpack(wheel: str) -> str:
+        """把 wheel 解压进内容寻址的包仓库：site/ 对应 site-packages，prefix/ 对应 .data/data"""
+        store = get_cache_dir("pkgstore")
+        dest = os.path.join(store, file_sha256(wheel)[:24])
+        if os.path.isdir(dest): return dest
+        tmp = tempfile.mkdtemp(prefix=os.path.basename(dest) + '.', suffix='.tmp', dir=store)
+        with zipfile.ZipFile(wheel) as zf:
+            for info in zf.infolist():
+                parts = info.filename.split('/')
+                if info.filename.endswith('/') or '..' in parts or os.path.isabs(info.filename): continue
+                if parts[0].endswith('.data'):
+                    if len(parts) < 3 or parts[1] not in ('purelib', 'platlib', 'data'): continue
+                    parts = ['prefix' if parts[1] == 'data' else 'site'] + parts[2:]
+                else:
+                    parts = ['site'] + parts
+                target = os.path.join(tmp, *parts)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with zf.open(info) as src, open(target, 'wb') as out: shutil.copyfileobj(src, out)
+                if (info.external_attr >> 16) & 0o111: os.chmod(target, 0o755)
+        # 每次调用都有自己的临时目录：并发任务同时解压同一个 wheel 时，后完成的替换失败并丢弃自己的副本
+        try: os.replace(tmp, dest)
+        except OSError: shutil.rmtree(tmp, ignore_errors=True)
+        return dest
+    
+    @staticmethod
+    def _link_tree(src_root: str, dst_root: str) -> Tuple[int, int]:
+        linked = copied = 0
+        for dirpath, _, files in os.walk(src_root):
+            target_dir = os.path.join(dst_root, os.path.relpath(dirpath, src_root))
+            os.makedirs(target_dir, exist_ok=True)
+            for name in files:
+                src, dst = os.path.join(dirpath, name), os.path.join(target_dir, name)
+                if os.path.exists(dst): os.remove(dst)
+                try: os.link(src, dst); linked += 1
+                except OSError: shutil.copy2(src, dst); copied += 1
+        return linked, copied
+    
+    def _prune(self):
+        """只保留最近使用的 MAX_ENVS 个环境（包仓库与 wheel 缓存不受影响）；
+        IN_USE_SECONDS 内用过的环境可能正被其他任务使用，不删除"""
+        envs = []
+        recent = time.time() - self.IN_USE_SECONDS
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith('.tmp'):  # 中断的创建留下的临时目录
+                if os.path.getmtime(path) < recent: shutil.rmtree(path, ignore_errors=True)
+                continue
+            marker = os.path.join(path, self.MARKER)
+            if name != self.key and os.path.exists(marker): envs.append((os.path.getmtime(marker), name))
+        for mtime, name in sorted(envs, reverse=True)[self.MAX_ENVS - 1:]:
+            if mtime < recent: shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+
+class BuildProgressModel:
+    """把 PyInstaller 输出解析为命名阶段，按同一项目的历史阶段耗时估算进度与剩余时间
+    
+    历史保存在 ~/.game_packer_cache/progress/<项目键>.json（最近 HISTORY_SIZE 次成功构建的各阶段秒数与依赖数）。
+    每个阶段的预计耗时取历史中位数，与依赖规模相关的阶段再按 本次依赖数 / 历史依赖数 缩放，
+    并乘以该阶段在历史中实际出现的比例（增量构建时 PyInstaller 会跳过未变化的 Analysis 等阶段）。
+    没有历史时按 DEFAULT_SECONDS 估算百分比，但不给出 ETA。
+    """
+    # (阶段, 进入该阶段的日志标志, 显示文字, 耗时是否随依赖数增长)
+    PHASES = [
+        ('startup', None, "启动 PyInstaller...", False),
+        ('base_library', r'Analyzing modules for base_library', "分析标准库...", False),
+        ('analysis', r'INFO: Analyzing (?!modules for base_library|hidden import|run-time hooks)', "分析依赖...", True),
+        ('hooks', r'Processing module hooks \(post-graph', "执行模块钩子...", True),
+        ('binaries', r'Looking for (ctypes DLLs|dynamic libraries)|binary vs\. data reclassification', "收集二进制依赖...", True),
+        ('pyz', r'checking PYZ', "打包字节码 (PYZ)...", True),
+        ('pkg', r'checking PKG', "压缩归档 (PKG)，大文件需等待...", True),
+        ('exe', r'checking EXE', "写入 EXE...", False),
+        ('collect', r'checking COLLECT', "复制文件 (COLLECT)...", True),
+    ]
+    DONE_MARKER = 'Build complete!'
+    DEFAULT_SECONDS = {'startup': 1, 'base_library': 6, 'analysis': 10, 'hooks': 3, 'binaries': 2,
+                       'pyz': 2, 'pkg': 1, 'exe': 1, 'collect': 3}
+    HISTORY_SIZE = 10
+    
+    def __init__(self, project_key: str, deps: int, mode: str):
+        self.path = os.path.join(get_cache_dir("progress"), project_key + ".json")
+        self.deps, self.mode = max(1, deps), mode
+        self._patterns = [(i, re.compile(p)) for i, (_, p, _, _) in enumerate(self.PHASES) if p]
+        self.history = []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.history = [h for h in json.load(f) if h.get('mode') == mode]
+        except (OSError, ValueError): pass
+        self.start = time.time()
+        self.index, self.phase_start = 0, self.start
+        self.durations: Dict[str, float] = {}
+        self.done = False
+        self.expected = {name: self._expected(name, scaled) for name, _, _, scaled in self.PHASES}
+    
+    def _expected(self, name: str, scaled: bool) -> float:
+        """该阶段的预计耗时（秒）× 出现概率"""
+        if not self.history:
+            base = self.DEFAULT_SECONDS[name] * (5 if name == 'pkg' and self.mode == 'onefile' else 1)
+            return base * (max(1.0, self.deps / 10) if scaled else 1)
+        runs = [(h['phases'][name], h.get('deps') or 1) for h in self.history if name in h['phases']]
+        if not runs: return 0.0
+        ordered = sorted(runs)
+        seconds, deps = ordered[len(ordered) // 2]
+        if scaled: seconds *= min(3.0, max(0.5, self.deps / deps))
+        return seconds * len(runs) / len(self.history)
+    
+    def feed(self, line: str) -> bool:
+        """处理一行输出；进入新阶段时返回 True（只向前推进，后续阶段再出现旧标志不回退）"""
+        if self.done: return False
+        if self.DONE_MARKER in line:
+            self._enter(len(self.PHASES)); self.done = True; return True
+        for i, pattern in self._patterns:
+            if i > self.index and pattern.search(line):
+                self._enter(i); return True
+        return False
+    
+    def _enter(self, index: int):
+        now = time.time()
+        self.durations[self.PHASES[self.index][0]] = round(now - self.phase_start, 2)
+        self.index, self.phase_start = index, now
+    
+    def remaining(self) -> float:
+        if self.done: return 0.0
+        expected = self.expected[self.PHASES[self.index][0]]
+        in_phase = time.time() - self.phase_start
+        # 超出预计时假设还要再花已用时间的 10%，而不是停在 0
+        current = expected - in_phase if in_phase < expected * 0.9 else max(0.1 * in_phase, 1.0)
+        return current + sum(self.expected[name] for name, _, _, _ in self.PHASES[self.index + 1:])
+    
+    def status(self) -> Tuple[float, str, Optional[float]]:
+        """(百分比 10~99, 阶段文字, 剩余秒数或 None)"""
+        if self.done: return (99, "整理输出...", None)
+        elapsed, remaining = time.time() - self.start, self.remaining()
+        percent = 10 + 89 * elapsed / max(0.001, elapsed + remaining)
+        return (round(percent, 1), self.PHASES[self.index][2], remaining if self.history else None)
+    
+    def estimate_total(self) -> Optional[float]:
+        return sum(self.expected.values()) if self.history else None
+    
+    def save(self):
+        """构建成功后记录本次各阶段耗时"""
+        if not self.done: self._enter(self.index)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f: history = json.load(f)
+        except (OSError, ValueError): history = []
+        history.append({'time': time.time(), 'mode': self.mode, 'deps': self.deps, 'phases': self.durations,
+                        'total': round(time.time() - self.start, 2)})
+        with open(self.path, 'w', encoding='utf-8') as f: json.dump(history[-self.HISTORY_SIZE:], f)
+    
+    def summary(self) -> str:
+        labels = {name: label.rstrip('.').split('，')[0] for name, _, label, _ in self.PHASES}
+        return ", ".join(f"{labels[n]} {s:.1f}s" for n, s in self.durations.items() if s >= 0.05)
+    
+    @staticmethod
+    def format_eta(seconds: float) -> str:
+        seconds = int(round(seconds))
+        return f"{seconds // 60}分{seconds % 60:02d}秒" if seconds >= 60 else f"{seconds}秒"
+
+
+class PackagerCore:
+    """与界面无关的打包流程：检查 → 分析 → 安装 → 打包
+    
+    进度与日志通过 emit(类型, 内容) 输出，消息类型与 GUI 的 message_queue 一致：
+    check / log / progress / deps_tree / deps_info
+    progress 的内容为 (百分比, 文字) 或 (百分比, 文字, 剩余秒数)
+    """
+    
+    def __init__(self, options: Optional[Dict[str, Any]] = None,
+                 emit: Optional[Callable[[str, Any], None]] = None, python_exe: Optional[str] = None):
+        self.options: Dict[str, Any] = json.loads(json.dumps(DEFAULT_PACK_OPTIONS))
+        if options: self.update_options(options)
+        self.emit = emit or (lambda msg_type, content: None)
+        
+        self.python_exe = python_exe or get_python_executable()
+        self.dep_cache = SecureDependencyCache()
+        self.analysis_cache = FileAnalysisCache()
+        self.import_analyzer = AdvancedImportAnalyzer(self.analysis_cache)
+        self.module_checker = BatchModuleChecker(self.python_exe, self.dep_cache)
+        
+        self.analyzed_deps: Dict[str, dict] = {}
+        self.missing_deps: List[str] = []
+        self.all_imports: Set[str] = set()
+        self.hidden_imports: Set[str] = set()
+        self.module_graph: Dict[str, Any] = {}
+        self.hidden_import_report: Dict[str, List[Tuple[str, str]]] = {'hidden': [], 'skipped': []}
+        self.asset_report: Dict[str, Any] = {}
+        self.runtime_hooks: List[str] = []
+    
+    def close(self):
+        """释放探测进程、SQLite 连接与后台线程（同一进程里创建多个 PackagerCore 时调用）"""
+        self.module_checker.worker.stop()
+        self.dep_cache.close()
+        self.analysis_cache.save()
+    
+    def update_options(self, options: Dict[str, Any]):
+        for key, value in options.items():
+            if key == 'icons': self.options['icons'].update(value)
+            else: self.options[key] = value
+    
+    def _add_check_msg(self, msg): self.emit('check', msg)
+    def _add_log_msg(self, msg): self.emit('log', msg)
+    
+    def get_source_file(self) -> str:
+        s = str(self.options.get('source') or '').strip()
+        return s + '.py' if s and not s.endswith('.py') else s
+    
+    def clear_cache(self):
+        self.dep_cache.clear(); self.analysis_cache.clear(); self.analyzed_deps = {}; self.missing_deps = []
+    
+    def check(self) -> bool:
+        """环境检查；返回是否可以进入分析"""
+        try:
+            self.module_checker.deep_verify = self.options['deep_verify']
+            self._add_check_msg(f"环境检查 v{VERSION}\n{'='*40}\n")
+            self._add_check_msg(f"解释器: {self.python_exe}\n")
+            source = self.get_source_file()
+            if os.path.exists(source):
+                self._add_check_msg(f"✅ 源文件: {source}\n")
+                if is_safe_path(source): self._add_check_msg(f"✅ 路径安全\n")
+            else: self._add_check_msg(f"❌ 源文件不存在: {source}\n")
+            
+            # 核心依赖检查
+            core_deps = ['PyInstaller', 'PIL']
+            results = self.module_checker.check_modules(set(core_deps), use_cache=False)
+            ok = True
+            for dep in core_deps:
+                if results.get(dep, {}).get('available'): self._add_check_msg(f"✅ {dep} 已安装\n")
+                else: 
+                    self._add_check_msg(f"❌ {dep} 未安装\n"); ok = False
+            
+            if ok and os.path.exists(source): 
+                self._add_check_msg("\n✅ 检查通过！\n")
+                return True
+            self._add_check_msg("\n❌ 检查未通过\n")
+        except Exception as e: self._add_check_msg(f"错误: {e}")
+        return False
+    
+    def analyze(self) -> bool:
+        """依赖分析；返回依赖是否全部就绪"""
+        source = self.get_source_file()
+        try:
+            self.module_checker.deep_verify = self.options['deep_verify']
+            self.emit('progress', (20, "解析代码..."))
+            res = self._analyze_entry(source)
+            for entry in self._entries()[1:]:
+                self._merge_analysis(res, self._analyze_entry(entry['source']))
+            if self.options['project_graph']:
+                st = res['cache']
+                self.emit('progress', (40, f"解析完成: {len(res['modules'])} 个本地模块"
+                                           f" (缓存命中 {st['hits']}/{st['hits'] + st['misses']})"))
+            self.module_graph = res
+            all_imps = res['all']
+            expanded = set()
+            for m in all_imps:
+                top = m.split('.')[0]; expanded.add(top)
+                if top in IMPLICIT_DEPENDENCIES: expanded.update(IMPLICIT_DEPENDENCIES[top])
+            # 只出现在 try/except ImportError 或 TYPE_CHECKING 里的导入是可选的：未安装不算缺依赖
+            required = {m.split('.')[0] for key in ('imports', 'from_imports', 'dynamic') for m in res.get(key, ())}
+            required |= {dep for top in list(required) for dep in IMPLICIT_DEPENDENCIES.get(top, ())}
+            
+            self.emit('progress', (50, "检测状态..."))
+            
+            def stream_row(mod, info):
+                # 结果逐条推送到依赖列表，不必等全部检查完成
+                if info.get('source') == '标准库': return
+                hidden = mod not in res['imports'] and mod not in res['from_imports']
+                kind = '可选导入' if mod not in required else '隐式依赖' if hidden else '直接导入'
+                files = sorted(res['origins'].get(mod, ()))
+                origin = files[0] + (f" (+{len(files) - 1})" if len(files) > 1 else '') if files else '-'
+                self.emit('deps_tree', [(mod, '✅' if info['available'] else ('⚪' if mod not in required else '❌'),
+                                         info.get('version', 'N/A'), info.get('pip_name', mod), kind, origin)])
+            
+            results = self.module_checker.check_modules(expanded, on_result=stream_row)
+            
+            self.analyzed_deps = {}; self.missing_deps = []; self.all_imports = set(); self.hidden_imports = set()
+            optional_missing = []
+            for mod, info in sorted(results.items()):
+                if info.get('source') == '标准库': continue
+                if not info['available'] and mod not in required:
+                    optional_missing.append(mod); continue
+                self.analyzed_deps[mod] = info; self.all_imports.add(mod)
+                if mod not in res['imports'] and mod not in res['from_imports']: self.hidden_imports.add(mod)
+                if not info['available']: self.missing_deps.append(info['pip_name'])
+            
+            if self.missing_deps: 
+                self.emit('deps_info', (f"缺 {len(self.missing_deps)} 个依赖", 'red'))
+            else: 
+                self.emit('deps_info', ("✅ 依赖就绪" + (f"（{len(optional_missing)} 个可选导入未安装）"
+                                                        if optional_missing else ''), 'green'))
+            self.emit('progress', (100, "分析完成"))
+            return not self.missing_deps
+        except Exception as e: 
+            traceback.print_exc()
+            self.emit('deps_info', (f"错误: {e}", 'red'))
+            return False
+    
+    def _entries(self) -> List[Dict[str, Any]]:
+        """主入口 + extra_entries，统一为 {source, output_name, console}"""
+        output_name = str(self.options.get('output_name') or '').strip() or "game"
+        entries = [{'source': self.get_source_file(), 'output_name': output_name,
+                    'console': not self.options['no_console']}]
+        for extra in self.options.get('extra_entries') or []:
+            src = str(extra.get('source') or '').strip()
+            if not src: continue
+            if not src.endswith('.py'): src += '.py'
+            name = str(extra.get('output_name') or '').strip() or os.path.splitext(os.path.basename(src))[0]
+            entries.append({'source': src, 'output_name': name,
+                            'console': not extra.get('no_console', self.options['no_console'])})
+        return entries
+    
+    def _analyze_entry(self, source: str) -> Dict[str, Any]:
+        if self.options['project_graph']:
+            return self.import_analyzer.analyze_project(source, parallel=self.options['parallel'])
+        res = self.import_analyzer.analyze_file(source)
+        res['origins'] = {m: {os.path.basename(source)} for m in res['all']}
+        res['files'] = [os.path.abspath(source)]
+        return res
+    
+    @staticmethod
+    def _merge_analysis(res: Dict[str, Any], other: Dict[str, Any]):
+        """把另一个入口的分析结果并入 res（导入集合取并集，本地模块记绝对路径）"""
+        for key in ('imports', 'from_imports', 'dynamic', 'conditional', 'all', 'local', 'local_dynamic'):
+            if key in other: res[key] = set(res.get(key, ())) | set(other[key])
+        for mod, files in other.get('origins', {}).items():
+            res['origins'].setdefault(mod, set()).update(files)
+        if other.get('root'):
+            modules = res.setdefault('modules', {})
+            for mod, rel in other['modules'].items():
+                path = os.path.join(other['root'], rel)
+                modules[mod if mod not in modules else path] = path
+            for mod, targets in other.get('edges', {}).items():
+                res.setdefault('edges', {}).setdefault(mod, [])
+                res['edges'][mod] = sorted(set(res['edges'][mod]) | set(targets))
+        res.setdefault('files', []).extend(other.get('files', []))
+    
+    def _static_modules(self) -> Set[str]:
+        return set(self.module_graph.get('all', ())) | set(self.analyzed_deps)
+    
+    def _project_root(self) -> str:
+        return self.module_graph.get('root') or os.path.dirname(os.path.abspath(self.get_source_file()))
+    
+    def trace(self, seconds: float = 60, scenario: Optional[str] = None, reset: bool = False) -> bool:
+        """追踪运行：在目标解释器中运行游戏（或场景脚本），把实际加载的模块并入项目追踪清单"""
+        target = os.path.abspath(scenario or self.get_source_file())
+        if not os.path.exists(target):
+            self._add_log_msg(f"❌ 找不到脚本: {target}\n"); return False
+        root = self._project_root()
+        profile = ImportTraceProfile(root)
+        if reset: profile.data = profile.empty()
+        self._add_log_msg(f"\n=== 追踪运行: {os.path.basename(target)}"
+                          f"（{f'{seconds:g} 秒后结束' if seconds else '直到程序退出'}，请把要打包的功能都走一遍） ===\n")
+        self.emit('progress', (30, "追踪运行中..."))
+        try:
+            with tempfile.TemporaryDirectory(prefix="gp_trace_") as tmp:
+                script, out = os.path.join(tmp, "gp_trace.py"), os.path.join(tmp, "trace.json")
+                with open(script, 'w', encoding='utf-8') as f: f.write(TRACE_IMPORTS_SCRIPT)
+                start = time.time()
+                proc = subprocess.run([self.python_exe, script, out, target, str(seconds)], cwd=root,
+                                      timeout=seconds + 60 if seconds else None)
+                if not os.path.exists(out):
+                    self._add_log_msg(f"❌ 追踪失败（退出码 {proc.returncode}）\n"); return False
+                with open(out, 'r', encoding='utf-8') as f: result = json.load(f)
+        except subprocess.TimeoutExpired:
+            self._add_log_msg("❌ 追踪超时\n"); return False
+        
+        static = self._static_modules()
+        profile.record({'time': time.time(), 'script': os.path.relpath(target, root), 'status': result['status'],
+                        'seconds': round(time.time() - start, 1)},
+                       result, static, get_environment_fingerprint(self.python_exe))
+        excludes, hidden = profile.compute(static, set(self.module_graph.get('local', ())))
+        profile.save(excludes, hidden)
+        self._add_log_msg(f"✅ 加载 {len(result['loaded'])} 个模块（第 {len(profile.data['runs'])} 次追踪，结束方式: {result['status']}）\n")
+        self._add_log_msg(f"  排除未用子模块 {len(excludes)} 个，补充运行时导入 {len(hidden)} 个，安全余量 keep {len(profile.data['keep'])} 项\n")
+        for mod in excludes[:15]: self._add_log_msg(f"    - {mod}\n")
+        if len(excludes) > 15: self._add_log_msg(f"    ... 其余见 {profile.path}\n")
+        for mod in hidden[:15]: self._add_log_msg(f"    + {mod}\n")
+        self._add_log_msg(f"清单: {profile.path}（可编辑 keep；不同场景可多次追踪叠加，打包时自动应用）\n")
+        self.emit('progress', (100, "追踪完成"))
+        return True
+    
+    def _trace_plan(self) -> Tuple[List[str], List[str]]:
+        """读取项目追踪清单，返回 (excludes, hiddenimports)；无清单或已关闭时为空"""
+        if not self.options.get('trace_profile'): return [], []
+        profile = ImportTraceProfile(self._project_root())
+        if not profile.data['runs']: return [], []
+        excludes, hidden = profile.compute(self._static_modules(), set(self.module_graph.get('local', ())))
+        self._add_log_msg(f"  🔬 追踪清单: 排除 {len(excludes)} 个未用子模块，补充 {len(hidden)} 个运行时导入"
+                          f"（{len(profile.data['runs'])} 次追踪）\n")
+        if profile.data.get('env') != get_environment_fingerprint(self.python_exe):
+            self._add_log_msg("  ⚠️ 追踪清单由另一个解释器环境生成，依赖版本变化后建议重新追踪\n")
+        return excludes, hidden
+
+    def _wheelhouse(self) -> Optional[str]:
+        path = self.options.get('wheelhouse')
+        if path: return os.path.abspath(path)
+        default = os.path.join(self._project_root(), "wheelhouse")
+        return default if os.path.isdir(default) else None
+    
+    def _pip_source_args(self) -> Optional[List[str]]:
+        """pip 的包来源参数：wheelhouse 作为 --find-links；离线时 --no-index，否则使用 index_url"""
+        wheelhouse = self._wheelhouse()
+        args = ["--find-links", wheelhouse] if wheelhouse else []
+        if self.options.get('offline'):
+            if not wheelhouse:
+                self._add_log_msg("❌ 离线安装需要 wheelhouse（--wheelhouse 或项目根目录下的 wheelhouse/）\n"); return None
+            return args + ["--no-index"]
+        if self.options.get('index_url'): args += ["-i", self.options['index_url']]
+        return args
+    
+    def _run_pip(self, args: List[str]) -> int:
+        """在目标解释器中运行 pip，输出逐行写入日志"""
+        cmd = [self.python_exe, "-m", "pip", args[0], "--disable-pip-version-check", "--progress-bar", "off"] + args[1:]
+        self._add_log_msg(f"$ pip {' '.join(args)}\n")
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                encoding='utf-8', errors='replace', bufsize=1)
+        for line in proc.stdout: self._add_log_msg("  " + line)
+        return proc.wait()
+    
+    def install(self) -> bool:
+        """一次 pip 解析安装全部缺失依赖，装完绕过缓存重新探测，探测结果写回缓存"""
+        try:
+            missing = {mod: info['pip_name'] for mod, info in self.analyzed_deps.items()
+                       if not info['available'] and info.get('pip_name') not in (None, '-')}
+            if not missing: 
+                self._add_log_msg("无缺失依赖\n"); return True
+            packages = sorted(set(missing.values()))
+            for pkg in packages:
+                if not is_safe_package_name(pkg): self._add_log_msg(f"⚠️ 跳过不安全的包名: {pkg}\n")
+            packages = [p for p in packages if is_safe_package_name(p)]
+            source = self._pip_source_args()
+            if not packages or source is None: return False
+            
+            self._add_log_msg(f"正在安装: {', '.join(packages)}\n")
+            self.emit('progress', (30, "安装依赖..."))
+            returncode = self._run_pip(["install", "--prefer-binary"] + source + packages)
+            if returncode != 0: self._add_log_msg(f"⚠️ pip 退出码 {returncode}\n")
+            
+            self.emit('progress', (80, "验证安装..."))
+            results = self.module_checker.check_modules(set(missing), use_cache=False)
+            for mod in sorted(missing):
+                info = results.get(mod) or {'available': False, 'version': None, 'pip_name': missing[mod]}
+                self.analyzed_deps[mod] = info
+                if info['available']: self._add_log_msg(f"✅ {mod} {info.get('version') or ''}\n")
+                else: self._add_log_msg(f"❌ {mod} 仍不可用（{missing[mod]}）\n")
+            self.missing_deps = [info['pip_name'] for info in self.analyzed_deps.values() if not info['available']]
+            if self.missing_deps: self.emit('deps_info', (f"缺 {len(self.missing_deps)} 个依赖", 'red'))
+            else: self.emit('deps_info', ("✅ 依赖就绪", 'green'))
+            self.emit('progress', (100, "安装完成" if not self.missing_deps else "安装未完成"))
+            return not self.missing_deps
+        except Exception as e: self._add_log_msg(f"安装错误: {e}\n")
+        return False
+    
+    @staticmethod
+    def _pin(pip_name: str, info: dict) -> str:
+        version = str(info.get('version') or '')
+        pinned = info.get('available') and re.match(r'^[0-9][\w.!+]*$', version)
+        return f"{pip_name}=={version}" if pinned else pip_name
+    
+    def _pinned_requirements(self) -> List[str]:
+        """项目第三方依赖的 pip 需求，锁定为目标解释器中已安装的版本"""
+        requirements = []
+        for mod, info in sorted(self.analyzed_deps.items()):
+            pip_name = info.get('pip_name')
+            if not pip_name or pip_name == '-' or not is_safe_package_name(pip_name): continue
+            req = self._pin(pip_name, info)
+            if req not in requirements: requirements.append(req)
+        return requirements
+    
+    def _build_python(self) -> str:
+        """运行 PyInstaller 的解释器：isolated_env 时为项目专属的最小 venv，否则为目标解释器"""
+        if not self.options.get('isolated_env'): return self.python_exe
+        self.emit('progress', (8, "准备构建环境..."))
+        pyinstaller = self.module_checker.check_modules({'PyInstaller'}).get('PyInstaller', {})
+        requirements = self._pinned_requirements() + [self._pin("pyinstaller", pyinstaller)]
+        source = self._pip_source_args()
+        if source is None: raise RuntimeError("离线模式下创建构建环境需要 wheelhouse")
+        return BuildEnvironment(self.python_exe, requirements, source, self._add_log_msg).ensure()
+    
+    def prefetch(self) -> bool:
+        """把项目依赖（锁定为当前环境中的版本）连同传递依赖下载到 wheelhouse，供离线构建机安装"""
+        if self.options.get('offline'):
+            self._add_log_msg("❌ 离线模式下无法预取\n"); return False
+        dest = os.path.abspath(self.options.get('wheelhouse') or os.path.join(self._project_root(), "wheelhouse"))
+        requirements = self._pinned_requirements()
+        if not requirements:
+            self._add_log_msg("没有需要预取的第三方依赖\n"); return True
+        os.makedirs(dest, exist_ok=True)
+        self._add_log_msg(f"预取到 {dest}: {', '.join(requirements)}\n")
+        args = ["download", "--prefer-binary", "--dest", dest, "--find-links", dest]
+        if self.options.get('index_url'): args += ["-i", self.options['index_url']]
+        returncode = self._run_pip(args + requirements)
+        files = [f for f in os.listdir(dest) if f.endswith(('.whl', '.tar.gz', '.zip'))]
+        if returncode != 0:
+            self._add_log_msg(f"❌ 预取失败（pip 退出码 {returncode}）\n"); return False
+        self._add_log_msg(f"✅ wheelhouse 共 {len(files)} 个包；离线安装: --offline --wheelhouse {dest}\n")
+        return True
+    
+    def pack(self) -> bool:
+        source = self.get_source_file()
+        work_dir = build_dir = None
+        try:
+            entries = self._entries()
+            output_name = entries[0]['output_name']
+            self.emit('progress', (5, "初始化..."))
+            self._add_log_msg(f"=== 开始打包 v{VERSION} ===\n")
+            self._add_log_msg(f"源: {source}, 模式: {self.options['mode']}\n")
+            if len(entries) > 1:
+                self._add_log_msg(f"多入口: {', '.join(e['output_name'] for e in entries)}（共用一份依赖）\n")
+            
+            icons = self._prepare_icons()
+            incremental = self.options['incremental']
+            work_dir = self.options.get('workpath') or (self._project_workpath(source, output_name) if incremental else None)
+            # 生成的钩子 / 资源暂存等放在 workpath；非增量构建时放临时目录，结束后删除
+            build_dir = work_dir or tempfile.mkdtemp(prefix="gp_build_")
+            
+            for entry in entries: entry['script'] = os.path.abspath(entry['source'])
+            self.runtime_hooks = self._write_runtime_hooks(icons, build_dir)
+
+            data_files = self._collect_data_files(entries, icons, build_dir)
+            if len(entries) > 1:
+                spec_file = self._write_multipackage_spec(entries, output_name, icons, data_files, work_dir)
+                cmd = self._build_spec_command(spec_file, work_dir)
+            else:
+                cmd = self._build_command(entries[0]['script'], output_name, icons, data_files, work_dir)
+            
+            # 图标 / 资源处理仍用目标解释器（需要 Pillow），只有 PyInstaller 在专属环境中运行
+            cmd[0] = self._build_python()
+            
+            # 增量构建：指纹未变则跳过；解释器环境变化（或强制清理）时才 --clean
+            env = get_environment_fingerprint(cmd[0])
+            state_file = os.path.join(work_dir, ".gamepackager_build.json") if work_dir else None
+            previous = {}
+            if state_file and os.path.exists(state_file):
+                try:
+                    with open(state_file, 'r', encoding='utf-8') as f: previous = json.load(f)
+                except Exception: pass
+            fingerprint = self._build_fingerprint(source, cmd, data_files, icons, env)
+            output_path = self._output_path(output_name)
+            if incremental and previous.get('fingerprint') == fingerprint and os.path.exists(output_path):
+                self._add_log_msg(f"⏩ 构建指纹未变化 ({fingerprint[:12]})，跳过打包: {output_path}\n")
+                self.emit('progress', (100, "无变化，已跳过"))
+                return True
+            if self.options['clean'] or (incremental and previous and previous.get('env') != env):
+                cmd.insert(cmd.index("--noconfirm") + 1, "--clean")
+                if not self.options['clean']: self._add_log_msg("🧹 解释器环境已变化，本次完整重建\n")
+            elif previous:
+                self._add_log_msg(f"♻️ 复用构建缓存: {work_dir}\n")
+            
+            self._add_log_msg(f"\n执行命令: {' '.join(cmd[:10])} ...\n\n")
+            
+            # 执行打包：按阶段显示进度，根据本项目历史阶段耗时估算剩余时间
+            model = BuildProgressModel(self._project_key(source, output_name), len(self.analyzed_deps), self.options['mode'])
+            estimate = model.estimate_total()
+            if estimate: self._add_log_msg(f"⏳ 预计耗时约 {BuildProgressModel.format_eta(estimate)}（依据最近 {len(model.history)} 次构建）\n")
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
+                                     universal_newlines=True, bufsize=1)
+            self.emit('progress', model.status())
+            stop = threading.Event()
+            
+            def tick():
+                # 长时间无输出的阶段（如压缩大型 PKG）也要持续刷新进度与 ETA
+                while not stop.wait(1.0): self.emit('progress', model.status())
+            threading.Thread(target=tick, daemon=True).start()
+            try:
+                for line in process.stdout:
+                    self._add_log_msg(line)
+                    if model.feed(line): self.emit('progress', model.status())
+                process.wait()
+            finally:
+                stop.set()
+            
+            if process.returncode == 0:
+                model.save()
+                self.emit('progress', (100, "打包成功!"))
+                self._add_log_msg(f"\n✅ 打包成功! 用时 {BuildProgressModel.format_eta(time.time() - model.start)}"
+                                  f"（{model.summary()}）\n")
+                if state_file:
+                    with open(state_file, 'w', encoding='utf-8') as f:
+                        json.dump({'fingerprint': fingerprint, 'env': env, 'output': output_path, 'time': time.time()}, f)
+                if self.options['mode'] == 'onedir': self._link_duplicate_assets(output_path)
+                self._write_size_report(output_name, output_path, work_dir)
+                if self.options.get('profile_startup'):
+                    self._add_log_msg("⏱️ 已启用启动分析：运行程序后查看 exe 同目录的 startup_profile.json\n")
+                return True
+            self.emit('progress', (100, "打包失败"))
+            self._add_log_msg("\n❌ 打包失败，请检查日志\n")
+        except Exception as e:
+            self.emit('progress', (100, f"错误: {e}"))
+            self._add_log_msg(f"\n❌ 严重错误: {e}\n{traceback.format_exc()}\n")
+        finally:
+            if build_dir and not work_dir: shutil.rmtree(build_dir, ignore_errors=True)
+        return False
+
+    def _write_size_report(self, output_name: str, output_path: str, work_dir: Optional[str] = None):
+        """生成体积报告 <dist>/<name>_size_report.html/.json，并与上一份报告比较"""
+        try:
+            build_dir = os.path.join(work_dir or os.path.abspath("build"), output_name)
+            if not os.path.isdir(build_dir): return
+            root = self.module_graph.get('root') or os.path.dirname(os.path.abspath(self.get_source_file()))
+            report = BundleSizeReport(build_dir, output_path, self.options['mode'], root,
+                                      self.module_checker.index.ensure()).build()
+            dist = self.options.get('distpath') or os.path.abspath("dist")
+            json_path = os.path.join(dist, f"{output_name}_size_report.json")
+            previous = None
+            if os.path.exists(json_path):
+                try:
+                    with open(json_path, 'r', encoding='utf-8') as f: previous = json.load(f)
+                except Exception: pass
+            changes = BundleSizeReport.diff(previous, report)
+            with open(json_path, 'w', encoding='utf-8') as f: json.dump(report, f, ensure_ascii=False)
+            html_path = os.path.join(dist, f"{output_name}_size_report.html")
+            with open(html_path, 'w', encoding='utf-8') as f: f.write(BundleSizeReport.to_html(report, changes, output_name))
+            
+            self._add_log_msg(f"\n📏 产物体积 {report['total'] / 1048576:.1f} MB，最大的包:\n")
+            for name, g in sorted(report['groups'].items(), key=lambda kv: -kv[1]['total'])[:10]:
+                self._add_log_msg(f"    {name:<24} {g['total'] / 1048576:8.2f} MB\n")
+            if changes:
+                if previous: self._add_log_msg(f"  与上次相比 {(report['total'] - previous.get('total', 0)) / 1048576:+.1f} MB:\n")
+                for name, old, new in changes[:5]:
+                    self._add_log_msg(f"    {name:<24} {(new - old) / 1048576:+8.2f} MB\n")
+            for exc, size in report['exclude_savings'][:3]:
+                self._add_log_msg(f"  💡 排除 {exc} 可省 {size / 1048576:.1f} MB\n")
+            self._add_log_msg(f"  报告: {html_path}\n")
+            self.emit('size_report', (report, changes, html_path))
+        except Exception as e:
+            self._add_log_msg(f"⚠️ 体积报告生成失败: {e}\n")
+
+    def _project_key(self, source: str, output_name: str) -> str:
+        """按 (源文件, 输出名, 模式, 额外入口) 区分项目，用于持久 workpath 与构建耗时历史"""
+        key = f"{os.path.abspath(source)}|{output_name}|{self.options['mode']}"
+        for entry in self._entries()[1:]: key += f"|{os.path.abspath(entry['source'])}:{entry['output_name']}"
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+    def _project_workpath(self, source: str, output_name: str) -> str:
+        """按项目区分的持久 workpath，跨次构建复用 PyInstaller 分析缓存"""
+        return get_cache_dir("builds", self._project_key(source, output_name))
+    
+    def _output_path(self, output_name: str) -> str:
+        dist = self.options.get('distpath') or os.path.abspath("dist")
+        if self.options['mode'] == 'onefile' and sys.platform == 'win32': output_name += '.exe'
+        return os.path.join(dist, output_name)
+    
+    def _build_fingerprint(self, source: str, cmd: List[str], data_files, icons, env: str) -> str:
+        """构建指纹：源码 + 资源 + 依赖版本 + 解释器环境 + 打包参数"""
+        h = hashlib.sha256()
+        h.update(f"{VERSION}\n{env}\n{os.path.abspath(source)}\n".encode())
+        if self.options.get('optimize_assets'):
+            h.update(f"assets:{AssetOptimizer.OPTIMIZER_VERSION}:{bool(self.options.get('transcode_wav'))}\n".encode())
+        # 入口脚本单独按内容计入，只取参数部分；多入口时 spec 内容即全部参数
+        h.update(json.dumps(cmd[1:-1]).encode())
+        if cmd[-1].endswith('.spec'): h.update(read_source_file(cmd[-1]).encode())
+        root = self.module_graph.get('root')
+        files = [os.path.join(root, rel) for rel in self.module_graph.get('modules', {}).values()] if root else \
+            self._unscanned_sources()
+        files += self.module_graph.get('files', []) + [e['source'] for e in self._entries()]
+        files += list(icons.values()) + self.runtime_hooks
+        for path in sorted(set(os.path.abspath(f) for f in files)):
+            try: h.update(f"{path}:{file_sha256(path)}\n".encode())
+            except OSError: h.update(f"{path}:missing\n".encode())
+        # 资源文件的哈希在收集阶段已算好；--add-data 条目本身已包含在命令行 / spec 中
+        for path, digest in sorted(self.asset_report.get('hashes', {}).items()):
+            h.update(f"{path}:{digest}\n".encode())
+        for mod, info in sorted(self.analyzed_deps.items()):
+            h.update(f"{mod}=={info.get('version')}\n".encode())
+        return h.hexdigest()
+
+    def _unscanned_sources(self) -> List[str]:
+        """没有模块图（--single-file）时不知道入口导入了哪些本地模块，而 PyInstaller 仍会打包它们：
+        取各入口所在目录下的全部 .py 计入指纹"""
+        files = []
+        for base in {os.path.dirname(os.path.abspath(e['source'])) for e in self._entries()}:
+            for dirpath, dirnames, filenames in os.walk(base):
+                dirnames[:] = [d for d in dirnames if d not in ProjectAssetCollector.DEFAULT_EXCLUDES and not d.startswith('.')]
+                files += [os.path.join(dirpath, name) for name in filenames if name.endswith('.py')]
+        return files
+
+    def _build_plan(self):
+        """PyInstaller 参数的中间表示，命令行 (_build_command) 与多入口 spec 共用"""
+        opts = self.options
+        plan = {'excludes': [], 'copy_metadata': [], 'collect_submodules': [], 'collect_all': [],
+                'hiddenimports': [], 'runtime_hooks': list(self.runtime_hooks), 'upx': False, 'upx_exclude': []}
+        
+        # 排除
+        if opts['fast_mode']: plan['excludes'].extend(EXCLUDE_MODULES)
+        trace_excludes, trace_hidden = self._trace_plan()
+        plan['excludes'].extend(trace_excludes)
+        
+        # v5.3 智能收集逻辑 (解决慢的问题)
+        collected_metadata = set()
+        if opts['collect_all']:
+            for mod in self.all_imports:
+                top = mod.split('.')[0]
+                
+                # 1. 自动添加 copy-metadata (解决 DistributionNotFound)
+                pip_name = PACKAGE_NAME_MAP.get(top, top).lower()
+                if (top in METADATA_REQUIRED_PACKAGES or pip_name in METADATA_REQUIRED_PACKAGES) and top not in collected_metadata:
+                    plan['copy_metadata'].append(top)
+                    self._add_log_msg(f"  📝 复制元数据: {top}\n")
+                    collected_metadata.add(top)
+                
+                # 2. 智能 collect-submodules
+                if top in COMPLEX_PACKAGES and top not in STDLIB_MODULES:
+                    # 关键优化：跳过巨型库的全量收集
+                    if top in GIANT_PACKAGES:
+                        self._add_log_msg(f"  ⏩ 跳过全量收集(优化速度): {top}\n")
+                        # 对于 PyTorch 等，使用原生 hook 足够了，不需要 collect-submodules
+                    else:
+                        plan['collect_submodules'].append(top)
+                        self._add_log_msg(f"  📦 收集子模块: {top}\n")
+
+        # 安全模式补充
+        if opts['safe_mode']: plan['collect_all'].append("pkg_resources")
+
+        # 隐藏导入：只补 PyInstaller 静态分析找不到的模块，并说明每一项的来由
+        hidden, skipped = minimize_hidden_imports(self.module_graph, self.analyzed_deps, EXCLUDE_MODULES + trace_excludes,
+                                                  plan['collect_submodules'] + plan['collect_all'])
+        known = {mod for mod, _ in hidden}
+        hidden += [(mod, "运行时追踪") for mod in trace_hidden
+                   if mod not in known and not (opts['fast_mode'] and is_module_excluded(mod, EXCLUDE_MODULES))]
+        self.hidden_import_report = {'hidden': hidden, 'skipped': skipped}
+        plan['hiddenimports'] = [mod for mod, _ in hidden]
+        n_static = sum(1 for _, reason in skipped if reason.startswith("静态导入"))
+        self._add_log_msg(f"  🔍 隐藏导入 {len(hidden)} 个（跳过 {len(skipped)} 个候选，其中静态导入 {n_static} 个）\n")
+        for mod, reason in hidden: self._add_log_msg(f"    + {mod}  ← {reason}\n")
+        for mod, reason in skipped:
+            if not reason.startswith("静态导入"): self._add_log_msg(f"    - {mod}  ← {reason}\n")
+        
+        # v5.3 强制禁止对敏感库使用 UPX (防止崩溃)
+        # 即使勾选了 UPX，也要把这些库排除
+        if opts['upx'] and shutil.which('upx'):
+            plan['upx'] = True
+            plan['upx_exclude'] = ['pandas', 'numpy', 'torch', 'cv2', 'scipy', 'tensorflow']
+        return plan
+
+    def _build_command(self, source, output_name, icons, data_files, work_dir=None):
+        opts = self.options
+        plan = self._build_plan()
+        cmd = [self.python_exe, "-m", "PyInstaller", "--noconfirm", "--name", output_name]
+        if work_dir:
+            # spec 文件也放进 workpath，避免并发任务在当前目录互相覆盖 <name>.spec
+            cmd.extend(["--workpath", work_dir, "--specpath", work_dir])
+        if opts.get('distpath'): cmd.extend(["--distpath", opts['distpath']])
+        
+        if opts['mode'] == 'onefile': cmd.append("--onefile")
+        else: cmd.append("--onedir")
+        if opts['no_console']: cmd.append("--noconsole")
+        if icons.get('exe'): cmd.extend(["--icon", icons['exe']])
+        if opts['admin']: cmd.append("--uac-admin")
+        
+        # 数据文件
+        sep = ';' if sys.platform == 'win32' else ':'
+        for s, d in data_files: cmd.extend(["--add-data", f"{s}{sep}{d}"])
+        for exc in plan['excludes']: cmd.extend(["--exclude-module", exc])
+        for pkg in plan['copy_metadata']: cmd.extend(["--copy-metadata", pkg])
+        for pkg in plan['collect_submodules']: cmd.extend(["--collect-submodules", pkg])
+        for mod in plan['hiddenimports']: cmd.extend(["--hidden-import", mod])
+        for pkg in plan['collect_all']: cmd.extend(["--collect-all", pkg])
+        for hook in plan['runtime_hooks']: cmd.extend(["--runtime-hook", hook])
+        if plan['upx']:
+            cmd.append("--upx-dir=.")
+            for lib in plan['upx_exclude']: cmd.extend(["--upx-exclude", lib])
+        else:
+            cmd.append("--noupx")
+            
+        cmd.append(source)
+        return cmd
+
+    def _build_spec_command(self, spec_file, work_dir=None):
+        cmd = [self.python_exe, "-m", "PyInstaller", "--noconfirm"]
+        if work_dir: cmd.extend(["--workpath", work_dir])
+        if self.options.get('distpath'): cmd.extend(["--distpath", self.options['distpath']])
+        cmd.append(spec_file)
+        return cmd
+
+    def _write_multipackage_spec(self, entries, output_name, icons, data_files, work_dir=None):
+        """生成多入口 spec：每个入口一个 Analysis，依赖只打包一份
+        
+        onedir: 各 EXE 只含脚本，所有 binaries/datas 汇入同一个 COLLECT 目录（同名文件去重）
+        onefile: MERGE 之后，后续 EXE 引用第一个 EXE 中已有的文件而不再重复打包
+        """
+        plan = self._build_plan()
+        paths = sorted({os.path.dirname(os.path.abspath(e['source'])) for e in entries})
+        exe_kwargs = (f"icon={icons.get('exe')!r}, uac_admin={self.options['admin']!r}, "
+                      f"upx={plan['upx']!r}, upx_exclude={plan['upx_exclude']!r}")
+        spec = f"""# -*- mode: python ; coding: utf-8 -*-
+# 由 GamePackager v{VERSION} 生成的多入口 spec，请勿手工修改
+from PyInstaller.utils.hooks import collect_all, collect_submodules, copy_metadata
+
+datas = {[(s, d) for s, d in data_files]!r}
+binaries = []
+hiddenimports = {plan['hiddenimports']!r}
+for pkg in {plan['copy_metadata']!r}:
+    datas += copy_metadata(pkg)
+for pkg in {plan['collect_submodules']!r}:
+    hiddenimports += collect_submodules(pkg)
+for pkg in {plan['collect_all']!r}:
+    d, b, h = collect_all(pkg); datas += d; binaries += b; hiddenimports += h
+
+entries = {[(e['script'], e['output_name'], e['console']) for e in entries]!r}
+analyses = [Analysis([script], pathex={paths!r}, binaries=binaries, datas=datas,
+                     hiddenimports=hiddenimports, excludes={plan['excludes']!r},
+                     runtime_hooks={plan['runtime_hooks']!r})
+            for script, name, console in entries]
+
+if {self.options['mode'] == 'onefile'!r}:
+    MERGE(*[(a, name, name) for a, (script, name, console) in zip(analyses, entries)])
+    for a, (script, name, console) in zip(analyses, entries):
+        EXE(PYZ(a.pure), a.scripts, a.binaries, a.datas, a.dependencies, name=name, console=console,
+            {exe_kwargs})
+else:
+    exes = [EXE(PYZ(a.pure), a.scripts, [], exclude_binaries=True, name=name, console=console,
+                {exe_kwargs})
+            for a, (script, name, console) in zip(analyses, entries)]
+    COLLECT(*exes, *[a.binaries for a in analyses], *[a.datas for a in analyses],
+            upx={plan['upx']!r}, upx_exclude={plan['upx_exclude']!r}, name={output_name!r})
+"""
+        path = os.path.join(work_dir or os.getcwd(), f"{output_name}.spec")
+        if not os.path.exists(path) or read_source_file(path) != spec:
+            with open(path, 'w', encoding='utf-8') as f: f.write(spec)
+        return path
+
+    def _prepare_icons(self):
+        """EXE 图标 → 多尺寸 ICO（任务栏图标提供小尺寸帧），窗口图标 → 小尺寸 PNG；转换失败时用原图"""
+        icons = {}
+        paths = {}
+        for key in ('exe', 'window', 'taskbar'):
+            p = self.options['icons'].get(key)
+            if p and os.path.exists(p): paths[key] = os.path.abspath(p)
+        exe_src = paths.get('exe') or paths.get('taskbar')
+        small = paths.get('taskbar') if paths.get('exe') else None
+        if exe_src: icons['exe'] = exe_src
+        if paths.get('window'): icons['window'] = paths['window']
+        if not icons: return icons
+        
+        cache = IconCache(self.python_exe)
+        try:
+            if exe_src: icons['exe'] = cache.exe_icon(exe_src, small)
+            if paths.get('window'): icons['window'] = cache.window_icon(paths['window'])
+            self._add_log_msg(f"🎨 图标已就绪（缓存命中 {cache.hits}）\n")
+        except Exception as e:
+            self._add_log_msg(f"⚠️ 图标转换失败，使用原图: {e}\n")
+        return icons
+
+    def _write_runtime_hooks(self, icons, build_dir):
+        """生成运行时钩子（窗口图标、启动分析），替代过去把源码拼接到前导代码后面的包装脚本"""
+        hooks = []
+        wanted = []
+        if self.options.get('profile_startup'):
+            wanted.append(("gp_rthook_profile.py", PROFILE_RUNTIME_HOOK))  # 放在最前，尽量覆盖更多导入
+        if icons.get('window'):
+            wanted.append(("gp_rthook_icon.py",
+                           ICON_RUNTIME_HOOK.replace("__WINDOW_ICON__", repr(os.path.basename(icons['window'])))))
+        for name, code in wanted:
+            path = os.path.join(build_dir, name)
+            # 内容不变就不重写，保持增量构建缓存有效
+            if not os.path.exists(path) or read_source_file(path) != code:
+                with open(path, 'w', encoding='utf-8') as f: f.write(code)
+            hooks.append(path)
+        return hooks
+
+    def _collect_data_files(self, entries, icons, work_dir=None):
+        """扫描所有入口及其本地模块引用的资源，返回 [(源, 目标目录)]"""
+        data = []
+        if icons.get('window'): data.append((icons['window'], '.'))
+        root = self.module_graph.get('root') or os.path.dirname(os.path.abspath(entries[0]['source']))
+        sources = [os.path.join(root, rel) for rel in self.module_graph.get('modules', {}).values()]
+        sources += [os.path.abspath(e['source']) for e in entries]
+        collector = ProjectAssetCollector(root, self.options.get('asset_include'), self.options.get('asset_exclude'))
+        try:
+            self.asset_report = collector.collect(sorted(set(sources)))
+        except Exception as e:
+            self._add_log_msg(f"⚠️ 资源扫描失败: {e}\n")
+            self.asset_report = {}
+            return data
+        rep = self.asset_report
+        self._add_log_msg(f"🖼️ 资源: {len(rep['hashes'])} 个文件 ({rep['bytes'] / 1048576:.1f} MB)，"
+                          f"{len(rep['add_data'])} 条 --add-data\n")
+        if rep['duplicates']:
+            self._add_log_msg(f"  ♊ {len(rep['duplicates'])} 组内容重复的资源，可节省 {rep['wasted'] / 1048576:.1f} MB:\n")
+            for paths in rep['duplicates'][:20]:
+                self._add_log_msg(f"    {' = '.join(os.path.relpath(p, root) for p in paths)}\n")
+        add_data = rep['add_data']
+        if self.options.get('optimize_assets') and rep['hashes']:
+            add_data = self._optimize_assets(root, rep, work_dir) or add_data
+        return data + add_data
+
+    def _optimize_assets(self, root, rep, work_dir=None):
+        """优化资源并镜像到暂存目录，返回指向暂存目录的 --add-data；没有可优化的资源时返回 None"""
+        optimizer = AssetOptimizer(self.python_exe, self.options.get('transcode_wav'))
+        if self.options.get('transcode_wav') and not optimizer.settings.get('ffmpeg'):
+            self._add_log_msg("  ⚠️ 未找到 ffmpeg，跳过 WAV 转码\n")
+        t0 = time.time()
+        optimized = optimizer.optimize(rep['hashes'])
+        st = optimizer.stats
+        self._add_log_msg(f"  🗜️ 资源优化: 新处理 {st['optimized']}，缓存 {st['cached']}，无收益 {st['unchanged']}，"
+                          f"失败 {st['failed']}，共节省 {st['saved'] / 1048576:.1f} MB ({time.time() - t0:.1f}s)\n")
+        for src, err in optimizer.errors[:10]: self._add_log_msg(f"    ❌ {os.path.relpath(src, root)}: {err}\n")
+        if not optimized: return None
+        
+        # 暂存目录与项目同结构：优化过的文件链接到缓存输出，其余链接到原文件
+        stage = os.path.join(work_dir or tempfile.mkdtemp(prefix="gp_assets_"), "assets_stage")
+        wanted = {os.path.join(stage, os.path.relpath(src, root)): optimized.get(src, src) for src in rep['hashes']}
+        for dirpath, _, filenames in os.walk(stage):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if path not in wanted: os.remove(path)
+        for dst, src in wanted.items():
+            try:
+                if os.path.exists(dst) and os.path.samefile(dst, src): continue
+            except OSError: pass
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if os.path.exists(dst): os.remove(dst)
+            try: os.link(src, dst)
+            except OSError: shutil.copy2(src, dst)
+        prefix, stage_prefix = glob.escape(root), glob.escape(stage)
+        return [(stage_prefix + s[len(prefix):] if s.startswith(prefix) else s, d) for s, d in rep['add_data']]
+
+    def _link_duplicate_assets(self, output_dir):
+        """onedir 产物中内容相同的资源改为硬链接，只占一份磁盘空间"""
+        root = self.module_graph.get('root') or os.path.dirname(os.path.abspath(self.get_source_file()))
+        saved = 0
+        for paths in self.asset_report.get('duplicates', []):
+            targets = []
+            for p in paths:
+                rel = os.path.relpath(p, root)
+                for base in (os.path.join(output_dir, '_internal'), output_dir):
+                    if os.path.isfile(os.path.join(base, rel)):
+                        targets.append(os.path.join(base, rel)); break
+            for dup in targets[1:]:
+                tmp = dup + '.gplink'
+                try:
+                    if os.path.samefile(targets[0], dup): continue
+                    os.link(targets[0], tmp); os.replace(tmp, dup)
+                    saved += os.path.getsize(dup)
+                except OSError:
+                    if os.path.exists(tmp): os.remove(tmp)
+        if saved: self._add_log_msg(f"🔗 重复资源已硬链接，节省 {saved / 1048576:.1f} MB\n")
+
+
+class BuildMatrixScheduler:
+    """构建矩阵：把多个 (源文件, 输出名, 模式, 选项) 任务按并发上限调度执行
+    
+    每个任务使用独立的 PackagerCore、workpath/distpath 和日志文件。并发数受 CPU 核数限制，
+    同时按可用内存做预算：含巨型库（torch 等）的任务按更高的内存占用计。
+    """
+    JOB_MEMORY_BYTES = 1536 * 1024 * 1024
+    GIANT_JOB_MEMORY_BYTES = 4096 * 1024 * 1024
+    MEMORY_BUDGET_RATIO = 0.8
+    
+    def __init__(self, jobs: List[Dict[str, Any]], base_options: Optional[Dict[str, Any]] = None,
+                 max_workers: Optional[int] = None, build_root: str = os.path.join("build", "matrix"),
+                 dist_root: str = "dist", python_exe: Optional[str] = None,
+                 emit: Optional[Callable[[str, Any], None]] = None):
+        self.jobs = jobs
+        self.base_options = base_options or {}
+        self.max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(jobs) or 1))
+        self.build_root = build_root
+        self.dist_root = dist_root
+        self.python_exe = python_exe or get_python_executable()
+        self.emit = emit or (lambda msg_type, content: None)
+        available = get_available_memory()
+        self.memory_budget = int(available * self.MEMORY_BUDGET_RATIO) if available else None
+        self._reserved = 0
+        self._mem_cond = threading.Condition()
+        self._print_lock = threading.Lock()
+    
+    @staticmethod
+    def job_id(job: Dict[str, Any]) -> str:
+        name = job.get('output_name') or os.path.splitext(os.path.basename(job['source']))[0]
+        return f"{name}-{job.get('mode', 'onedir')}"
+    
+    @classmethod
+    def job_ids(cls, jobs: List[Dict[str, Any]]) -> List[str]:
+        """输出名与模式相同的任务会共用 workpath/distpath/日志：重复的 id 加序号后缀区分"""
+        ids = [cls.job_id(job) for job in jobs]
+        counts = {jid: ids.count(jid) for jid in ids}
+        seen: Dict[str, int] = {}
+        for i, jid in enumerate(list(ids)):
+            if counts[jid] > 1:
+                seen[jid] = seen.get(jid, 0) + 1
+                ids[i] = f"{jid}-{seen[jid]}"
+        return ids
+    
+    def _acquire_memory(self, amount: int):
+        if self.memory_budget is None: return
+        with self._mem_cond:
+            # 单个任务超出总预算时，等到没有其他任务运行再单独执行
+            while self._reserved and self._reserved + amount > self.memory_budget:
+                self._mem_cond.wait()
+            self._reserved += amount
+    
+    def _release_memory(self, amount: int):
+        if self.memory_budget is None: return
+        with self._mem_cond:
+            self._reserved -= amount
+            self._mem_cond.notify_all()
+    
+    def _report(self, jid: str, text: str):
+        with self._print_lock:
+            self.emit('log', f"[{jid}] {text}\n")
+    
+    def _run_job(self, job: Dict[str, Any], jid: str) -> Dict[str, Any]:
+        work_dir = os.path.abspath(os.path.join(self.build_root, jid))
+        dist_dir = os.path.abspath(os.path.join(self.dist_root, jid))
+        log_dir = os.path.join(self.build_root, "logs")
+        os.makedirs(log_dir, exist_ok=True)
+        log_path = os.path.join(log_dir, f"{jid}.log")
+        options = dict(self.base_options)
+        options.update(job.get('options') or {})
+        options.update({'source': job['source'], 'mode': job.get('mode', options.get('mode', 'onedir')),
+                        'workpath': work_dir, 'distpath': dist_dir})
+        if job.get('output_name'): options['output_name'] = job['output_name']
+        result = {'job': jid, 'mode': options['mode'], 'status': '失败', 'seconds': 0.0,
+                  'log': log_path, 'progress': (0, '')}
+        start = time.time()
+        with open(log_path, 'w', encoding='utf-8') as log_file:
+            def job_emit(msg_type, content):
+                if msg_type in ('check', 'log'):
+                    log_file.write(content)
+                elif msg_type == 'progress':
+                    if content[1] != result['progress'][1]: self._report(jid, f"[{int(content[0]):3d}%] {content[1]}")
+                    result['progress'] = content
+                elif msg_type == 'deps_info':
+                    log_file.write(f"{content[0]}\n")
+            
+            core = PackagerCore(options, emit=job_emit, python_exe=self.python_exe)
+            try:
+                if not core.analyze():
+                    result['status'] = '缺依赖'
+                    return result
+                giant = any(m.split('.')[0] in GIANT_PACKAGES for m in core.all_imports)
+                need = int(job.get('memory_gb', 0) * 1024 ** 3) or (
+                    self.GIANT_JOB_MEMORY_BYTES if giant else self.JOB_MEMORY_BYTES)
+                self._acquire_memory(need)
+                try:
+                    ok = core.pack()
+                finally:
+                    self._release_memory(need)
+                result['status'] = '成功' if ok else '失败'
+                name = options.get('output_name') or "game"
+                result['output'] = os.path.join(dist_dir, name + ('.exe' if sys.platform == 'win32' and options['mode'] == 'onefile' else ''))
+            except Exception as e:
+                log_file.write(f"\n❌ 严重错误: {e}\n{traceback.format_exc()}\n")
+            finally:
+                core.close()
+                result['seconds'] = time.time() - start
+        return result
+    
+    def run(self) -> List[Dict[str, Any]]:
+        budget = f"{self.memory_budget / 1024 ** 3:.1f} GB" if self.memory_budget else "未知"
+        self.emit('log', f"=== 构建矩阵: {len(self.jobs)} 个任务, 并发 {self.max_workers}, 内存预算 {budget} ===\n")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(self._run_job, self.jobs, self.job_ids(self.jobs)))
+        self.emit('log', self.summary_table(results))
+        return results
+    
+    @staticmethod
+    def summary_table(results: List[Dict[str, Any]]) -> str:
+        rows = [("任务", "状态", "耗时", "日志")]
+        rows += [(r['job'], r['status'], f"{r['seconds']:.1f}s", r['log']) for r in results]
+        widths = [max(len(str(row[i])) for row in rows) for i in range(3)]
+        lines = ["", "=" * 60]
+        for row in rows:
+            lines.append("  ".join(str(c).ljust(w) for c, w in zip(row[:3], widths)) + "  " + row[3])
+        ok = sum(1 for r in results if r['status'] == '成功')
+        lines += ["=" * 60, f"成功 {ok}/{len(results)}", ""]
+        return "\n".join(lines)
+
+
+class BundleSizeReport:
+    """解析 PyInstaller 构建产物（TOC、warn/xref 文件、dist 目录）生成体积报告
+    
+    按顶层包汇总 Python 模块 / 原生库 / 数据文件的体积，列出最大的原生库与数据文件，
+    从 xref 中找出是谁引入了每个包，并与同一项目的上一份报告做差异比较。
+    PYZ 内模块的体积按源码大小比例分摊 PYZ 归档的实际大小；onefile 中的原生库与数据按未压缩大小计。
+    """
+    REPORT_VERSION = 1
+    TYPECODES = {'PYMODULE', 'PYSOURCE', 'EXTENSION', 'BINARY', 'DATA', 'SYMLINK', 'EXECUTABLE', 'ZIPFILE', 'SPLASH'}
+    SPECIAL_DIRS = {'_tcl_data': 'tkinter', '_tk_data': 'tkinter', 'tcl': 'tkinter', 'tk': 'tkinter',
+                    'tcl8': 'tkinter', 'base_library.zip': '(标准库)'}
+    
+    def __init__(self, build_dir: str, output_path: str, mode: str, project_root: Optional[str] = None,
+                 index: Optional[DistributionIndex] = None):
+        self.build_dir = build_dir
+        self.output_path = output_path
+        self.mode = mode
+        self.project_root = os.path.abspath(project_root) if project_root else None
+        self.index = index  # 有索引时按安装记录把 *.libs / *.dist-info 归到所属包
+    
+    @classmethod
+    def _toc_entries(cls, obj, out: Dict[Tuple[str, str], Optional[str]]):
+        """TOC 文件是 Python 字面量，递归找出其中的 (目标名, 源路径, 类型) 三元组"""
+        if isinstance(obj, (list, tuple)):
+            if (len(obj) == 3 and isinstance(obj[0], str) and isinstance(obj[2], str)
+                    and obj[2] in cls.TYPECODES and (obj[1] is None or isinstance(obj[1], str))):
+                out.setdefault((obj[0], obj[2]), obj[1])
+            else:
+                for item in obj: cls._toc_entries(item, out)
+    
+    def _in_project(self, path: Optional[str]) -> bool:
+        if not path or not self.project_root: return False
+        try: return os.path.commonpath([self.project_root, os.path.abspath(path)]) == self.project_root
+        except ValueError: return False
+    
+    def _group_of_path(self, dest: str) -> str:
+        parts = dest.replace('\\', '/').split('/')
+        if parts[0] in self.SPECIAL_DIRS: return self.SPECIAL_DIRS[parts[0]]
+        if 'lib-dynload' in parts:
+            return parts[-1].split('.')[0]
+        head = parts[0]
+        owner = self.index.import_name_for_path(head) if self.index else None
+        if owner and len(parts) > 1: return owner
+        if head.endswith('.libs'): head = pip_name_to_import_name(head[:-5])
+        elif head.endswith(('.dist-info', '.egg-info')):
+            head = pip_name_to_import_name(re.split(r'-\d', head.rsplit('.', 1)[0])[0])
+        elif len(parts) == 1:
+            return '(运行时)'
+        return head
+    
+    def _output_file(self, dest: str) -> Optional[str]:
+        if self.mode != 'onedir': return None
+        for base in (os.path.join(self.output_path, '_internal'), self.output_path):
+            path = os.path.join(base, dest)
+            if os.path.isfile(path): return path
+        return None
+    
+    def build(self) -> Dict[str, Any]:
+        entries: Dict[Tuple[str, str], Optional[str]] = {}
+        for name in sorted(os.listdir(self.build_dir)):
+            if name.endswith('.toc'):
+                try: self._toc_entries(ast.literal_eval(read_source_file(os.path.join(self.build_dir, name))), entries)
+                except (ValueError, SyntaxError, OSError): pass
+        
+        groups: Dict[str, Dict[str, Any]] = {}
+        
+        def add(group, kind, size):
+            g = groups.setdefault(group, {'python': 0, 'native': 0, 'data': 0, 'files': 0,
+                                          'stdlib': group == '(标准库)' or (self.index.is_stdlib(group) if self.index
+                                                                           else group in STDLIB_MODULES)})
+            g[kind] += size; g['files'] += 1
+        
+        # Python 模块：源码大小比例分摊 PYZ 实际大小
+        modules = [(dest, src) for (dest, code), src in entries.items() if code == 'PYMODULE']
+        src_sizes = {}
+        for dest, src in modules:
+            try: src_sizes[dest] = os.path.getsize(src) if src else 0
+            except OSError: src_sizes[dest] = 0
+        pyz_actual = sum(os.path.getsize(os.path.join(self.build_dir, n)) for n in os.listdir(self.build_dir)
+                         if n.endswith('.pyz'))
+        scale = pyz_actual / max(1, sum(src_sizes.values())) if pyz_actual else 1.0
+        module_sizes: Dict[str, int] = {}
+        for dest, src in modules:
+            size = int(src_sizes[dest] * scale); module_sizes[dest] = size
+            add('(项目代码)' if self._in_project(src) else dest.split('.')[0], 'python', size)
+        
+        native, data = [], []
+        for (dest, code), src in entries.items():
+            if code in ('PYMODULE', 'SYMLINK'): continue
+            path = self._output_file(dest) or src
+            try: size = os.path.getsize(path) if path else 0
+            except OSError: size = 0
+            if code == 'PYSOURCE': add('(项目代码)', 'python', size); continue
+            if code == 'EXECUTABLE': add('(启动器)', 'native', size); continue
+            if code in ('EXTENSION', 'BINARY'):
+                group = self._group_of_path(dest)
+                if code == 'EXTENSION' and group == '(运行时)': group = dest.split('.')[0]
+                add(group, 'native', size); native.append((dest, size, group))
+            else:
+                group = '(项目资源)' if self._in_project(src) else self._group_of_path(dest)
+                add(group, 'data', size); data.append((dest, size, group))
+        for g in groups.values(): g['total'] = g['python'] + g['native'] + g['data']
+        
+        if os.path.isdir(self.output_path):
+            total = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(self.output_path) for f in fs
+                        if not os.path.islink(os.path.join(d, f)))
+        else:
+            total = os.path.getsize(self.output_path) if os.path.exists(self.output_path) else 0
+        
+        excludes = []
+        for exc in EXCLUDE_MODULES:
+            size = sum(s for m, s in module_sizes.items() if is_module_excluded(m, [exc]))
+            size += sum(s for d, s, _ in native if is_module_excluded(d.split('.')[0].replace('/', '.'), [exc]))
+            if size: excludes.append((exc, size))
+        
+        return {'version': self.REPORT_VERSION, 'time': time.time(), 'mode': self.mode,
+                'output': self.output_path, 'total': total, 'groups': groups,
+                'native': sorted(native, key=lambda x: -x[1])[:100],
+                'data': sorted(data, key=lambda x: -x[1])[:100],
+                'exclude_savings': sorted(excludes, key=lambda x: -x[1]),
+                'missing': self._read_warnings(), 'importers': self._read_importers(set(groups))}
+    
+    def _read_warnings(self) -> List[str]:
+        """warn-*.txt 中顶层导入却找不到的模块（运行时最可能出错的那部分）"""
+        missing = []
+        for name in os.listdir(self.build_dir):
+            if not (name.startswith('warn-') and name.endswith('.txt')): continue
+            for line in read_source_file(os.path.join(self.build_dir, name)).splitlines():
+                m = re.match(r'missing module named (\S+) - imported by (.*)', line)
+                if m and '(top-level)' in m.group(2) and m.group(1) not in missing: missing.append(m.group(1))
+        return missing
+    
+    def _read_importers(self, groups: Set[str]) -> Dict[str, List[str]]:
+        """xref-*.html：每个顶层包被哪些别的包导入（说明它是被谁带进来的）"""
+        importers: Dict[str, Set[str]] = {}
+        for name in os.listdir(self.build_dir):
+            if not (name.startswith('xref-') and name.endswith('.html')): continue
+            html = read_source_file(os.path.join(self.build_dir, name))
+            for node in html.split('<a name="')[1:]:
+                mod = node.split('"', 1)[0]
+                top = mod.split('.')[0]
+                if top not in groups or 'imported by:' not in node: continue
+                section = node.split('imported by:', 1)[1].split('</div>', 1)[0]
+                for ref in re.findall(r'href="#([^"]+)"', section):
+                    ref_top = ref.split('.')[0] if not ref.endswith('.py') else '(项目代码)'
+                    if ref_top != top: importers.setdefault(top, set()).add(ref_top)
+        return {k: sorted(v)[:20] for k, v in importers.items()}
+    
+    @staticmethod
+    def diff(previous: Optional[Dict[str, Any]], current: Dict[str, Any], min_delta: int = 1024) -> List[Tuple[str, int, int]]:
+        """[(分组, 旧大小, 新大小)]，忽略小于 min_delta 字节的抖动，按变化量绝对值排序"""
+        if not previous: return []
+        old, new = previous.get('groups', {}), current['groups']
+        rows = [(g, old.get(g, {}).get('total', 0), new.get(g, {}).get('total', 0)) for g in set(old) | set(new)]
+        return sorted((r for r in rows if abs(r[2] - r[1]) >= min_delta), key=lambda r: -abs(r[2] - r[1]))
+    
+    @staticmethod
+    def to_html(report: Dict[str, Any], changes: List[Tuple[str, int, int]], title: str) -> str:
+        import html as html_mod
+        esc = lambda s: html_mod.escape(str(s))
+        mb = lambda b: f"{b / 1048576:.2f} MB"
+        groups = sorted(report['groups'].items(), key=lambda kv: -kv[1]['total'])
+        biggest = max([g['total'] for _, g in groups] + [1])
+        rows = []
+        for name, g in groups:
+            width = int(300 * g['total'] / biggest)
+            by = ", ".join(report['importers'].get(name, [])[:6])
+            rows.append(f"<tr><td>{esc(name)}{' <small>(stdlib)</small>' if g['stdlib'] else ''}</td>"
+                        f"<td class=n>{mb(g['total'])}</td><td class=n>{mb(g['python'])}</td>"
+                        f"<td class=n>{mb(g['native'])}</td><td class=n>{mb(g['data'])}</td><td class=n>{g['files']}</td>"
+                        f"<td><div class=bar style='width:{width}px'></div></td><td><small>{esc(by)}</small></td></tr>")
+        diff_rows = "".join(f"<tr><td>{esc(g)}</td><td class=n>{mb(o)}</td><td class=n>{mb(n)}</td>"
+                            f"<td class=n style='color:{'#c62828' if n > o else '#2e7d32'}'>{(n - o) / 1048576:+.2f} MB</td></tr>"
+                            for g, o, n in changes[:50])
+        files = lambda items: "".join(f"<tr><td>{esc(d)}</td><td class=n>{mb(s)}</td><td>{esc(g)}</td></tr>"
+                                      for d, s, g in items[:50])
+        savings = "".join(f"<tr><td>{esc(e)}</td><td class=n>{mb(s)}</td></tr>" for e, s in report['exclude_savings'])
+        return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>{esc(title)} 体积报告</title>
+<style>body{{font-family:sans-serif;margin:20px}}table{{border-collapse:collapse;margin-bottom:24px}}
+td,th{{border:1px solid #ddd;padding:3px 8px;font-size:13px}}th{{background:#eee}}.n{{text-align:right}}
+.bar{{background:#42a5f5;height:10px}}</style></head><body>
+<h2>{esc(title)} — {mb(report['total'])} ({esc(report['mode'])})</h2>
+<p>生成于 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(report['time']))}，GamePackager v{VERSION}</p>
+<h3>与上次构建相比</h3><table><tr><th>分组</th><th>上次</th><th>本次</th><th>变化</th></tr>{diff_rows or '<tr><td colspan=4>无历史或无变化</td></tr>'}</table>
+<h3>按顶层包</h3><table><tr><th>分组</th><th>合计</th><th>Python</th><th>原生库</th><th>数据</th><th>文件数</th><th></th><th>引入者 (xref)</th></tr>{''.join(rows)}</table>
+<h3>最大的原生库</h3><table><tr><th>文件</th><th>大小</th><th>分组</th></tr>{files(report['native'])}</table>
+<h3>最大的数据文件</h3><table><tr><th>文件</th><th>大小</th><th>分组</th></tr>{files(report['data'])}</table>
+<h3>EXCLUDE_MODULES 可节省（本次产物中仍包含的部分）</h3><table><tr><th>排除项</th><th>大小</th></tr>{savings or '<tr><td colspan=2>无</td></tr>'}</table>
+<h3>顶层导入但未找到的模块 (warn)</h3><p>{esc(', '.join(report['missing']) or '无')}</p>
+</body></html>"""
+
+
+class StartupBenchmark:
+    """对 dist 中的可执行文件做启动测速：每个目标启动 N 次（第 1 次记为冷启动），记录就绪耗时与峰值内存
+    
+    就绪判定（按优先级）：
+      1. 启动分析钩子 (--profile-startup) 在第一个窗口出现时写 sentinel 文件并退出进程
+         Linux 无显示器时优先启动 Xvfb；没有 Xvfb 则让钩子在创建窗口之前报告（headless sentinel）
+      2. 程序 stdout 输出标记行（默认 GAMEPACKAGER_READY）
+      3. 程序自行退出
+    结果追加到历史文件 (JSON Lines)，与同一目标的上一次记录比较，超过阈值视为性能回退。
+    """
+    DEFAULT_MARKER = "GAMEPACKAGER_READY"
+    POLL_INTERVAL = 0.005
+    
+    def __init__(self, targets: List[str], runs: int = 5, timeout: float = 60.0,
+                 marker: Optional[str] = None, emit: Optional[Callable[[str, Any], None]] = None):
+        self.targets = [os.path.abspath(t) for t in targets]
+        self.runs = max(1, runs)
+        self.timeout = timeout
+        self.marker = marker or self.DEFAULT_MARKER
+        self.emit = emit or (lambda msg_type, content: None)
+        self.display_proc: Optional[subprocess.Popen] = None
+        self.headless = False
+    
+    @staticmethod
+    def discover(dist: str) -> List[str]:
+        """dist 下的 onedir 目录中的可执行文件，以及 dist 根目录的 onefile 可执行文件"""
+        def is_exe(path):
+            if not os.path.isfile(path): return False
+            if sys.platform == 'win32': return path.lower().endswith('.exe')
+            name = os.path.basename(path)
+            # 版本化共享库（libpython3.x.so.1.0）在 Linux 上也带可执行位
+            return os.access(path, os.X_OK) and not name.endswith(('.so', '.py', '.json', '.jsonl')) and '.so.' not in name
+        
+        found = []
+        if not os.path.isdir(dist): return found
+        for name in sorted(os.listdir(dist)):
+            path = os.path.join(dist, name)
+            if os.path.isdir(path):
+                found += [os.path.join(path, n) for n in sorted(os.listdir(path)) if is_exe(os.path.join(path, n))]
+            elif is_exe(path):
+                found.append(path)
+        return found
+    
+    @staticmethod
+    def describe(exe: str) -> Dict[str, Any]:
+        """布局 (onedir/onefile)、是否含 UPX 压缩的二进制（按 UPX! 魔数判断）、产物总大小"""
+        parent = os.path.dirname(exe)
+        onedir = os.path.isdir(os.path.join(parent, '_internal')) or any(
+            f.lower().endswith(('.pyd', '.so', '.dll')) or '.so.' in f for f in os.listdir(parent))
+        files = [exe]
+        if onedir:
+            files = [os.path.join(d, f) for d, _, fs in os.walk(parent) for f in fs]
+        upx = False
+        for path in files:
+            if not (path == exe or path.lower().endswith(('.pyd', '.dll', '.so')) or '.so.' in path): continue
+            try:
+                with open(path, 'rb') as f:
+                    if b'UPX!' in f.read(4096): upx = True; break
+            except OSError: pass
+        size = 0
+        for path in files:
+            try: size += os.path.getsize(path)
+            except OSError: pass
+        return {'layout': 'onedir' if onedir else 'onefile', 'upx': upx, 'size': size}
+    
+    def _start_display(self, env: Dict[str, str]):
+        if not sys.platform.startswith('linux') or env.get('DISPLAY') or env.get('WAYLAND_DISPLAY'): return
+        xvfb = shutil.which('Xvfb')
+        if not xvfb:
+            self.headless = True
+            env['GAMEPACKAGER_BENCH_HEADLESS'] = '1'
+            self.emit('log', "⚠️ 无显示器且未安装 Xvfb：以创建窗口之前的时刻作为就绪点\n")
+            return
+        for n in range(90, 110):
+            if os.path.exists(f"/tmp/.X11-unix/X{n}") or os.path.exists(f"/tmp/.X{n}-lock"): continue
+            self.display_proc = subprocess.Popen([xvfb, f":{n}", "-screen", "0", "1280x800x24", "-nolisten", "tcp"],
+                                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            for _ in range(100):
+                if os.path.exists(f"/tmp/.X11-unix/X{n}"): break
+                time.sleep(0.05)
+            env['DISPLAY'] = f":{n}"
+            self.emit('log', f"🖥️ 使用虚拟显示 Xvfb :{n}\n")
+            return
+    
+    @staticmethod
+    def _process_tree(pid: int) -> List[int]:
+        pids, pending = [], [pid]
+        while pending:
+            p = pending.pop(); pids.append(p)
+            try:
+                with open(f"/proc/{p}/task/{p}/children") as f: pending += [int(c) for c in f.read().split()]
+            except (OSError, ValueError): pass
+        return pids
+    
+    @staticmethod
+    def _peak_rss(pid: int) -> Optional[int]:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith('VmHWM:'): return int(line.split()[1]) * 1024
+        except (OSError, ValueError): pass
+        return None
+    
+    @staticmethod
+    def _peak_rss_windows(proc: subprocess.Popen) -> Optional[int]:
+        try:
+            import ctypes
+            from ctypes import wintypes
+            
+            class PMC(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+            pmc = PMC(); pmc.cb = ctypes.sizeof(PMC)
+            if ctypes.windll.psapi.GetProcessMemoryInfo(int(proc._handle), ctypes.byref(pmc), pmc.cb):
+                return pmc.PeakWorkingSetSize
+        except Exception: pass
+        return None
+    
+    def _kill_tree(self, proc: subprocess.Popen, pids: List[int]):
+        for pid in reversed(pids):
+            if pid == proc.pid: continue
+            try: os.kill(pid, 9)
+            except OSError: pass
+        try:
+            proc.kill(); proc.wait(timeout=5)
+        except Exception: pass
+    
+    def launch(self, exe: str, env: Dict[str, str]) -> Dict[str, Any]:
+        fd, sentinel = tempfile.mkstemp(prefix="gp_bench_", suffix=".json"); os.close(fd); os.remove(sentinel)
+        profile_out = sentinel[:-5] + "_profile.json"
+        env = dict(env, GAMEPACKAGER_BENCH_SENTINEL=sentinel, GAMEPACKAGER_BENCH_EXIT='1',
+                   GAMEPACKAGER_PROFILE_OUT=profile_out)
+        marker_time: List[float] = []
+        start = time.time()
+        proc = subprocess.Popen([exe], cwd=os.path.dirname(exe), env=env, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+        
+        def read_output():
+            for raw in iter(proc.stdout.readline, b''):
+                if not marker_time and self.marker.encode() in raw: marker_time.append(time.time())
+        reader = threading.Thread(target=read_output, daemon=True); reader.start()
+        
+        peaks: Dict[int, int] = {}
+        pids = [proc.pid]
+        method, ready = 'timeout', None
+        linux = sys.platform.startswith('linux')
+        while True:
+            if linux:
+                pids = self._process_tree(proc.pid)
+                for pid in pids:
+                    rss = self._peak_rss(pid)
+                    if rss: peaks[pid] = max(peaks.get(pid, 0), rss)
+            if os.path.exists(sentinel):
+                time.sleep(0.05)  # 等钩子写完
+                try:
+                    with open(sentinel) as f: info = json.load(f)
+                    method, ready = info.get('kind', 'window'), info['time'] - start
+                except (OSError, ValueError, KeyError):
+                    method, ready = 'window', time.time() - start
+                break
+            if marker_time:
+                method, ready = 'marker', marker_time[0] - start; break
+            if proc.poll() is not None:
+                reader.join(1)
+                if marker_time: method, ready = 'marker', marker_time[0] - start
+                else: method, ready = 'exit', time.time() - start
+                break
+            if time.time() - start > self.timeout: break
+            time.sleep(self.POLL_INTERVAL)
+        
+        rss_total = sum(peaks.values()) or None
+        self._kill_tree(proc, pids)
+        if sys.platform == 'win32': rss_total = self._peak_rss_windows(proc)
+        profile = {}
+        for path in (sentinel, profile_out):
+            try:
+                if path == profile_out:
+                    with open(path, encoding='utf-8') as f: profile = json.load(f)
+                os.remove(path)
+            except (OSError, ValueError): pass
+        return {'ready': ready, 'method': method, 'rss': rss_total, 'exit': proc.returncode,
+                'process_age_at_hook': profile.get('process_age_at_hook'),
+                'import_self_total': profile.get('import_self_total')}
+    
+    def run(self) -> List[Dict[str, Any]]:
+        env = os.environ.copy()
+        self._start_display(env)
+        results = []
+        try:
+            for i, exe in enumerate(self.targets):
+                self.emit('progress', (int(100 * i / max(1, len(self.targets))), f"测速: {os.path.basename(exe)}"))
+                info = self.describe(exe)
+                samples = []
+                for n in range(self.runs):
+                    samples.append(self.launch(exe, env))
+                    s = samples[-1]
+                    ready = f"{s['ready']:.3f}s" if s['ready'] is not None else "超时"
+                    rss = f"{s['rss'] / 1048576:.0f}MB" if s['rss'] else "-"
+                    self.emit('log', f"  {os.path.basename(exe)} #{n + 1}{'(冷)' if n == 0 else ''}: "
+                                     f"{ready} [{s['method']}] 峰值内存 {rss}\n")
+                warm = sorted(s['ready'] for s in samples[1:] if s['ready'] is not None)
+                rss_values = [s['rss'] for s in samples if s['rss']]
+                results.append(dict(info, target=exe, runs=self.runs, cold=samples[0]['ready'],
+                                    warm_median=(warm[(len(warm) - 1) // 2] + warm[len(warm) // 2]) / 2 if warm else None,
+                                    warm_min=warm[0] if warm else None, warm_max=warm[-1] if warm else None,
+                                    peak_rss=max(rss_values) if rss_values else None,
+                                    method=samples[-1]['method'], headless=self.headless,
+                                    import_self_total=samples[-1].get('import_self_total'), time=time.time()))
+        finally:
+            if self.display_proc:
+                self.display_proc.terminate()
+                try: self.display_proc.wait(timeout=5)
+                except subprocess.TimeoutExpired: self.display_proc.kill()
+        self.emit('progress', (100, "测速完成"))
+        return results
+    
+    @staticmethod
+    def compare(history_file: str, results: List[Dict[str, Any]], dist: str,
+                threshold: float = 0.15, rss_threshold: float = 0.15) -> List[str]:
+        """与历史中同一目标的最近一次记录比较，返回回退描述列表；然后把本次结果追加到历史"""
+        previous: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(history_file):
+            with open(history_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try: rec = json.loads(line)
+                    except ValueError: continue
+                    previous[rec.get('name')] = rec
+        regressions = []
+        for r in results:
+            r['name'] = os.path.relpath(r['target'], dist).replace(os.sep, '/')
+            prev = previous.get(r['name'])
+            if not prev: continue
+            for key, limit in (('warm_median', threshold), ('cold', threshold), ('peak_rss', rss_threshold)):
+                old, new = prev.get(key), r.get(key)
+                if old and new and new > old * (1 + limit):
+                    regressions.append(f"{r['name']}: {key} {old:.4g} → {new:.4g} (+{(new / old - 1) * 100:.0f}%)")
+        os.makedirs(os.path.dirname(os.path.abspath(history_file)), exist_ok=True)
+        with open(history_file, 'a', encoding='utf-8') as f:
+            for r in results: f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        return regressions
+    
+    @staticmethod
+    def summary_table(results: List[Dict[str, Any]]) -> str:
+        fmt = lambda v, unit='s': f"{v:.3f}{unit}" if v is not None else "-"
+        rows = [("目标", "布局", "UPX", "大小", "冷启动", "热启动(中位)", "峰值内存", "判定")]
+        for r in results:
+            rows.append((r.get('name') or os.path.basename(r['target']), r['layout'], "是" if r['upx'] else "否",
+                         f"{r['size'] / 1048576:.1f}MB", fmt(r['cold']), fmt(r['warm_median']),
+                         f"{r['peak_rss'] / 1048576:.0f}MB" if r['peak_rss'] else "-", r['method']))
+        widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+        lines = ["", "=" * 60]
+        lines += ["  ".join(str(c).ljust(w) for c, w in zip(row, widths)) for row in rows]
+        lines += ["=" * 60, ""]
+        return "\n".join(lines)
+
+
+# tkinter 仅在启动 GUI 时导入，命令行/无界面构建机无需 Tk
+tk = ttk = messagebox = scrolledtext = filedialog = None
+
+
+class LogBatcher:
+    """把逐行的 log 消息合并为按时间 / 大小封顶的块再转发给 sink
+    
+    其他类型的消息到达时先冲刷缓冲，保证顺序不变；消费方（GUI 主循环）定时调用 flush_due()，
+    避免最后几行滞留在缓冲里。可在多个线程中调用。
+    """
+    MAX_DELAY = 0.1
+    MAX_CHARS = 64 * 1024
+    
+    def __init__(self, sink: Callable[[str, Any], None]):
+        self.sink = sink
+        self._buf: List[str] = []
+        self._size = 0
+        self._since = 0.0
+        self._lock = threading.Lock()
+    
+    def __call__(self, msg_type: str, content: Any):
+        with self._lock:
+            if msg_type == 'log':
+                if not self._buf: self._since = time.time()
+                self._buf.append(content); self._size += len(content)
+                if self._size >= self.MAX_CHARS or time.time() - self._since >= self.MAX_DELAY: self._flush()
+                return
+            self._flush()
+            self.sink(msg_type, content)
+    
+    def _flush(self):
+        if self._buf:
+            self.sink('log', ''.join(self._buf))
+            self._buf, self._size = [], 0
+    
+    def flush_due(self):
+        with self._lock:
+            if self._buf and time.time() - self._since >= self.MAX_DELAY: self._flush()
+
+
+def _import_tkinter():
+    global tk, ttk, messagebox, scrolledtext, filedialog
+    import tkinter as tk
+    from tkinter import ttk, messagebox, scrolledtext, filedialog
+
+
+class GamePackagerV5:
+    """v5.3 智能优化版"""
+    LOG_MAX_LINES = 5000
+    LOG_LEVELS = ('INFO', 'WARNING', 'ERROR')
+    LOG_ERROR_PATTERN = re.compile(r'\bERROR\b|❌|Traceback \(most recent call last\)')
+    LOG_WARNING_PATTERN = re.compile(r'\bWARNING\b|⚠️')
+    TICK_BUDGET = 0.015  # 每次 _process_queue 的处理时长上限（秒）
+    TICK_LOG_CHARS = 64 * 1024  # 每个 tick 最多渲染的日志量，其余留到下一个 tick
+    
+    def __init__(self):
+        _import_tkinter()
+        self.root = tk.Tk()
+        self.root.title(f"EXE打包工具 v{VERSION} - 智能优化版")
+        self.root.geometry("900x850")
+        self.root.resizable(True, True)
+        self.root.minsize(800, 700)
+        
+        self.message_queue = queue.Queue()
+        self.log_batcher = LogBatcher(lambda msg_type, content: self.message_queue.put((msg_type, content)))
+        self.core = PackagerCore(emit=self.log_batcher)
+        # 日志控件只保留最近 LOG_MAX_LINES 行（环形缓冲），完整日志写入 ~/.game_packer_cache/logs
+        self.log_lines: deque = deque(maxlen=self.LOG_MAX_LINES)
+        self.log_file = None
+        self.log_path: Optional[str] = None
+        self.python_exe = self.core.python_exe
+        
+        # UI变量
+        opts = DEFAULT_PACK_OPTIONS
+        self.pack_mode_var = tk.StringVar(value=opts['mode'])
+        self.no_console_var = tk.BooleanVar(value=opts['no_console'])
+        self.clean_var = tk.BooleanVar(value=opts['clean'])
+        self.incremental_var = tk.BooleanVar(value=opts['incremental'])
+        self.upx_var = tk.BooleanVar(value=opts['upx'])
+        self.admin_var = tk.BooleanVar(value=opts['admin'])
+        self.safe_mode_var = tk.BooleanVar(value=opts['safe_mode'])
+        self.cleanup_strategy_var = tk.StringVar(value='atexit')
+        
+        self.collect_all_var = tk.BooleanVar(value=opts['collect_all'])
+        self.fast_mode_var = tk.BooleanVar(value=opts['fast_mode'])
+        self.parallel_var = tk.BooleanVar(value=opts['parallel'])
+        self.project_graph_var = tk.BooleanVar(value=opts['project_graph'])
+        self.deep_verify_var = tk.BooleanVar(value=opts['deep_verify'])
+        self.optimize_assets_var = tk.BooleanVar(value=opts['optimize_assets'])
+        self.transcode_wav_var = tk.BooleanVar(value=opts['transcode_wav'])
+        self.profile_startup_var = tk.BooleanVar(value=opts['profile_startup'])
+        self.trace_profile_var = tk.BooleanVar(value=opts['trace_profile'])
+        self.offline_var = tk.BooleanVar(value=opts['offline'])
+        self.isolated_env_var = tk.BooleanVar(value=opts['isolated_env'])
+        
+        self._create_ui()
+        self._process_queue()
+    
+    def _create_ui(self):
+        title_frame = tk.Frame(self.root, bg='#1a237e', height=45)
+        title_frame.pack(fill=tk.X)
+        title_frame.pack_propagate(False)
+        tk.Label(title_frame, text=f"🎮 EXE打包工具 v{VERSION} - 智能优化版", font=('Microsoft YaHei', 11, 'bold'),
+                 bg='#1a237e', fg='white').pack(pady=10)
         
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=3)
@@ -542,6 +3950,7 @@ class GamePackagerV5:
         self._create_check_tab()
         self._create_deps_tab()
         self._create_log_tab()
+        self._create_size_tab()
         self._create_bottom_bar()
     
     def _create_config_tab(self):
@@ -564,22 +3973,22 @@ class GamePackagerV5:
         
         r1 = tk.Frame(source_frame, bg='white'); r1.pack(fill=tk.X, pady=3)
         tk.Label(r1, text="源文件:", bg='white', width=8).pack(side=tk.LEFT)
-        self.source_entry = ttk.Entry(r1); self.source_entry.insert(0, self.default_source)
+        self.source_entry = ttk.Entry(r1); self.source_entry.insert(0, DEFAULT_PACK_OPTIONS['source'])
         self.source_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         tk.Button(r1, text="浏览", bg='#2196F3', fg='white', command=self._browse_source).pack(side=tk.LEFT)
         
         r2 = tk.Frame(source_frame, bg='white'); r2.pack(fill=tk.X, pady=3)
         tk.Label(r2, text="输出名:", bg='white', width=8).pack(side=tk.LEFT)
-        self.output_entry = ttk.Entry(r2); self.output_entry.insert(0, self.output_name)
+        self.output_entry = ttk.Entry(r2); self.output_entry.insert(0, DEFAULT_PACK_OPTIONS['output_name'])
         self.output_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         
         icon_frame = tk.LabelFrame(main, text="图标配置", font=('Arial', 10, 'bold'), bg='white', padx=10, pady=8)
         icon_frame.pack(fill=tk.X, padx=10, pady=5)
         
-        for label, key, default in [("EXE图标", "exe", "480x480.png"), ("窗口图标", "window", "28x28.png"), ("任务栏", "taskbar", "108x108.png")]:
+        for label, key in [("EXE图标", "exe"), ("窗口图标", "window"), ("任务栏", "taskbar")]:
             row = tk.Frame(icon_frame, bg='white'); row.pack(fill=tk.X, pady=2)
             tk.Label(row, text=label+":", bg='white', width=16, anchor='w').pack(side=tk.LEFT)
-            entry = ttk.Entry(row); entry.insert(0, default)
+            entry = ttk.Entry(row); entry.insert(0, DEFAULT_PACK_OPTIONS['icons'][key])
             entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
             tk.Button(row, text="...", width=3, command=lambda k=key: self._browse_icon(k)).pack(side=tk.LEFT)
             setattr(self, f"{key}_icon_entry", entry)
@@ -591,23 +4000,32 @@ class GamePackagerV5:
         left = tk.Frame(mr, bg='#e8f5e9', relief=tk.RIDGE, bd=2)
         left.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 5))
         tk.Radiobutton(left, text="📁 单文件夹模式（推荐）", variable=self.pack_mode_var, value='onedir', bg='#e8f5e9', fg='#2e7d32').pack(anchor='w', padx=10, pady=5)
-        tk.Label(left, text="• 启动速度最快 • 无需解压\n• 适合所有情况", bg='#e8f5e9', fg='#1b5e20', font=('Arial', 8)).pack(anchor='w', padx=25)
+        self.mode_info_labels = {}
+        self.mode_info_labels['onedir'] = tk.Label(left, text="• 启动速度最快 • 无需解压\n• 适合所有情况", bg='#e8f5e9', fg='#1b5e20', font=('Arial', 8), justify='left')
+        self.mode_info_labels['onedir'].pack(anchor='w', padx=25)
         
         right = tk.Frame(mr, bg='#e3f2fd', relief=tk.RIDGE, bd=2)
         right.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(5, 0))
         tk.Radiobutton(right, text="📦 单文件模式", variable=self.pack_mode_var, value='onefile', bg='#e3f2fd', fg='#1565c0').pack(anchor='w', padx=10, pady=5)
-        tk.Label(right, text="• 方便分发 • 启动较慢\n• 巨型库打包极慢", bg='#e3f2fd', fg='#0d47a1', font=('Arial', 8)).pack(anchor='w', padx=25)
+        self.mode_info_labels['onefile'] = tk.Label(right, text="• 方便分发 • 启动较慢\n• 巨型库打包极慢", bg='#e3f2fd', fg='#0d47a1', font=('Arial', 8), justify='left')
+        self.mode_info_labels['onefile'].pack(anchor='w', padx=25)
         
         opt_frame = tk.LabelFrame(main, text="打包选项", font=('Arial', 10, 'bold'), bg='white', padx=10, pady=8)
         opt_frame.pack(fill=tk.X, padx=10, pady=5)
         or1 = tk.Frame(opt_frame, bg='white'); or1.pack(fill=tk.X, pady=3)
-        for t, v in [("隐藏控制台", self.no_console_var), ("清理临时文件", self.clean_var), ("UPX压缩(慎用)", self.upx_var), ("管理员权限", self.admin_var), ("🛡️ 安全模式", self.safe_mode_var)]:
+        for t, v in [("隐藏控制台", self.no_console_var), ("强制清理", self.clean_var), ("增量构建", self.incremental_var), ("UPX压缩(慎用)", self.upx_var), ("管理员权限", self.admin_var), ("🛡️ 安全模式", self.safe_mode_var)]:
             tk.Checkbutton(or1, text=t, variable=v, bg='white').pack(side=tk.LEFT, padx=8)
             
         or2 = tk.Frame(opt_frame, bg='#e8f4fd'); or2.pack(fill=tk.X, pady=5)
         tk.Label(or2, text="⚡ v5.3 增强:", font=('Arial', 9, 'bold'), bg='#e8f4fd', fg='#1565c0').pack(side=tk.LEFT, padx=5)
-        for t, v in [("自动收集(智能)", self.collect_all_var), ("排除调试模块", self.fast_mode_var), ("并行分析", self.parallel_var)]:
+        for t, v in [("自动收集(智能)", self.collect_all_var), ("排除调试模块", self.fast_mode_var), ("并行分析", self.parallel_var),
+                     ("项目全量分析", self.project_graph_var), ("深度验证(导入)", self.deep_verify_var)]:
             tk.Checkbutton(or2, text=t, variable=v, bg='#e8f4fd').pack(side=tk.LEFT, padx=8)
+        or3 = tk.Frame(opt_frame, bg='white'); or3.pack(fill=tk.X, pady=3)
+        for t, v in [("🗜️ 优化资源(PNG/JSON)", self.optimize_assets_var), ("WAV转OGG(需ffmpeg)", self.transcode_wav_var),
+                     ("⏱️ 启动分析", self.profile_startup_var), ("🔬 应用追踪清单", self.trace_profile_var),
+                     ("离线安装(wheelhouse)", self.offline_var), ("🧪 独立构建环境", self.isolated_env_var)]:
+            tk.Checkbutton(or3, text=t, variable=v, bg='white').pack(side=tk.LEFT, padx=8)
 
         info_frame = tk.LabelFrame(main, text="v5.3 改进说明", font=('Arial', 9, 'bold'), bg='#e8f5e9', padx=10, pady=5)
         info_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -621,9 +4039,9 @@ class GamePackagerV5:
     def _create_deps_tab(self):
         f = ttk.Frame(self.notebook); self.notebook.add(f, text="📊 依赖分析")
         tree_frame = tk.Frame(f); tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-        cols = ('模块名', '状态', '版本', 'pip包名', '类型')
+        cols = ('模块名', '状态', '版本', 'pip包名', '类型', '来源')
         self.deps_tree = ttk.Treeview(tree_frame, columns=cols, show='headings', height=15)
-        for c, w in zip(cols, [150, 80, 100, 130, 150]):
+        for c, w in zip(cols, [150, 60, 90, 130, 90, 180]):
             self.deps_tree.heading(c, text=c); self.deps_tree.column(c, width=w)
         sb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.deps_tree.yview)
         self.deps_tree.configure(yscrollcommand=sb.set)
@@ -635,9 +4053,100 @@ class GamePackagerV5:
         f = ttk.Frame(self.notebook); self.notebook.add(f, text="📝 打包日志")
         self.log_text = scrolledtext.ScrolledText(f, height=20, font=('Consolas', 9))
         self.log_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.log_text.tag_config('WARNING', foreground='#e65100')
+        self.log_text.tag_config('ERROR', foreground='#c62828')
         bf = tk.Frame(f); bf.pack(pady=3)
-        tk.Button(bf, text="清空日志", command=lambda: self.log_text.delete(1.0, tk.END)).pack(side=tk.LEFT, padx=5)
+        tk.Label(bf, text="级别:").pack(side=tk.LEFT)
+        self.log_level_var = tk.StringVar(value='INFO')
+        level_box = ttk.Combobox(bf, textvariable=self.log_level_var, values=self.LOG_LEVELS, width=9, state='readonly')
+        level_box.pack(side=tk.LEFT, padx=5); level_box.bind('<<ComboboxSelected>>', lambda e: self._render_log())
+        tk.Button(bf, text="清空日志", command=self._clear_log).pack(side=tk.LEFT, padx=5)
         tk.Button(bf, text="复制日志", command=self._copy_log).pack(side=tk.LEFT, padx=5)
+        tk.Button(bf, text="完整日志", command=self._open_log_file).pack(side=tk.LEFT, padx=5)
+
+    @classmethod
+    def _log_level(cls, line: str) -> str:
+        if cls.LOG_ERROR_PATTERN.search(line): return 'ERROR'
+        if cls.LOG_WARNING_PATTERN.search(line): return 'WARNING'
+        return 'INFO'
+
+    def _append_log(self, text: str):
+        """追加一块日志：写入完整日志文件，进入环形缓冲，按级别过滤后一次性插入控件"""
+        if self.log_file is None:
+            logs = get_cache_dir("logs")
+            for old in sorted(glob.glob(os.path.join(logs, "*.log")))[:-20]:
+                try: os.remove(old)
+                except OSError: pass
+            self.log_path = os.path.join(logs, time.strftime("gamepackager_%Y%m%d_%H%M%S.log"))
+            self.log_file = open(self.log_path, 'a', encoding='utf-8', errors='replace')
+        self.log_file.write(text); self.log_file.flush()
+        entries = [(self._log_level(line), line) for line in text.splitlines(keepends=True)]
+        self.log_lines.extend(entries)
+        self._insert_log(entries[-self.LOG_MAX_LINES:])
+
+    def _insert_log(self, entries):
+        min_rank = self.LOG_LEVELS.index(self.log_level_var.get())
+        follow = self.log_text.yview()[1] >= 0.999  # 用户往上翻看时不强制滚到底
+        run_level, run = None, []
+        for level, line in entries:
+            if self.LOG_LEVELS.index(level) < min_rank: continue
+            if level != run_level and run:
+                self.log_text.insert(tk.END, ''.join(run), run_level); run = []
+            run_level = level; run.append(line)
+        if run: self.log_text.insert(tk.END, ''.join(run), run_level)
+        lines = int(self.log_text.index('end-1c').split('.')[0])
+        if lines > self.LOG_MAX_LINES: self.log_text.delete('1.0', f"{lines - self.LOG_MAX_LINES + 1}.0")
+        if follow: self.log_text.see(tk.END)
+
+    def _render_log(self):
+        self.log_text.delete(1.0, tk.END); self._insert_log(list(self.log_lines))
+
+    def _clear_log(self):
+        """清空控件与缓冲，并开始新的完整日志文件"""
+        self.log_lines.clear(); self.log_text.delete(1.0, tk.END)
+        if self.log_file is not None: self.log_file.close(); self.log_file = None
+
+    def _open_log_file(self):
+        if not self.log_path or not os.path.exists(self.log_path):
+            messagebox.showinfo("提示", "还没有日志"); return
+        if sys.platform == 'win32': os.startfile(self.log_path)
+        else: subprocess.run(['xdg-open', self.log_path])
+
+    def _create_size_tab(self):
+        f = ttk.Frame(self.notebook); self.notebook.add(f, text="📏 体积分析")
+        tree_frame = tk.Frame(f); tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        cols = ('分组', '合计(MB)', 'Python', '原生库', '数据', '较上次', '引入者')
+        self.size_tree = ttk.Treeview(tree_frame, columns=cols, show='headings', height=15)
+        for c, w in zip(cols, [150, 80, 70, 70, 70, 80, 240]):
+            self.size_tree.heading(c, text=c); self.size_tree.column(c, width=w)
+        sb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.size_tree.yview)
+        self.size_tree.configure(yscrollcommand=sb.set)
+        self.size_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True); sb.pack(side=tk.RIGHT, fill=tk.Y)
+        bf = tk.Frame(f); bf.pack(pady=3)
+        self.size_info = tk.Label(bf, text="打包成功后显示各依赖的体积", font=('Arial', 10), fg='gray')
+        self.size_info.pack(side=tk.LEFT, padx=5)
+        self.size_html = None
+        tk.Button(bf, text="打开HTML报告", command=self._open_size_report).pack(side=tk.LEFT, padx=5)
+
+    def _show_size_report(self, report, changes, html_path):
+        self.size_html = html_path
+        self.size_tree.delete(*self.size_tree.get_children())
+        delta = {g: n - o for g, o, n in changes}
+        mb = lambda b: f"{b / 1048576:.2f}"
+        for name, g in sorted(report['groups'].items(), key=lambda kv: -kv[1]['total']):
+            d = delta.get(name)
+            self.size_tree.insert('', 'end', values=(name, mb(g['total']), mb(g['python']), mb(g['native']), mb(g['data']),
+                                                     f"{d / 1048576:+.2f}" if d else '', ", ".join(report['importers'].get(name, [])[:5])))
+        text = f"总计 {report['total'] / 1048576:.1f} MB"
+        if report['exclude_savings']:
+            exc, size = report['exclude_savings'][0]
+            text += f" | 💡 排除 {exc} 可省 {size / 1048576:.1f} MB"
+        self.size_info.config(text=text, fg='black')
+
+    def _open_size_report(self):
+        if self.size_html and os.path.exists(self.size_html):
+            import webbrowser
+            webbrowser.open(Path(self.size_html).as_uri())
 
     def _create_bottom_bar(self):
         b = tk.Frame(self.root, bg='#ecf0f1', height=85); b.pack(fill=tk.X, side=tk.BOTTOM); b.pack_propagate(False)
@@ -647,6 +4156,7 @@ class GamePackagerV5:
         self.btn_refs = {}
         for t, c, cmd in [("🔍 检查", '#FF9800', self._start_check), ("📊 分析", '#9C27B0', self._start_analyze), 
                           ("📦 安装", '#2196F3', self._start_install), ("🚀 打包", '#4CAF50', self._start_pack), 
+                          ("⏱️ 测速", '#009688', self._start_bench), ("🔬 追踪", '#795548', self._start_trace),
                           ("🗑️ 清缓存", '#FF5722', self._clear_cache), ("📁 目录", '#607D8B', self._open_output), 
                           ("❌ 退出", '#F44336', self._quit)]:
             btn = tk.Button(bf, text=t, font=('Arial', 9, 'bold'), bg=c, fg='white', width=8, command=cmd)
@@ -658,7 +4168,7 @@ class GamePackagerV5:
         filepath = filedialog.askopenfilename(title="选择源文件", filetypes=[("Python文件", "*.py"), ("所有文件", "*.*")])
         if filepath:
             self.source_entry.delete(0, tk.END); self.source_entry.insert(0, filepath)
-            self.analyzed_deps = {}; self.missing_deps = []
+            self.core.analyzed_deps = {}; self.core.missing_deps = []
             self.btn_refs["📊 分析"].config(state='disabled'); self.btn_refs["🚀 打包"].config(state='disabled')
     
     def _browse_icon(self, k):
@@ -673,7 +4183,7 @@ class GamePackagerV5:
         else: messagebox.showinfo("提示", "未找到输出目录")
 
     def _clear_cache(self):
-        self.dep_cache.clear(); self.analyzed_deps={}; self.missing_deps=[]
+        self.core.clear_cache()
         messagebox.showinfo("成功", "缓存已清除")
     
     def _copy_log(self):
@@ -684,309 +4194,140 @@ class GamePackagerV5:
         if messagebox.askyesno("确认", "确定退出？"): self.root.quit()
 
     def _process_queue(self):
+        """每个 tick 最多处理 TICK_BUDGET 秒的消息；日志块合并后一次性渲染，积压时缩短下次轮询间隔"""
+        self.log_batcher.flush_due()
+        deadline = time.perf_counter() + self.TICK_BUDGET
+        pending_log, pending_size = [], 0
         try:
-            while True:
+            while time.perf_counter() < deadline and pending_size < self.TICK_LOG_CHARS:
                 msg_type, content = self.message_queue.get_nowait()
-                if msg_type == 'check': self.check_text.insert(tk.END, content); self.check_text.see(tk.END)
-                elif msg_type == 'log': self.log_text.insert(tk.END, content); self.log_text.see(tk.END)
-                elif msg_type == 'progress': self.progress['value'] = content[0]; self.progress_label.config(text=content[1])
+                if msg_type == 'log': pending_log.append(content); pending_size += len(content)
+                elif msg_type == 'check': self.check_text.insert(tk.END, content); self.check_text.see(tk.END)
+                elif msg_type == 'progress':
+                    self.progress['value'] = content[0]
+                    eta = content[2] if len(content) > 2 else None
+                    self.progress_label.config(text=content[1] + (f"  {int(content[0])}% · 剩余约 {BuildProgressModel.format_eta(eta)}"
+                                                                  if eta is not None else ''))
                 elif msg_type == 'deps_tree': 
                     for item in content: self.deps_tree.insert('', 'end', values=item)
                 elif msg_type == 'deps_info': self.deps_info.config(text=content[0], fg=content[1])
                 elif msg_type == 'enable_btn': self.btn_refs[content].config(state='normal')
+                elif msg_type == 'size_report': self._show_size_report(*content)
+                elif msg_type == 'bench':
+                    for r in content:
+                        label = self.mode_info_labels.get(r['layout'])
+                        if label and r.get('warm_median') is not None:
+                            base = label.cget('text').split("\n⏱️")[0]
+                            label.config(text=f"{base}\n⏱️ 实测: 冷 {r['cold']:.2f}s / 热 {r['warm_median']:.2f}s")
         except queue.Empty: pass
-        self.root.after(100, self._process_queue)
+        if pending_log: self._append_log(''.join(pending_log))
+        self.root.after(10 if not self.message_queue.empty() else 100, self._process_queue)
     
-    def _add_check_msg(self, msg): self.message_queue.put(('check', msg))
-    def _add_log_msg(self, msg): self.message_queue.put(('log', msg))
-    def _get_source_file(self):
-        s = self.source_entry.get().strip()
-        return s + '.py' if s and not s.endswith('.py') else s
+    def _sync_options(self):
+        """把界面上的配置同步到 PackagerCore（在启动后台任务前于主线程调用）"""
+        self.core.update_options({
+            'source': self.source_entry.get().strip(),
+            'output_name': self.output_entry.get().strip(),
+            'mode': self.pack_mode_var.get(),
+            'no_console': self.no_console_var.get(), 'clean': self.clean_var.get(),
+            'incremental': self.incremental_var.get(),
+            'upx': self.upx_var.get(), 'admin': self.admin_var.get(), 'safe_mode': self.safe_mode_var.get(),
+            'collect_all': self.collect_all_var.get(), 'fast_mode': self.fast_mode_var.get(),
+            'parallel': self.parallel_var.get(), 'project_graph': self.project_graph_var.get(),
+            'deep_verify': self.deep_verify_var.get(),
+            'optimize_assets': self.optimize_assets_var.get(), 'transcode_wav': self.transcode_wav_var.get(),
+            'profile_startup': self.profile_startup_var.get(), 'trace_profile': self.trace_profile_var.get(),
+            'offline': self.offline_var.get(), 'isolated_env': self.isolated_env_var.get(),
+            'icons': {k: getattr(self, f"{k}_icon_entry").get().strip() for k in ('exe', 'window', 'taskbar')},
+        })
 
-    # ==================== 核心逻辑 ====================
+    # ==================== 核心逻辑（由 PackagerCore 实现，这里只负责线程与界面状态） ====================
 
     def _start_check(self):
         self.notebook.select(1); self.btn_refs["🔍 检查"].config(state='disabled')
+        self._sync_options()
         self.check_text.delete(1.0, tk.END)
         threading.Thread(target=self._do_check, daemon=True).start()
 
     def _do_check(self):
-        try:
-            self._add_check_msg(f"环境检查 v{VERSION}\n{'='*40}\n")
-            self._add_check_msg(f"解释器: {self.python_exe}\n")
-            source = self._get_source_file()
-            if os.path.exists(source):
-                self._add_check_msg(f"✅ 源文件: {source}\n")
-                if is_safe_path(source): self._add_check_msg(f"✅ 路径安全\n")
-            else: self._add_check_msg(f"❌ 源文件不存在: {source}\n")
-            
-            # 核心依赖检查
-            core_deps = ['PyInstaller', 'PIL']
-            results = self.module_checker.check_modules(set(core_deps), use_cache=False)
-            ok = True
-            for dep in core_deps:
-                if results.get(dep, {}).get('available'): self._add_check_msg(f"✅ {dep} 已安装\n")
-                else: 
-                    self._add_check_msg(f"❌ {dep} 未安装\n"); ok = False
-            
-            if ok and os.path.exists(source): 
-                self.message_queue.put(('enable_btn', "📊 分析"))
-                self._add_check_msg("\n✅ 检查通过！\n")
-            else: self._add_check_msg("\n❌ 检查未通过\n")
-        except Exception as e: self._add_check_msg(f"错误: {e}")
+        if self.core.check(): self.message_queue.put(('enable_btn', "📊 分析"))
         self.message_queue.put(('enable_btn', "🔍 检查"))
 
     def _start_analyze(self):
         self.notebook.select(2); self.btn_refs["📊 分析"].config(state='disabled')
+        self._sync_options()
         for i in self.deps_tree.get_children(): self.deps_tree.delete(i)
-        threading.Thread(target=self._do_analyze, args=(self._get_source_file(),), daemon=True).start()
+        threading.Thread(target=self._do_analyze, daemon=True).start()
 
-    def _do_analyze(self, source):
-        try:
-            self.message_queue.put(('progress', (20, "解析代码...")))
-            res = self.import_analyzer.analyze_file(source)
-            all_imps = res['all']
-            expanded = set()
-            for m in all_imps:
-                top = m.split('.')[0]; expanded.add(top)
-                if top in IMPLICIT_DEPENDENCIES: expanded.update(IMPLICIT_DEPENDENCIES[top])
-            
-            self.message_queue.put(('progress', (50, "检测状态...")))
-            results = self.module_checker.check_modules(expanded)
-            
-            self.analyzed_deps = {}; self.missing_deps = []; self.all_imports = set(); self.hidden_imports = set()
-            tree_data = []
-            
-            for mod, info in sorted(results.items()):
-                if mod in STDLIB_MODULES: continue
-                self.analyzed_deps[mod] = info; self.all_imports.add(mod)
-                status = '✅' if info['available'] else '❌'
-                if mod not in res['imports'] and mod not in res['from_imports']: self.hidden_imports.add(mod)
-                tree_data.append((mod, status, info.get('version', 'N/A'), info.get('pip_name', mod), 
-                                  '隐式依赖' if mod in self.hidden_imports else '直接导入'))
-                if not info['available']: self.missing_deps.append(info['pip_name'])
-            
-            self.message_queue.put(('deps_tree', tree_data))
-            if self.missing_deps: 
-                self.message_queue.put(('deps_info', (f"缺 {len(self.missing_deps)} 个依赖", 'red')))
-            else: 
-                self.message_queue.put(('deps_info', ("✅ 依赖就绪", 'green')))
-                self.message_queue.put(('enable_btn', "🚀 打包"))
-            self.message_queue.put(('progress', (100, "分析完成")))
-        except Exception as e: 
-            traceback.print_exc()
-            self.message_queue.put(('deps_info', (f"错误: {e}", 'red')))
+    def _do_analyze(self):
+        if self.core.analyze(): self.message_queue.put(('enable_btn', "🚀 打包"))
         self.message_queue.put(('enable_btn', "📊 分析"))
 
     def _start_install(self):
         self.notebook.select(3); self.btn_refs["📦 安装"].config(state='disabled')
+        self._sync_options()
         threading.Thread(target=self._do_install, daemon=True).start()
 
     def _do_install(self):
-        try:
-            to_install = [p for p in self.missing_deps if p != '-']
-            if not to_install: 
-                self._add_log_msg("无缺失依赖\n"); self.message_queue.put(('enable_btn', "📦 安装")); return
-            
-            self._add_log_msg(f"正在安装: {', '.join(to_install)}\n")
-            for pkg in to_install:
-                if not is_safe_package_name(pkg): continue
-                cmd = [self.python_exe, "-m", "pip", "install", pkg, "-i", "https://pypi.tuna.tsinghua.edu.cn/simple"]
-                subprocess.run(cmd, capture_output=True)
-                self.dep_cache.set(pip_name_to_import_name(pkg), True)
-                self._add_log_msg(f"✅ {pkg} 安装尝试完成\n")
-            self._add_log_msg("\n安装流程结束，请重新分析\n")
-        except Exception as e: self._add_log_msg(f"安装错误: {e}\n")
+        if self.core.install(): self.message_queue.put(('enable_btn', "🚀 打包"))
         self.message_queue.put(('enable_btn', "📦 安装"))
 
     def _start_pack(self):
         self.notebook.select(3); self.btn_refs["🚀 打包"].config(state='disabled')
-        self.log_text.delete(1.0, tk.END)
-        threading.Thread(target=self._do_pack, args=(self._get_source_file(),), daemon=True).start()
+        self._sync_options()
+        self._clear_log()
+        threading.Thread(target=self._do_pack, daemon=True).start()
 
-    def _do_pack(self, source):
-        wrapper_file = None
+    def _do_pack(self):
         try:
-            output_name = self.output_entry.get().strip() or "game"
-            self.message_queue.put(('progress', (5, "初始化...")))
-            self._add_log_msg(f"=== 开始打包 v{VERSION} ===\n")
-            self._add_log_msg(f"源: {source}, 模式: {self.pack_mode_var.get()}\n")
-            
-            icons = self._prepare_icons()
-            
-            # 创建包装器 (解决图标和路径问题)
-            if self.pack_mode_var.get() == 'onefile' or icons.get('window'):
-                wrapper_file = self._create_wrapper(source, icons)
-                actual_source = wrapper_file
-            else:
-                actual_source = source
-
-            data_files = self._collect_data_files(source, icons)
-            cmd = self._build_command(actual_source, output_name, icons, data_files)
-            
-            self._add_log_msg(f"\n执行命令: {' '.join(cmd[:10])} ...\n\n")
-            
-            # 执行打包
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
-                                     universal_newlines=True, bufsize=1)
-            
-            progress = 10
-            # 优化的进度条逻辑
-            for line in process.stdout:
-                self._add_log_msg(line)
-                
-                lower_line = line.lower()
-                if "analyzing" in lower_line:
-                    progress = min(progress + 1, 40)
-                    self.message_queue.put(('progress', (progress, "分析依赖...")))
-                elif "collecting" in lower_line:
-                    progress = min(progress + 1, 60)
-                    self.message_queue.put(('progress', (progress, "收集文件...")))
-                elif "copying" in lower_line:
-                    progress = min(progress + 0.5, 80)
-                elif "archiving" in lower_line: # 关键：正在压缩
-                    progress = 85
-                    self.message_queue.put(('progress', (85, "正在压缩(大文件需等待)...")))
-                elif "building pkg" in lower_line: # 关键：构建包
-                    progress = 90
-                    self.message_queue.put(('progress', (90, "正在写入EXE...")))
-                elif "appended" in lower_line:
-                    progress = 95
-            
-            process.wait()
-            
-            if process.returncode == 0:
-                self.message_queue.put(('progress', (100, "打包成功!")))
-                self._add_log_msg("\n✅ 打包成功!\n")
-                if wrapper_file and os.path.exists(wrapper_file): os.remove(wrapper_file)
+            if self.core.pack():
                 self._open_output()
                 messagebox.showinfo("成功", "打包完成！")
             else:
-                self.message_queue.put(('progress', (100, "打包失败")))
-                self._add_log_msg("\n❌ 打包失败，请检查日志\n")
                 messagebox.showerror("失败", "打包过程出错")
-                
-        except Exception as e:
-            self.message_queue.put(('progress', (100, f"错误: {e}")))
-            self._add_log_msg(f"\n❌ 严重错误: {e}\n{traceback.format_exc()}\n")
         finally:
             self.message_queue.put(('enable_btn', "🚀 打包"))
 
-    def _build_command(self, source, output_name, icons, data_files):
-        cmd = [self.python_exe, "-m", "PyInstaller", "--noconfirm", "--name", output_name]
-        
-        if self.clean_var.get(): cmd.append("--clean")
-        if self.pack_mode_var.get() == 'onefile': cmd.append("--onefile")
-        else: cmd.append("--onedir")
-        if self.no_console_var.get(): cmd.append("--noconsole")
-        if icons.get('exe'): cmd.extend(["--icon", icons['exe']])
-        if self.admin_var.get(): cmd.append("--uac-admin")
-        
-        # 数据文件
-        sep = ';' if sys.platform == 'win32' else ':'
-        for s, d in data_files: cmd.extend(["--add-data", f"{s}{sep}{d}"])
-        
-        # 排除
-        if self.fast_mode_var.get():
-            for exc in EXCLUDE_MODULES: cmd.extend(["--exclude-module", exc])
-        
-        # v5.3 智能收集逻辑 (解决慢的问题)
-        collected_metadata = set()
-        if self.collect_all_var.get():
-            for mod in self.all_imports:
-                top = mod.split('.')[0]
-                
-                # 1. 自动添加 copy-metadata (解决 DistributionNotFound)
-                pip_name = PACKAGE_NAME_MAP.get(top, top).lower()
-                if (top in METADATA_REQUIRED_PACKAGES or pip_name in METADATA_REQUIRED_PACKAGES) and top not in collected_metadata:
-                    cmd.extend(["--copy-metadata", top])
-                    self._add_log_msg(f"  📝 复制元数据: {top}\n")
-                    collected_metadata.add(top)
-                
-                # 2. 智能 collect-submodules
-                if top in COMPLEX_PACKAGES and top not in STDLIB_MODULES:
-                    # 关键优化：跳过巨型库的全量收集
-                    if top in GIANT_PACKAGES:
-                        self._add_log_msg(f"  ⏩ 跳过全量收集(优化速度): {top}\n")
-                        # 对于 PyTorch 等，使用原生 hook 足够了，不需要 collect-submodules
-                    else:
-                        cmd.extend(["--collect-submodules", top])
-                        self._add_log_msg(f"  📦 收集子模块: {top}\n")
-
-        # 隐藏导入
-        added_hidden = set()
-        for mod in self.all_imports | self.hidden_imports:
-            if mod not in STDLIB_MODULES and mod not in added_hidden:
-                # 简单过滤
-                if not any(mod.startswith(e.split('.')[0]) for e in EXCLUDE_MODULES):
-                    cmd.extend(["--hidden-import", mod])
-                    added_hidden.add(mod)
-
-        # 安全模式补充
-        if self.safe_mode_var.get():
-            cmd.extend(["--collect-all", "pkg_resources"])
-        
-        # v5.3 强制禁止对敏感库使用 UPX (防止崩溃)
-        # 即使勾选了 UPX，也要把这些库排除
-        if self.upx_var.get() and shutil.which('upx'):
-            cmd.append("--upx-dir=.")
-            no_upx_libs = ['pandas', 'numpy', 'torch', 'cv2', 'scipy', 'tensorflow']
-            for lib in no_upx_libs:
-                cmd.extend(["--upx-exclude", lib])
-        else:
-            cmd.append("--noupx")
-            
-        cmd.append(source)
-        return cmd
+    def _start_bench(self):
+        self.notebook.select(3); self.btn_refs["⏱️ 测速"].config(state='disabled')
+        self._sync_options()
+        threading.Thread(target=self._do_bench, daemon=True).start()
 
-    def _prepare_icons(self):
-        icons = {}
-        # (简化图标处理逻辑，与原版类似但略去非关键代码以缩短篇幅)
-        exe_p = self.exe_icon_entry.get()
-        if exe_p and os.path.exists(exe_p): icons['exe'] = os.path.abspath(exe_p)
-        win_p = self.window_icon_entry.get()
-        if win_p and os.path.exists(win_p): icons['window'] = os.path.abspath(win_p)
-        return icons
+    def _do_bench(self):
+        try:
+            output_name = str(self.core.options.get('output_name') or '').strip() or "game"
+            path = self.core._output_path(output_name)
+            if os.path.isdir(path):
+                path = os.path.join(path, output_name + ('.exe' if sys.platform == 'win32' else ''))
+            if not os.path.isfile(path):
+                self.message_queue.put(('log', f"❌ 未找到打包产物: {path}\n")); return
+            self.message_queue.put(('log', f"\n=== 启动测速: {path} ===\n"))
+            results = StartupBenchmark([path], runs=5, emit=lambda t, c: self.message_queue.put((t, c))).run()
+            dist = os.path.dirname(os.path.dirname(path)) if results[0]['layout'] == 'onedir' else os.path.dirname(path)
+            regressions = StartupBenchmark.compare(os.path.join(dist, "startup_history.jsonl"), results, dist)
+            self.message_queue.put(('log', StartupBenchmark.summary_table(results)))
+            for line in regressions: self.message_queue.put(('log', f"⚠️ 性能回退: {line}\n"))
+            self.message_queue.put(('bench', results))
+        except Exception as e:
+            self.message_queue.put(('log', f"❌ 测速失败: {e}\n"))
+        finally:
+            self.message_queue.put(('enable_btn', "⏱️ 测速"))
 
-    def _create_wrapper(self, source, icons):
-        # 创建临时包装脚本以处理图标
-        with open(source, 'r', encoding='utf-8') as f: orig = f.read()
-        win_icon = os.path.basename(icons.get('window', ''))
-        code = f"""import sys, os
-try:
-    base = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(os.path.abspath(__file__))
-    icon_path = os.path.join(base, "{win_icon}")
-    import tkinter as tk
-    _orig = tk.Tk.__init__
-    def _new(self, *a, **k):
-        _orig(self, *a, **k)
-        try: 
-            if os.path.exists(icon_path): 
-                if icon_path.endswith('.png'): self.iconphoto(True, tk.PhotoImage(file=icon_path))
-                else: self.iconbitmap(icon_path)
-        except: pass
-    tk.Tk.__init__ = _new
-except: pass
-{orig}
-"""
-        tmp = tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', suffix='.py', delete=False)
-        tmp.write(code); tmp.close()
-        return tmp.name
+    def _start_trace(self):
+        if not messagebox.askokcancel("追踪运行", "将运行游戏（最长 120 秒，关闭游戏即结束），\n"
+                                                  "请把要打包的功能都走一遍，未加载的子模块会被排除。"): return
+        self.notebook.select(3); self.btn_refs["🔬 追踪"].config(state='disabled')
+        self._sync_options()
+        threading.Thread(target=self._do_trace, daemon=True).start()
 
-    def _collect_data_files(self, source, icons):
-        data = []
-        src_dir = os.path.dirname(os.path.abspath(source))
-        if icons.get('window'): data.append((icons['window'], '.'))
-        # 简单的资源扫描
+    def _do_trace(self):
         try:
-            with open(source, 'r', encoding='utf-8') as f: c = f.read()
-            for ext in ['png','jpg','ico','json','txt','mp3','wav']:
-                for m in re.finditer(f'["\']([^"\']+\.{ext})["\']', c, re.I):
-                    fname = m.group(1)
-                    fp = os.path.join(src_dir, fname)
-                    if os.path.exists(fp): data.append((os.path.abspath(fp), '.'))
-        except: pass
-        return list(set(data))
+            if not self.core.module_graph: self.core.analyze()
+            self.core.trace(seconds=120)
+        except Exception as e:
+            self.message_queue.put(('log', f"❌ 追踪失败: {e}\n"))
+        finally:
+            self.message_queue.put(('enable_btn', "🔬 追踪"))
 
     def run(self):
         self.root.update_idletasks()
@@ -996,5 +4337,231 @@ except: pass
         self.root.geometry(f'{w}x{h}+{x}+{y}')
         self.root.mainloop()
 
+
+# ==================== 命令行 / 批处理模式 ====================
+
+def _read_config_file(path: str) -> Dict[str, Any]:
+    if path.lower().endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            raise SystemExit("读取 TOML 配置需要 Python 3.11+，请改用 JSON")
+        with open(path, 'rb') as f: return tomllib.load(f)
+    with open(path, 'r', encoding='utf-8') as f: return json.load(f)
+
+
+def _resolve_config_paths(config: Dict[str, Any], base: str) -> Dict[str, Any]:
+    if config.get('source'): config['source'] = os.path.join(base, config['source'])
+    icons = config.get('icons') or {}
+    for key, value in icons.items():
+        if value: icons[key] = os.path.join(base, value)
+    for entry in config.get('extra_entries') or []:
+        if entry.get('source'): entry['source'] = os.path.join(base, entry['source'])
+    return config
+
+
+def load_project_config(path: str) -> Dict[str, Any]:
+    """读取 JSON / TOML 项目配置（键与 DEFAULT_PACK_OPTIONS 相同，另可指定 python）
+    
+    配置中的相对路径按配置文件所在目录解析。
+    """
+    return _resolve_config_paths(_read_config_file(path), os.path.dirname(os.path.abspath(path)))
+
+
+def load_matrix_config(path: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """读取构建矩阵：{"jobs": [{"source", "output_name", "mode", "options"}, ...], "max_workers": N}
+    
+    顶层其余键作为所有任务共用的打包选项。
+    """
+    config = _read_config_file(path)
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = [_resolve_config_paths(dict(job), base) for job in config.pop('jobs', [])]
+    for job in jobs:
+        if job.get('options'): _resolve_config_paths(job['options'], base)
+    return jobs, _resolve_config_paths(config, base)
+
+
+class _CliReporter:
+    """把 PackagerCore 的消息打印到终端"""
+    def __init__(self):
+        self._last_progress = None
+    
+    def __call__(self, msg_type: str, content: Any):
+        if msg_type in ('check', 'log'):
+            sys.stdout.write(content); sys.stdout.flush()
+        elif msg_type == 'progress':
+            if content[1] != self._last_progress:
+                self._last_progress = content[1]
+                eta = content[2] if len(content) > 2 else None
+                suffix = f"（剩余约 {BuildProgressModel.format_eta(eta)}）" if eta is not None else ''
+                print(f"[{int(content[0]):3d}%] {content[1]}{suffix}", flush=True)
+        elif msg_type == 'deps_tree':
+            for row in content: print("  " + " | ".join(str(c) for c in row))
+        elif msg_type == 'deps_info':
+            print(content[0], flush=True)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('source', nargs='?', help="入口脚本（覆盖配置文件中的 source）")
+    common.add_argument('-c', '--config', help="JSON/TOML 项目配置文件")
+    common.add_argument('-n', '--name', dest='output_name', help="输出名")
+    common.add_argument('--mode', choices=['onedir', 'onefile'], help="打包模式")
+    common.add_argument('--python', help="目标解释器（默认自动查找）")
+    common.add_argument('--icon', dest='exe_icon', help="EXE 图标")
+    common.add_argument('--window-icon', help="窗口图标")
+    common.add_argument('--taskbar-icon', help="任务栏图标")
+    common.add_argument('--extra-entry', action='append', metavar="SCRIPT[:NAME]",
+                        help="额外入口脚本（可重复），与主入口共用一份依赖")
+    common.add_argument('--wheelhouse', help="本地 wheel 目录（安装时作为 --find-links，prefetch 的下载目标）")
+    common.add_argument('--index-url', help="pip 索引地址")
+    common.add_argument('--asset-include', dest='add_asset_include', action='append', metavar="GLOB",
+                        help="额外打包的资源 glob（可重复）")
+    common.add_argument('--asset-exclude', dest='add_asset_exclude', action='append', metavar="GLOB",
+                        help="排除的资源 glob（可重复）")
+    for flag, key, default, text in [
+            ('--console', 'no_console', True, "显示控制台"), ('--clean', 'clean', False, "强制清理构建缓存"),
+            ('--no-incremental', 'incremental', True, "关闭增量构建"),
+            ('--upx', 'upx', False, "UPX 压缩"), ('--admin', 'admin', False, "管理员权限"),
+            ('--no-safe-mode', 'safe_mode', True, "关闭安全模式"), ('--no-collect', 'collect_all', True, "关闭自动收集"),
+            ('--keep-debug-modules', 'fast_mode', True, "不排除调试模块"), ('--serial', 'parallel', True, "串行分析"),
+            ('--single-file', 'project_graph', True, "只分析入口文件"), ('--deep-verify', 'deep_verify', False, "深度验证(导入)"),
+            ('--optimize-assets', 'optimize_assets', False, "无损优化 PNG/JSON 资源"),
+            ('--transcode-wav', 'transcode_wav', False, "WAV 转 OGG（需 ffmpeg）"),
+            ('--profile-startup', 'profile_startup', False, "附加启动分析钩子（生成 startup_profile.json）"),
+            ('--no-trace-profile', 'trace_profile', True, "不应用运行时追踪清单"),
+            ('--offline', 'offline', False, "只从 wheelhouse 安装（pip --no-index）"),
+            ('--isolated-env', 'isolated_env', False, "在只含项目依赖的专属 venv 中打包")]:
+        common.add_argument(flag, dest=key, action='store_false' if default else 'store_true', default=None, help=text)
+    
+    parser = argparse.ArgumentParser(prog="GamePackager", description=f"EXE打包工具 v{VERSION}（无参数启动图形界面）")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('check', parents=[common], help="环境检查")
+    sub.add_parser('analyze', parents=[common], help="依赖分析")
+    sub.add_parser('install', parents=[common], help="分析并安装缺失依赖")
+    sub.add_parser('pack', parents=[common], help="分析并打包（依赖需已就绪）")
+    sub.add_parser('prefetch', parents=[common], help="把项目依赖下载到 wheelhouse（供离线安装）")
+    build = sub.add_parser('build', parents=[common], help="检查 → 分析 → 安装 → 打包")
+    build.add_argument('--no-install', action='store_true', help="缺依赖时直接失败，不自动安装")
+    trace = sub.add_parser('trace', parents=[common], help="运行游戏并追踪实际导入，生成项目排除/包含清单")
+    trace.add_argument('--seconds', type=float, default=60, help="运行多少秒后结束追踪（0 = 直到程序退出，默认 60）")
+    trace.add_argument('--scenario', help="代替入口运行的场景脚本（驱动游戏走一遍关键流程）")
+    trace.add_argument('--reset', action='store_true', help="丢弃已有追踪记录（keep 也会重新生成）")
+    matrix = sub.add_parser('matrix', parents=[common], help="按构建矩阵并发打包多个目标")
+    matrix.add_argument('-m', '--matrix', required=True, help="矩阵文件（JSON/TOML，含 jobs 列表）")
+    matrix.add_argument('-j', '--jobs', type=int, dest='max_workers', help="最大并发数（默认 CPU 核数）")
+    bench = sub.add_parser('bench', help="对已打包的程序做启动测速（冷/热启动、峰值内存）并与历史比较")
+    bench.add_argument('targets', nargs='*', help="可执行文件（默认 dist 下全部）")
+    bench.add_argument('--dist', default='dist', help="产物目录（默认 dist）")
+    bench.add_argument('-r', '--runs', type=int, default=5, help="每个目标启动次数，第 1 次为冷启动（默认 5）")
+    bench.add_argument('--timeout', type=float, default=60.0, help="单次启动超时秒数")
+    bench.add_argument('--marker', help=f"就绪标记行（默认 {StartupBenchmark.DEFAULT_MARKER}）")
+    bench.add_argument('--history', help="历史文件（默认 <dist>/startup_history.jsonl）")
+    bench.add_argument('--threshold', type=float, default=0.15, help="启动耗时回退阈值（默认 0.15 = 15%%）")
+    bench.add_argument('--rss-threshold', type=float, default=0.15, help="峰值内存回退阈值（默认 0.15）")
+    bench.add_argument('--no-fail', action='store_true', help="有回退时也返回 0")
+    abench = sub.add_parser('analyzer-bench', help="在生成的大源码上测导入分析器吞吐（扫描 vs AST vs 旧实现）")
+    abench.add_argument('--size-mb', type=float, default=4.0, help="生成源码大小（MB，默认 4）")
+    abench.add_argument('-r', '--repeat', type=int, default=3, help="每种实现重复次数，取最好成绩（默认 3）")
+    return parser
+
+
+def run_bench(args) -> int:
+    reporter = _CliReporter()
+    dist = os.path.abspath(args.dist)
+    targets = args.targets or StartupBenchmark.discover(dist)
+    if not targets:
+        print(f"❌ 未找到可执行文件: {dist}"); return 1
+    results = StartupBenchmark(targets, runs=args.runs, timeout=args.timeout, marker=args.marker, emit=reporter).run()
+    history = args.history or os.path.join(dist, "startup_history.jsonl")
+    regressions = StartupBenchmark.compare(history, results, dist, args.threshold, args.rss_threshold)
+    print(StartupBenchmark.summary_table(results))
+    for line in regressions: print(f"⚠️ 性能回退: {line}")
+    print(f"历史记录: {history}")
+    return 2 if regressions and not args.no_fail else 0
+
+
+def run_analyzer_bench(args) -> int:
+    rows = benchmark_import_analyzer(args.size_mb, args.repeat)
+    print(f"{'实现':<12}{'耗时(s)':>10}{'MB/s':>10}{'加速比':>8}{'模块数':>8}{'伪导入':>8}")
+    for row in rows:
+        print(f"{row['name']:<12}{row['seconds']:>10.3f}{row['mb_per_s']:>10.1f}{row['speedup']:>7.1f}x"
+              f"{row['modules']:>8}{row['fake']:>8}")
+    if not rows[0]['matches_ast']:
+        print("❌ 扫描结果与 AST 结果不一致"); return 1
+    print("✅ 扫描结果与 AST 结果一致")
+    return 0
+
+
+def run_cli(argv: List[str]) -> int:
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(errors='replace')  # 某些终端编码无法显示 emoji
+    args = build_arg_parser().parse_args(argv)
+    if args.command == 'bench': return run_bench(args)
+    if args.command == 'analyzer-bench': return run_analyzer_bench(args)
+    options = load_project_config(args.config) if args.config else {}
+    python_exe = args.python or options.pop('python', None)
+    options.pop('python', None)
+    for key in DEFAULT_PACK_OPTIONS:
+        value = getattr(args, key, None)
+        if value is not None: options[key] = value
+    icons = options.setdefault('icons', {})
+    for key in ('exe', 'window', 'taskbar'):
+        value = getattr(args, f"{key}_icon")
+        if value is not None: icons[key] = value
+    for key in ('asset_include', 'asset_exclude'):
+        options[key] = (options.get(key) or []) + (getattr(args, 'add_' + key) or [])
+    for spec in args.extra_entry or []:
+        script, _, name = spec.rpartition(':')
+        if not script or re.search(r'[\\/]|\.py$', name): script, name = spec, ''  # 无名称或盘符路径
+        options.setdefault('extra_entries', []).append({'source': script, 'output_name': name or None})
+    
+    if args.command == 'matrix':
+        jobs, shared = load_matrix_config(args.matrix)
+        max_workers = args.max_workers or shared.pop('max_workers', None)
+        shared.update(options)
+        python_exe = python_exe or shared.pop('python', None)
+        shared.pop('python', None)
+        scheduler = BuildMatrixScheduler(jobs, shared, max_workers=max_workers, python_exe=python_exe,
+                                         emit=_CliReporter())
+        results = scheduler.run()
+        return 0 if all(r['status'] == '成功' for r in results) else 1
+    
+    core = PackagerCore(options, emit=_CliReporter(), python_exe=python_exe)
+    if args.command == 'check':
+        return 0 if core.check() else 1
+    if args.command == 'analyze':
+        return 0 if core.analyze() else 1
+    if args.command == 'install':
+        core.analyze()
+        return 0 if core.install() else 1
+    if args.command == 'prefetch':
+        core.analyze()
+        return 0 if core.prefetch() else 1
+    if args.command == 'trace':
+        core.analyze()  # 静态导入用于区分运行时才出现的模块
+        return 0 if core.trace(args.seconds, args.scenario, args.reset) else 1
+    if args.command == 'pack':
+        if not core.analyze(): return 1
+        return 0 if core.pack() else 1
+    # build
+    if not core.check(): return 1
+    ready = core.analyze()
+    if not ready and not args.no_install:
+        ready = core.install()
+    if not ready: return 1
+    return 0 if core.pack() else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        GamePackagerV5().run()
+        return 0
+    return run_cli(argv)
+
+
 if __name__ == "__main__":
-    GamePackagerV5().run()
+    import multiprocessing
+    multiprocessing.freeze_support()  # 打包后的进程池子进程入口
+    sys.exit(main())
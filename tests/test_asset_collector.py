@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GamePackager import ProjectAssetCollector
+
+
+class ScanSourceGlobTest(unittest.TestCase):
+    """源码里的普通字符串（"*" * 40、"[INFO]"）不能被当作通配符把整个项目收进来"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        for rel in ('saves/slot1.sav', 'docs/design.md', 'private.key', 'img/hero.png', 'img/notes.txt'):
+            path = os.path.join(self.root, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f: f.write(rel)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def collect(self, source: str):
+        main = os.path.join(self.root, 'main.py')
+        with open(main, 'w') as f: f.write(source)
+        collector = ProjectAssetCollector(self.root)
+        collector.collect([main])
+        return sorted(os.path.relpath(p, self.root).replace(os.sep, '/') for p in collector.selected)
+
+    def test_non_path_wildcards_are_ignored(self):
+        self.assertEqual(self.collect('print("*" * 40)\nprint(\'*\' * 40)\nprint("[INFO]", "?", "**")\n'), [])
+
+    def test_asset_globs_are_expanded(self):
+        self.assertEqual(self.collect('IMAGES = "img/*.png"\n'), ['img/hero.png'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GamePackager import AdvancedImportAnalyzer, generate_benchmark_source
+
+KEYS = ('imports', 'from_imports', 'dynamic', 'conditional')
+
+
+class ScanMatchesAstTest(unittest.TestCase):
+    """单遍扫描与 AST 路径的结果必须一致"""
+
+    def assertSameAsAst(self, source: str):
+        scan = AdvancedImportAnalyzer().analyze_source(source, 'scan')
+        tree = AdvancedImportAnalyzer().analyze_source(source, 'ast')
+        for key in KEYS: self.assertEqual(scan[key], tree[key], key)
+        return scan
+
+    def test_backslash_continued_from_import(self):
+        result = self.assertSameAsAst('from a \\\nimport b\n')
+        self.assertEqual(result['from_imports'], {'a'})
+        self.assertEqual(result['imports'], set())
+
+    def test_continuations_and_semicolons(self):
+        self.assertSameAsAst('import os, \\\n    json\nfrom x import (y,\n    z)\nimport q; import r\n'
+                             'try: import u\nexcept ImportError: pass\n')
+
+    def test_type_checking_guard(self):
+        result = self.assertSameAsAst('if not TYPE_CHECKING:\n    import rt\nelse:\n    import tc\n'
+                                      'if TYPE_CHECKING:\n    import only_types\n')
+        self.assertEqual(result['conditional'], {'only_types'})
+
+    def test_generated_benchmark_source(self):
+        self.assertSameAsAst(generate_benchmark_source(64 * 1024))
+
+
+if __name__ == '__main__':
+    unittest.main()